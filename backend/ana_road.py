@@ -1,227 +1,130 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify, Response
 from flask_cors import CORS
 import os
-from dotenv import load_dotenv
-import requests
 import json
-import time
+import asyncio
+import contextvars
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from llm_client import GROQ_API_KEY, routed_call_groq_api, stream_groq_api, async_routed_call_groq_api, async_stream_groq_api
+from model_router import model_for
+from questions import generate_question, generate_question_async
+from roadmap_jobs import RoadmapJobQueue, QueueFullError, check_callback_url
+from roadmap_versions import RoadmapVersionStore, diff_answers
+from metrics import registry
+from llm_scheduler import priority_class
+import usage_accounting
+from async_routes import AsyncRoutes, AsyncResponse, json_response
+from idempotency import idempotent, idempotent_async
+from load_governor import governor
 
-load_dotenv()
+bp = Blueprint('roadmap', __name__)
+async_routes = AsyncRoutes('roadmap')
 
-app = Flask(__name__)
-CORS(app)
+# Roadmap generation mode: 'single' (one large completion) or 'parallel' (section groups)
+ROADMAP_MODE = os.getenv('ROADMAP_MODE', 'single')
 
-GROQ_API_KEY = os.environ.get('GROQ_API_KEY', os.getenv('GROQ_API_KEY'))
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+# Roadmap delivery: 'sync' (wait for the LLM) or 'swr' (fallback now, LLM upgrade in the background)
+ROADMAP_DELIVERY = os.getenv('ROADMAP_DELIVERY', 'sync')
 
 # Global state for tracking asked topics
 asked_topics = set()
 
+# Top-level roadmap sections, in the order the prompt asks for them
+ROADMAP_SECTIONS = [
+    'overview', 'currentLevel', 'phases', 'weeklyPlan', 'resources', 'priorityConcepts',
+    'milestones', 'practiceStrategy', 'motivationalTips', 'strengths', 'improvements', 'recommendations'
+]
+
 # ============================================================================
 # SECTION 1: QUESTION GENERATION (Assessment Phase)
 # ============================================================================
 
-def call_groq_api(prompt, max_tokens=200, temperature=0.8, max_retries=3):
-    """Call Groq API with retry logic"""
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "model": "llama-3.1-70b-versatile",
-        "messages": [
-            {"role": "system", "content": "You are a Data Structures and Algorithms expert. You MUST respond ONLY with valid JSON. No markdown, no explanations, just pure JSON."},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": temperature,
-        "max_tokens": max_tokens
-    }
-    
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(GROQ_API_URL, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            result = response.json()
-            
-            content = result['choices'][0]['message']['content'].strip()
-            
-            # Clean up markdown if present
-            if '```json' in content:
-                content = content.split('```json')[1].split('```')[0]
-            elif '```' in content:
-                content = content.split('```')[1].split('```')[0]
-            
-            content = content.strip()
-            parsed = json.loads(content)
-            return parsed
-            
-        except requests.exceptions.RequestException as e:
-            print(f"API Request Error (attempt {attempt + 1}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(1)
-            else:
-                raise
-        except json.JSONDecodeError as e:
-            print(f"JSON Parse Error (attempt {attempt + 1}): {e}")
-            print(f"Content: {content}")
-            if attempt < max_retries - 1:
-                time.sleep(1)
-            else:
-                raise
-        except Exception as e:
-            print(f"Unexpected Error (attempt {attempt + 1}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(1)
-            else:
-                raise
-    
-    raise Exception("Failed to get valid response from API")
-
-def generate_question(question_num, previous_answers):
-    """Generate adaptive questions based on previous answers using Groq LLM"""
-    
-    global asked_topics
-    
-    context = "You are an expert Data Structures and Algorithms educator.\n\n"
-    
-    if asked_topics:
-        context += f"Topics already asked: {', '.join(asked_topics)}\n"
-        context += "You MUST ask about DIFFERENT topics that have NOT been covered yet.\n\n"
-    
-    if previous_answers:
-        context += "Previous Questions and Student Responses:\n"
-        for i, ans in enumerate(previous_answers, 1):
-            level_text = {
-                2: "KNOWS WELL",
-                1: "SOMEWHAT KNOWS", 
-                0: "DOESN'T KNOW"
-            }
-            context += f"{i}. {ans['question']}\n   Answer: {level_text[ans['answer']]}\n\n"
-        
-        total_score = sum(a['answer'] for a in previous_answers)
-        max_score = len(previous_answers) * 2
-        performance_rate = total_score / max_score
-        
-        context += f"Current Performance: {total_score}/{max_score} points ({performance_rate*100:.0f}%)\n\n"
-        
-        if performance_rate >= 0.75:
-            difficulty = "ADVANCED"
-            context += "Student is performing EXCELLENTLY. Ask an ADVANCED/EXPERT level question.\n"
-        elif performance_rate >= 0.5:
-            difficulty = "INTERMEDIATE"
-            context += "Student is performing MODERATELY. Ask an INTERMEDIATE level question.\n"
-        elif performance_rate >= 0.25:
-            difficulty = "BASIC"
-            context += "Student is STRUGGLING. Ask a FUNDAMENTAL/BASIC question.\n"
-        else:
-            difficulty = "VERY BASIC"
-            context += "Student knows very little. Ask the most FUNDAMENTAL question possible.\n"
-    else:
-        difficulty = "BASIC"
-        context += "This is the FIRST question. Start with a BASIC foundational concept.\n"
-    
-    if difficulty == "VERY BASIC":
-        topics = [
-            "arrays and basic indexing",
-            "what variables store",
-            "basic list operations",
-            "simple iteration/loops",
-            "counting elements"
-        ]
-    elif difficulty == "BASIC":
-        topics = [
-            "arrays and array operations",
-            "linked lists basics",
-            "stack LIFO principle",
-            "queue FIFO principle",
-            "basic recursion",
-            "linear search",
-            "bubble sort basics"
-        ]
-    elif difficulty == "INTERMEDIATE":
-        topics = [
-            "binary search algorithm",
-            "merge sort or quick sort",
-            "binary trees structure",
-            "hash tables and hashing",
-            "doubly linked lists",
-            "circular queues",
-            "depth-first search (DFS)",
-            "breadth-first search (BFS)",
-            "heaps (min/max heap)"
-        ]
-    else:
-        topics = [
-            "AVL trees and rotations",
-            "red-black trees",
-            "B-trees and B+ trees",
-            "graph algorithms (Dijkstra, Bellman-Ford)",
-            "dynamic programming with data structures",
-            "trie data structure",
-            "segment trees",
-            "disjoint set union (DSU)",
-            "skip lists",
-            "suffix arrays or suffix trees"
-        ]
-    
-    available_topics = [t for t in topics if t not in asked_topics]
-    if not available_topics:
-        available_topics = topics
-        asked_topics.clear()
-    
-    context += f"\nAvailable topics to choose from: {', '.join(available_topics)}\n"
-    
-    prompt = f"""{context}
-
-CRITICAL INSTRUCTIONS:
-1. Generate question {question_num} of 5 for Data Structures assessment
-2. Pick ONE topic from the available topics list above that has NOT been asked yet
-3. Ask about knowledge level: "How well do you know [concept]?"
-4. Make it specific to the difficulty level: {difficulty}
-5. The question MUST be completely DIFFERENT from all previous questions
-
-OUTPUT FORMAT (respond with ONLY this JSON, nothing else):
-{{
-  "question": "How well do you know [specific concept]?",
-  "topic": "topic_name"
-}}
-
-Generate the question NOW:"""
-
-    try:
-        result = call_groq_api(prompt)
-        
-        question_text = result.get('question', '')
-        topic = result.get('topic', 'unknown')
-        
-        asked_topics.add(topic)
-        
-        print(f"Generated Question {question_num}: {question_text}")
-        print(f"Topic: {topic}")
-        
-        return question_text
-    
-    except Exception as e:
-        print(f"ERROR generating question: {e}")
-        print("Using emergency fallback")
-        
-        emergency_questions = [
-            "How well do you understand arrays and array operations?",
-            "How familiar are you with linked lists?",
-            "How well do you know stacks and the LIFO principle?",
-            "How comfortable are you with queues and the FIFO principle?",
-            "How well do you understand basic recursion?"
-        ]
-        
-        return emergency_questions[min(question_num - 1, len(emergency_questions) - 1)]
+# Questions come from the generator shared with the assessment service
+# (questions.py); this service keeps its own asked_topics set.
 
 # ============================================================================
 # SECTION 2: ROADMAP GENERATION (After Assessment)
 # ============================================================================
 
-def create_enhanced_roadmap_prompt(answers):
-    """Create a detailed, user-friendly prompt for roadmap generation based on assessment"""
+# Prompt text for each roadmap section, keyed by its JSON field name
+ROADMAP_SECTION_SPECS = {
+    'overview': """**overview**: A brief, encouraging 2-3 sentence summary of the student's current position and learning journey ahead""",
+    'currentLevel': """**currentLevel**: A clear, specific assessment with constructive feedback""",
+    'phases': """**phases**: An array of 3-4 learning phases, each containing:
+   - name: Phase name (e.g., "Foundation Building", "Intermediate Concepts", "Advanced Mastery")
+   - duration: Realistic timeframe (e.g., "2-3 weeks", "1 month")
+   - concepts: Array of 4-6 specific topics to master in this phase
+   - goals: Array of 2-4 concrete, measurable learning objectives
+   - description: 1-2 sentences explaining why this phase is important""",
+    'weeklyPlan': """**weeklyPlan**: A detailed 4-week study schedule, each week containing:
+   - week: Week number (1-4)
+   - focus: Main topic/theme for the week
+   - dailyTasks: Array of 4-5 specific daily activities (30-60 min each)
+   - practiceProblems: 3-4 types of coding exercises to complete
+   - milestone: Clear achievement target by week's end""",
+    'resources': """**resources**: Categorized learning materials:
+   - videos: 4-5 specific video tutorial recommendations
+   - articles: 4-5 blog posts, documentation, or tutorial links
+   - practice: 4-5 coding platforms or specific problem sets
+   - books: 2-3 recommended books or online resources""",
+    'priorityConcepts': """**priorityConcepts**: Array of 5-8 concepts ordered by learning priority, each with:
+   - concept: Clear name of the data structure/algorithm
+   - why: One sentence explaining its importance
+   - timeToLearn: Realistic estimate (e.g., "2-3 hours", "1-2 days")
+   - prerequisites: What to learn first (or "None" if foundational)""",
+    'milestones': """**milestones**: Array of 5-7 achievement checkpoints, each with:
+   - title: Milestone name (e.g., "Master Array Manipulation")
+   - description: What this achievement means (1-2 sentences)
+   - timeframe: When to expect reaching this (e.g., "Week 2", "End of Month 1")
+   - criteria: Specific way to verify achievement""",
+    'practiceStrategy': """**practiceStrategy**: An object containing:
+   - approach: Overall practice philosophy (2-3 sentences)
+   - easyProblems: 3-4 types of beginner-friendly exercises
+   - mediumProblems: 3-4 intermediate challenge types
+   - hardProblems: 3-4 advanced problem categories
+   - projects: 3-4 hands-on project ideas to apply learning""",
+    'motivationalTips': """**motivationalTips**: Array of 4-6 specific, actionable tips to maintain motivation and effective learning""",
+    'strengths': """**strengths**: Array of 2-4 identified strengths based on assessment""",
+    'improvements': """**improvements**: Array of 3-5 specific areas needing work""",
+    'recommendations': """**recommendations**: Array of 3-5 immediate actionable recommendations"""
+}
+
+# Expected JSON type of each section, used to validate model output
+ROADMAP_SECTION_TYPES = {
+    'overview': str,
+    'currentLevel': str,
+    'phases': list,
+    'weeklyPlan': list,
+    'resources': dict,
+    'priorityConcepts': list,
+    'milestones': list,
+    'practiceStrategy': dict,
+    'motivationalTips': list,
+    'strengths': list,
+    'improvements': list,
+    'recommendations': list
+}
+
+def get_performance_level(percentage):
+    """Map an assessment percentage to (user_level, focus_area)"""
+    if percentage >= 75:
+        return "Advanced", "mastery, optimization, and expert-level topics"
+    elif percentage >= 50:
+        return "Intermediate", "strengthening core concepts and exploring advanced topics"
+    elif percentage >= 25:
+        return "Beginner-Intermediate", "building solid fundamentals and basic implementations"
+    else:
+        return "Beginner", "establishing strong foundational understanding"
+
+def create_enhanced_roadmap_prompt(answers, sections=None):
+    """Create a detailed, user-friendly prompt for roadmap generation based on assessment
+    
+    When `sections` is given, only those roadmap sections are requested; the
+    assessment context is the same either way so separately generated
+    sections stay consistent with each other.
+    """
+    sections = sections or ROADMAP_SECTIONS
     
     # Calculate performance metrics
     total_questions = len(answers)
@@ -230,24 +133,22 @@ def create_enhanced_roadmap_prompt(answers):
     performance_percentage = (total_score / max_score * 100) if max_score > 0 else 0
     
     # Determine user level based on performance
-    if performance_percentage >= 75:
-        user_level = "Advanced"
-        focus_area = "mastery, optimization, and expert-level topics"
-    elif performance_percentage >= 50:
-        user_level = "Intermediate"
-        focus_area = "strengthening core concepts and exploring advanced topics"
-    elif performance_percentage >= 25:
-        user_level = "Beginner-Intermediate"
-        focus_area = "building solid fundamentals and basic implementations"
-    else:
-        user_level = "Beginner"
-        focus_area = "establishing strong foundational understanding"
+    user_level, focus_area = get_performance_level(performance_percentage)
     
     # Categorize answers
     known_well = [a for a in answers if a['answer'] == 2]
     somewhat_known = [a for a in answers if a['answer'] == 1]
     not_known = [a for a in answers if a['answer'] == 0]
     
+    section_specs = "\n\n".join(f"{i}. {ROADMAP_SECTION_SPECS[key]}" for i, key in enumerate(sections, 1))
+    
+    if len(sections) == len(ROADMAP_SECTIONS):
+        task = "CREATE A COMPREHENSIVE PERSONALIZED LEARNING ROADMAP with these sections:"
+        output = "OUTPUT: Return ONLY valid JSON. No markdown formatting, no code blocks, no explanations - just pure JSON that matches the structure above."
+    else:
+        task = "CREATE THESE SECTIONS OF A PERSONALIZED LEARNING ROADMAP (the other sections are written separately):"
+        output = f"OUTPUT: Return ONLY a valid JSON object whose top-level keys are exactly: {', '.join(sections)}. No markdown formatting, no code blocks, no explanations - just pure JSON that matches the structure above."
+    
     prompt = f"""You are an expert Data Structures and Algorithms educator creating a personalized learning roadmap.
 
 STUDENT ASSESSMENT RESULTS:
@@ -264,56 +165,9 @@ CONCEPTS STUDENT SOMEWHAT KNOWS:
 CONCEPTS STUDENT NEEDS TO LEARN:
 {chr(10).join(f"✗ {a['question']}" for a in not_known) if not_known else "• Continue advancing knowledge"}
 
-CREATE A COMPREHENSIVE PERSONALIZED LEARNING ROADMAP with these sections:
-
-1. **overview**: A brief, encouraging 2-3 sentence summary of the student's current position and learning journey ahead
-
-2. **currentLevel**: A clear, specific assessment with constructive feedback
-
-3. **phases**: An array of 3-4 learning phases, each containing:
-   - name: Phase name (e.g., "Foundation Building", "Intermediate Concepts", "Advanced Mastery")
-   - duration: Realistic timeframe (e.g., "2-3 weeks", "1 month")
-   - concepts: Array of 4-6 specific topics to master in this phase
-   - goals: Array of 2-4 concrete, measurable learning objectives
-   - description: 1-2 sentences explaining why this phase is important
-
-4. **weeklyPlan**: A detailed 4-week study schedule, each week containing:
-   - week: Week number (1-4)
-   - focus: Main topic/theme for the week
-   - dailyTasks: Array of 4-5 specific daily activities (30-60 min each)
-   - practiceProblems: 3-4 types of coding exercises to complete
-   - milestone: Clear achievement target by week's end
+{task}
 
-5. **resources**: Categorized learning materials:
-   - videos: 4-5 specific video tutorial recommendations
-   - articles: 4-5 blog posts, documentation, or tutorial links
-   - practice: 4-5 coding platforms or specific problem sets
-   - books: 2-3 recommended books or online resources
-
-6. **priorityConcepts**: Array of 5-8 concepts ordered by learning priority, each with:
-   - concept: Clear name of the data structure/algorithm
-   - why: One sentence explaining its importance
-   - timeToLearn: Realistic estimate (e.g., "2-3 hours", "1-2 days")
-   - prerequisites: What to learn first (or "None" if foundational)
-
-7. **milestones**: Array of 5-7 achievement checkpoints, each with:
-   - title: Milestone name (e.g., "Master Array Manipulation")
-   - description: What this achievement means (1-2 sentences)
-   - timeframe: When to expect reaching this (e.g., "Week 2", "End of Month 1")
-   - criteria: Specific way to verify achievement
-
-8. **practiceStrategy**: An object containing:
-   - approach: Overall practice philosophy (2-3 sentences)
-   - easyProblems: 3-4 types of beginner-friendly exercises
-   - mediumProblems: 3-4 intermediate challenge types
-   - hardProblems: 3-4 advanced problem categories
-   - projects: 3-4 hands-on project ideas to apply learning
-
-9. **motivationalTips**: Array of 4-6 specific, actionable tips to maintain motivation and effective learning
-
-10. **strengths**: Array of 2-4 identified strengths based on assessment
-11. **improvements**: Array of 3-5 specific areas needing work
-12. **recommendations**: Array of 3-5 immediate actionable recommendations
+{section_specs}
 
 CRITICAL REQUIREMENTS:
 - Be HIGHLY SPECIFIC to Data Structures & Algorithms (mention exact concepts: arrays, linked lists, trees, graphs, sorting, searching, etc.)
@@ -326,125 +180,189 @@ CRITICAL REQUIREMENTS:
 - Focus on practical application and problem-solving
 - Include variety in learning methods (visual, hands-on, theoretical)
 
-OUTPUT: Return ONLY valid JSON. No markdown formatting, no code blocks, no explanations - just pure JSON that matches the structure above."""
+{output}"""
 
     return prompt
 
-def create_fallback_roadmap(answers):
-    """Create a structured fallback roadmap if API fails"""
-    total_questions = len(answers)
-    total_score = sum(a['answer'] for a in answers)
-    max_score = total_questions * 2
-    percentage = (total_score / max_score * 100) if max_score > 0 else 0
-    
-    if percentage >= 75:
-        level = "Advanced"
-        phases = [
-            {
-                "name": "Algorithm Optimization & Analysis",
-                "duration": "2-3 weeks",
-                "concepts": ["Time complexity mastery", "Space optimization", "Algorithm design patterns", "Trade-off analysis"],
-                "goals": ["Master Big O notation", "Optimize existing algorithms", "Analyze complex algorithms"],
-                "description": "Deep dive into algorithmic efficiency and optimization techniques"
-            },
-            {
-                "name": "Expert Data Structures",
-                "duration": "3-4 weeks",
-                "concepts": ["AVL trees", "Red-black trees", "B-trees", "Advanced graph algorithms", "Segment trees"],
-                "goals": ["Implement advanced trees", "Solve expert-level problems", "Build production-ready structures"],
-                "description": "Master complex data structures used in real-world applications"
-            },
-            {
-                "name": "System Design & Applications",
-                "duration": "2-3 weeks",
-                "concepts": ["Cache implementation", "Database indexing", "Distributed systems", "Real-world applications"],
-                "goals": ["Design scalable systems", "Apply DS knowledge to architecture"],
-                "description": "Apply data structures to system design and architecture"
-            }
-        ]
-    elif percentage >= 50:
-        level = "Intermediate"
-        phases = [
-            {
-                "name": "Core Structures Mastery",
-                "duration": "2-3 weeks",
-                "concepts": ["Binary trees", "Hash tables", "Heaps", "Advanced recursion"],
-                "goals": ["Implement core structures from scratch", "Solve medium difficulty problems"],
-                "description": "Solidify understanding of fundamental data structures"
-            },
-            {
-                "name": "Algorithm Fundamentals",
-                "duration": "2-3 weeks",
-                "concepts": ["Binary search", "Merge sort", "Quick sort", "DFS and BFS", "Dynamic programming intro"],
-                "goals": ["Master common algorithms", "Understand time/space complexity"],
-                "description": "Learn essential algorithms and their applications"
-            },
-            {
-                "name": "Advanced Concepts Bridge",
-                "duration": "2 weeks",
-                "concepts": ["BST operations", "Graph representations", "Priority queues", "Backtracking"],
-                "goals": ["Connect concepts together", "Solve complex problems"],
-                "description": "Bridge to advanced topics and problem-solving"
-            }
-        ]
-    elif percentage >= 25:
-        level = "Beginner-Intermediate"
-        phases = [
-            {
-                "name": "Fundamental Structures",
-                "duration": "2 weeks",
-                "concepts": ["Arrays", "Linked lists", "Stacks", "Queues"],
-                "goals": ["Understand basic structures", "Implement from scratch", "Solve easy problems"],
-                "description": "Build strong foundation with core data structures"
-            },
-            {
-                "name": "Basic Algorithms",
-                "duration": "2 weeks",
-                "concepts": ["Linear search", "Bubble sort", "Selection sort", "Basic recursion"],
-                "goals": ["Understand algorithm basics", "Write clean implementations"],
-                "description": "Learn fundamental algorithms and problem-solving approaches"
-            },
-            {
-                "name": "Intermediate Preparation",
-                "duration": "2 weeks",
-                "concepts": ["Two pointers", "Sliding window", "Hash map usage", "Simple trees"],
-                "goals": ["Apply basic structures", "Prepare for intermediate topics"],
-                "description": "Bridge gap between basics and intermediate concepts"
-            }
-        ]
-    else:
-        level = "Beginner"
-        phases = [
-            {
-                "name": "Programming Fundamentals",
-                "duration": "1-2 weeks",
-                "concepts": ["Variables and data types", "Loops and conditions", "Functions", "Basic problem solving"],
-                "goals": ["Understand basic programming", "Write simple programs"],
-                "description": "Establish programming fundamentals needed for data structures"
-            },
-            {
-                "name": "Introduction to Data Structures",
-                "duration": "2-3 weeks",
-                "concepts": ["What are data structures", "Arrays basics", "Lists", "Simple operations"],
-                "goals": ["Understand why data structures matter", "Work with arrays"],
-                "description": "Gentle introduction to data structures concepts"
-            },
-            {
-                "name": "Basic Structures Practice",
-                "duration": "2 weeks",
-                "concepts": ["Array manipulation", "String operations", "Introduction to stacks and queues"],
-                "goals": ["Gain confidence with basics", "Solve beginner problems"],
-                "description": "Build confidence through practice with fundamental structures"
-            }
-        ]
-    
-    # Determine strengths and improvements
-    known_well = [a['question'] for a in answers if a['answer'] == 2]
-    not_known = [a['question'] for a in answers if a['answer'] == 0]
-    
+def validate_roadmap_section(key, value):
+    """Check that a generated section has the expected type and is not empty"""
+    expected_type = ROADMAP_SECTION_TYPES.get(key)
+    if expected_type is None or not isinstance(value, expected_type):
+        return False
+    if isinstance(value, str):
+        return bool(value.strip())
+    return len(value) > 0
+
+def sections_valid(result, sections):
+    """Every one of `sections` is present and valid in a generated reply"""
+    return isinstance(result, dict) and all(validate_roadmap_section(key, result.get(key)) for key in sections)
+
+# ----------------------------------------------------------------------------
+# Fallback roadmap templates
+#
+# The fallback roadmap is the same for every learner at a given level except
+# for the overview, currentLevel, strengths and improvements. The four level
+# templates are built once at import and their static sections pre-serialized
+# into read-only byte strings, so a fallback response only has to encode
+# those four fields.
+# ----------------------------------------------------------------------------
+
+FALLBACK_LEVEL_PHASES = {
+    "Advanced": [
+        {
+            "name": "Algorithm Optimization & Analysis",
+            "duration": "2-3 weeks",
+            "concepts": ["Time complexity mastery", "Space optimization", "Algorithm design patterns", "Trade-off analysis"],
+            "goals": ["Master Big O notation", "Optimize existing algorithms", "Analyze complex algorithms"],
+            "description": "Deep dive into algorithmic efficiency and optimization techniques"
+        },
+        {
+            "name": "Expert Data Structures",
+            "duration": "3-4 weeks",
+            "concepts": ["AVL trees", "Red-black trees", "B-trees", "Advanced graph algorithms", "Segment trees"],
+            "goals": ["Implement advanced trees", "Solve expert-level problems", "Build production-ready structures"],
+            "description": "Master complex data structures used in real-world applications"
+        },
+        {
+            "name": "System Design & Applications",
+            "duration": "2-3 weeks",
+            "concepts": ["Cache implementation", "Database indexing", "Distributed systems", "Real-world applications"],
+            "goals": ["Design scalable systems", "Apply DS knowledge to architecture"],
+            "description": "Apply data structures to system design and architecture"
+        }
+    ],
+    "Intermediate": [
+        {
+            "name": "Core Structures Mastery",
+            "duration": "2-3 weeks",
+            "concepts": ["Binary trees", "Hash tables", "Heaps", "Advanced recursion"],
+            "goals": ["Implement core structures from scratch", "Solve medium difficulty problems"],
+            "description": "Solidify understanding of fundamental data structures"
+        },
+        {
+            "name": "Algorithm Fundamentals",
+            "duration": "2-3 weeks",
+            "concepts": ["Binary search", "Merge sort", "Quick sort", "DFS and BFS", "Dynamic programming intro"],
+            "goals": ["Master common algorithms", "Understand time/space complexity"],
+            "description": "Learn essential algorithms and their applications"
+        },
+        {
+            "name": "Advanced Concepts Bridge",
+            "duration": "2 weeks",
+            "concepts": ["BST operations", "Graph representations", "Priority queues", "Backtracking"],
+            "goals": ["Connect concepts together", "Solve complex problems"],
+            "description": "Bridge to advanced topics and problem-solving"
+        }
+    ],
+    "Beginner-Intermediate": [
+        {
+            "name": "Fundamental Structures",
+            "duration": "2 weeks",
+            "concepts": ["Arrays", "Linked lists", "Stacks", "Queues"],
+            "goals": ["Understand basic structures", "Implement from scratch", "Solve easy problems"],
+            "description": "Build strong foundation with core data structures"
+        },
+        {
+            "name": "Basic Algorithms",
+            "duration": "2 weeks",
+            "concepts": ["Linear search", "Bubble sort", "Selection sort", "Basic recursion"],
+            "goals": ["Understand algorithm basics", "Write clean implementations"],
+            "description": "Learn fundamental algorithms and problem-solving approaches"
+        },
+        {
+            "name": "Intermediate Preparation",
+            "duration": "2 weeks",
+            "concepts": ["Two pointers", "Sliding window", "Hash map usage", "Simple trees"],
+            "goals": ["Apply basic structures", "Prepare for intermediate topics"],
+            "description": "Bridge gap between basics and intermediate concepts"
+        }
+    ],
+    "Beginner": [
+        {
+            "name": "Programming Fundamentals",
+            "duration": "1-2 weeks",
+            "concepts": ["Variables and data types", "Loops and conditions", "Functions", "Basic problem solving"],
+            "goals": ["Understand basic programming", "Write simple programs"],
+            "description": "Establish programming fundamentals needed for data structures"
+        },
+        {
+            "name": "Introduction to Data Structures",
+            "duration": "2-3 weeks",
+            "concepts": ["What are data structures", "Arrays basics", "Lists", "Simple operations"],
+            "goals": ["Understand why data structures matter", "Work with arrays"],
+            "description": "Gentle introduction to data structures concepts"
+        },
+        {
+            "name": "Basic Structures Practice",
+            "duration": "2 weeks",
+            "concepts": ["Array manipulation", "String operations", "Introduction to stacks and queues"],
+            "goals": ["Gain confidence with basics", "Solve beginner problems"],
+            "description": "Build confidence through practice with fundamental structures"
+        }
+    ]
+}
+
+FALLBACK_RESOURCES = {
+    "videos": [
+        "FreeCodeCamp - Data Structures Full Course",
+        "CS50 - Data Structures lectures",
+        "Abdul Bari - Algorithms",
+        "MIT OpenCourseWare - Introduction to Algorithms",
+        "mycodeschool - Data Structures"
+    ],
+    "articles": [
+        "GeeksforGeeks Data Structures tutorials",
+        "Programiz DS tutorials",
+        "Visualgo - Algorithm visualizations",
+        "Big-O Cheat Sheet",
+        "LeetCode Explore Cards"
+    ],
+    "practice": [
+        "LeetCode (start with Easy)",
+        "HackerRank (Data Structures track)",
+        "CodeSignal",
+        "Codewars",
+        "Exercism"
+    ],
+    "books": [
+        "Introduction to Algorithms (CLRS)",
+        "Cracking the Coding Interview",
+        "Data Structures and Algorithms in Python"
+    ]
+}
+
+FALLBACK_MILESTONES = [
+    {"title": "Foundation Complete", "description": "Understand and implement basic structures", "timeframe": "Week 2", "criteria": "Can implement array, list, stack, queue from scratch"},
+    {"title": "Algorithm Basics", "description": "Grasp fundamental algorithms", "timeframe": "Week 3", "criteria": "Can explain and code basic sorting and searching"},
+    {"title": "Problem Solver", "description": "Solve problems independently", "timeframe": "Week 4", "criteria": "Solve 10+ easy problems without hints"},
+    {"title": "Intermediate Ready", "description": "Ready for advanced topics", "timeframe": "Month 2", "criteria": "Comfortable with trees and graphs basics"}
+]
+
+FALLBACK_PRACTICE_STRATEGY = {
+    "approach": "Start with understanding concepts visually, then implement from scratch, finally solve problems. Focus on one structure at a time before combining them.",
+    "easyProblems": ["Array manipulations", "String operations", "Basic stack/queue usage", "Simple linked list operations"],
+    "mediumProblems": ["Tree traversals", "Hash map applications", "Two-pointer techniques", "Binary search variations"],
+    "hardProblems": ["Dynamic programming", "Complex graph problems", "Advanced tree operations", "Optimization challenges"],
+    "projects": [
+        "Build a text editor with undo/redo (stack)",
+        "Implement autocomplete (trie)",
+        "Create a task scheduler (priority queue)",
+        "Build a social network graph analyzer"
+    ]
+}
+
+FALLBACK_MOTIVATIONAL_TIPS = [
+    "Practice coding daily, even if just 30 minutes - consistency beats intensity",
+    "Visualize data structures using drawings or online tools before coding",
+    "Don't just memorize - understand WHY each structure works the way it does",
+    "Start with problems slightly above your comfort zone",
+    "Review and redo problems you found challenging",
+    "Join online communities to discuss solutions and approaches"
+]
+
+def _build_fallback_template(level, phases):
+    """Build the level-specific (answer-independent) sections of a fallback roadmap"""
     return {
-        "overview": f"Based on your assessment score of {percentage:.1f}%, you're at the {level} level in Data Structures and Algorithms. This personalized roadmap will guide you through systematic improvement tailored to your current knowledge.",
-        "currentLevel": f"{level} - You've demonstrated solid understanding in {len(known_well)} concepts and have room to grow in {len(not_known)} areas. With focused practice, you'll make significant progress.",
         "phases": phases,
         "weeklyPlan": [
             {
@@ -480,62 +398,10 @@ def create_fallback_roadmap(answers):
             {"concept": c, "why": "Essential foundation", "timeToLearn": "2-3 days", "prerequisites": "None"}
             for c in (phases[0]["concepts"][:5] if phases else ["Arrays", "Linked Lists"])
         ],
-        "resources": {
-            "videos": [
-                "FreeCodeCamp - Data Structures Full Course",
-                "CS50 - Data Structures lectures",
-                "Abdul Bari - Algorithms",
-                "MIT OpenCourseWare - Introduction to Algorithms",
-                "mycodeschool - Data Structures"
-            ],
-            "articles": [
-                "GeeksforGeeks Data Structures tutorials",
-                "Programiz DS tutorials",
-                "Visualgo - Algorithm visualizations",
-                "Big-O Cheat Sheet",
-                "LeetCode Explore Cards"
-            ],
-            "practice": [
-                "LeetCode (start with Easy)",
-                "HackerRank (Data Structures track)",
-                "CodeSignal",
-                "Codewars",
-                "Exercism"
-            ],
-            "books": [
-                "Introduction to Algorithms (CLRS)",
-                "Cracking the Coding Interview",
-                "Data Structures and Algorithms in Python"
-            ]
-        },
-        "milestones": [
-            {"title": "Foundation Complete", "description": "Understand and implement basic structures", "timeframe": "Week 2", "criteria": "Can implement array, list, stack, queue from scratch"},
-            {"title": "Algorithm Basics", "description": "Grasp fundamental algorithms", "timeframe": "Week 3", "criteria": "Can explain and code basic sorting and searching"},
-            {"title": "Problem Solver", "description": "Solve problems independently", "timeframe": "Week 4", "criteria": "Solve 10+ easy problems without hints"},
-            {"title": "Intermediate Ready", "description": "Ready for advanced topics", "timeframe": "Month 2", "criteria": "Comfortable with trees and graphs basics"}
-        ],
-        "practiceStrategy": {
-            "approach": "Start with understanding concepts visually, then implement from scratch, finally solve problems. Focus on one structure at a time before combining them.",
-            "easyProblems": ["Array manipulations", "String operations", "Basic stack/queue usage", "Simple linked list operations"],
-            "mediumProblems": ["Tree traversals", "Hash map applications", "Two-pointer techniques", "Binary search variations"],
-            "hardProblems": ["Dynamic programming", "Complex graph problems", "Advanced tree operations", "Optimization challenges"],
-            "projects": [
-                "Build a text editor with undo/redo (stack)",
-                "Implement autocomplete (trie)",
-                "Create a task scheduler (priority queue)",
-                "Build a social network graph analyzer"
-            ]
-        },
-        "motivationalTips": [
-            "Practice coding daily, even if just 30 minutes - consistency beats intensity",
-            "Visualize data structures using drawings or online tools before coding",
-            "Don't just memorize - understand WHY each structure works the way it does",
-            "Start with problems slightly above your comfort zone",
-            "Review and redo problems you found challenging",
-            "Join online communities to discuss solutions and approaches"
-        ],
-        "strengths": known_well[:4] if known_well else ["Building foundational knowledge", "Taking proactive steps to learn"],
-        "improvements": not_known[:5] if not_known else ["Continue building knowledge systematically"],
+        "resources": FALLBACK_RESOURCES,
+        "milestones": FALLBACK_MILESTONES,
+        "practiceStrategy": FALLBACK_PRACTICE_STRATEGY,
+        "motivationalTips": FALLBACK_MOTIVATIONAL_TIPS,
         "recommendations": [
             f"Focus on {level.lower()} level concepts appropriate for your current knowledge",
             "Implement each data structure from scratch at least once",
@@ -545,18 +411,596 @@ def create_fallback_roadmap(answers):
         ]
     }
 
+def _encode_members(mapping, keys):
+    """Pre-serialize `"key":value` members of a template, comma separated"""
+    return ','.join(
+        f"{json.dumps(key)}:{json.dumps(mapping[key], separators=(',', ':'))}" for key in keys
+    ).encode('utf-8')
+
+def _compile_fallback_templates():
+    templates = {}
+    for level, phases in FALLBACK_LEVEL_PHASES.items():
+        template = _build_fallback_template(level, phases)
+        templates[level] = MappingProxyType({
+            # Static members in response order: between currentLevel and strengths, then after improvements
+            'middle_json': _encode_members(template, ['phases', 'weeklyPlan', 'priorityConcepts', 'resources', 'milestones', 'practiceStrategy', 'motivationalTips']),
+            'tail_json': _encode_members(template, ['recommendations'])
+        })
+    return MappingProxyType(templates)
+
+FALLBACK_TEMPLATES = _compile_fallback_templates()
+
+def _fallback_dynamic_fields(answers):
+    """Return (level, dynamic sections) for a learner's fallback roadmap"""
+    total_questions = len(answers)
+    total_score = sum(a['answer'] for a in answers)
+    max_score = total_questions * 2
+    percentage = (total_score / max_score * 100) if max_score > 0 else 0
+    
+    level = get_performance_level(percentage)[0]
+    
+    # Determine strengths and improvements
+    known_well = [a['question'] for a in answers if a['answer'] == 2]
+    not_known = [a['question'] for a in answers if a['answer'] == 0]
+    
+    return level, {
+        "overview": f"Based on your assessment score of {percentage:.1f}%, you're at the {level} level in Data Structures and Algorithms. This personalized roadmap will guide you through systematic improvement tailored to your current knowledge.",
+        "currentLevel": f"{level} - You've demonstrated solid understanding in {len(known_well)} concepts and have room to grow in {len(not_known)} areas. With focused practice, you'll make significant progress.",
+        "strengths": known_well[:4] if known_well else ["Building foundational knowledge", "Taking proactive steps to learn"],
+        "improvements": not_known[:5] if not_known else ["Continue building knowledge systematically"]
+    }
+
+def encode_fallback_roadmap(answers):
+    """Return the fallback roadmap as UTF-8 JSON bytes, splicing the learner's
+    fields into the pre-serialized level template"""
+    level, dynamic = _fallback_dynamic_fields(answers)
+    template = FALLBACK_TEMPLATES[level]
+    dumps = json.dumps
+    
+    return b''.join((
+        b'{"overview":', dumps(dynamic['overview']).encode('utf-8'),
+        b',"currentLevel":', dumps(dynamic['currentLevel']).encode('utf-8'),
+        b',', template['middle_json'],
+        b',"strengths":', dumps(dynamic['strengths'], separators=(',', ':')).encode('utf-8'),
+        b',"improvements":', dumps(dynamic['improvements'], separators=(',', ':')).encode('utf-8'),
+        b',', template['tail_json'],
+        b'}'
+    ))
+
+def encode_fallback_response(answers, note=None):
+    """Return a complete fallback /api/generate-roadmap response body as JSON bytes"""
+    body = b'{"success":true,"roadmap":' + encode_fallback_roadmap(answers)
+    body += b',"course":"Data Structures and Algorithms","generated_by":"fallback"'
+    if note:
+        body += b',"note":' + json.dumps(note).encode('utf-8')
+    return body + b'}'
+
+def create_fallback_roadmap(answers):
+    """Create a structured fallback roadmap if API fails"""
+    return json.loads(encode_fallback_roadmap(answers))
+
+# ============================================================================
+# SECTION 3: STREAMING ROADMAP GENERATION
+# ============================================================================
+
+class RoadmapSectionParser:
+    """Incremental parser for the roadmap JSON object.
+    
+    Feed it raw model output as it streams in; every call returns the
+    top-level (key, value) pairs that became complete with that chunk.
+    Anything before the opening brace (e.g. a ```json fence) is ignored.
+    """
+    
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.depth = 0
+        self.started = False
+        self.finished = False
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, text):
+        """Consume a chunk of model output and return newly completed sections"""
+        if self.finished:
+            return []
+        
+        self.buffer += text
+        sections = []
+        
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            
+            if not self.started:
+                if ch == '{':
+                    self.started = True
+                    self.depth = 1
+                    self.buffer = self.buffer[self.pos + 1:]
+                    self.pos = 0
+                    continue
+                self.pos += 1
+                continue
+            
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.depth += 1
+            elif ch in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    sections.extend(self._complete_member())
+                    self.finished = True
+                    break
+            elif ch == ',' and self.depth == 1:
+                sections.extend(self._complete_member())
+                continue
+            
+            self.pos += 1
+        
+        return sections
+    
+    def _complete_member(self):
+        """Parse the member ending at the current position and drop it from the buffer"""
+        member = self.buffer[:self.pos].strip()
+        self.buffer = self.buffer[self.pos + 1:]
+        self.pos = 0
+        
+        if not member:
+            return []
+        
+        parsed = json.loads('{' + member + '}')
+        return list(parsed.items())
+
+STREAM_START_EVENT = {
+    'event': 'start',
+    'course': 'Data Structures and Algorithms',
+    'sections': ROADMAP_SECTIONS
+}
+
+def parse_stream_sections(parser, delta, emitted):
+    """Section events for every top-level member a content delta completes"""
+    events = []
+    for key, value in parser.feed(delta):
+        if key in emitted:
+            continue
+        emitted.add(key)
+        events.append({'event': 'section', 'section': key, 'data': value, 'generated_by': 'groq_api'})
+    return events
+
+def stream_fallback_events(answers, emitted):
+    """Fallback events for the sections not streamed, then the done event"""
+    missing = [key for key in ROADMAP_SECTIONS if key not in emitted]
+    if missing:
+        fallback_roadmap = create_fallback_roadmap(answers)
+        for key in missing:
+            yield {'event': 'section', 'section': key, 'data': fallback_roadmap[key], 'generated_by': 'fallback'}
+    
+    if not missing:
+        generated_by = 'groq_api'
+    elif len(missing) == len(ROADMAP_SECTIONS):
+        generated_by = 'fallback'
+    else:
+        generated_by = 'partial_fallback'
+    
+    yield {
+        'event': 'done',
+        'generated_by': generated_by,
+        'fallback_sections': missing
+    }
+
+def stream_roadmap_events(answers):
+    """Generate roadmap events, one per top-level section, as soon as each one parses.
+    
+    Sections the model never produced (or that were lost to an upstream or
+    parse error) are filled in from the fallback roadmap at the end, so the
+    client always receives the full set of ROADMAP_SECTIONS.
+    """
+    prompt = create_enhanced_roadmap_prompt(answers)
+    parser = RoadmapSectionParser()
+    emitted = set()
+    
+    yield STREAM_START_EVENT
+    
+    if governor.degraded('roadmap'):
+        yield from stream_fallback_events(answers, emitted)
+        return
+    
+    try:
+        for delta in stream_groq_api(prompt, max_tokens=4000, temperature=0.7, model=model_for('roadmap'), call_type='roadmap_stream'):
+            yield from parse_stream_sections(parser, delta, emitted)
+            if parser.finished:
+                break
+    except Exception as e:
+        print(f"Streaming error, filling remaining sections from fallback: {e}")
+    
+    yield from stream_fallback_events(answers, emitted)
+
+def format_stream_event(event, use_sse):
+    """Encode a roadmap event as an SSE frame or a single NDJSON line"""
+    data = json.dumps(event, ensure_ascii=False)
+    if use_sse:
+        return f"event: {event['event']}\ndata: {data}\n\n"
+    return data + '\n'
+
+# ============================================================================
+# SECTION 4: PARALLEL SECTIONAL ROADMAP GENERATION
+# ============================================================================
+
+# Independent section groups, each generated by its own smaller completion,
+# with the max_tokens budget for that group
+ROADMAP_SECTION_GROUPS = [
+    (['overview', 'currentLevel'], 400),
+    (['phases', 'weeklyPlan'], 1800),
+    (['resources', 'practiceStrategy'], 900),
+    (['priorityConcepts', 'milestones'], 1100),
+    (['motivationalTips', 'strengths', 'improvements', 'recommendations'], 700)
+]
+
+def generate_section_group(answers, sections, max_tokens):
+    """Generate one group of roadmap sections with a dedicated LLM call"""
+    prompt = create_enhanced_roadmap_prompt(answers, sections=sections)
+    result = routed_call_groq_api('roadmap', prompt, validate=lambda reply: sections_valid(reply, sections), call_type='roadmap_section', max_tokens=max_tokens, temperature=0.7)
+    
+    if not isinstance(result, dict):
+        raise ValueError(f"Expected a JSON object for sections {sections}")
+    
+    return result
+
+def generate_roadmap_sections(answers, groups):
+    """Run the given section groups concurrently.
+    
+    Returns (sections, failed) where `sections` holds every section that
+    came back valid and `failed` lists the ones that did not.
+    """
+    sections = {}
+    failed = []
+    
+    if governor.degraded('roadmap'):
+        # Under load every group comes from the fallback roadmap
+        return sections, [key for group, _ in groups for key in group]
+    
+    with ThreadPoolExecutor(max_workers=len(groups) or 1) as executor:
+        # Each group runs in the caller's context so it keeps the caller's LLM priority class
+        futures = {
+            executor.submit(contextvars.copy_context().run, generate_section_group, answers, group, max_tokens): group
+            for group, max_tokens in groups
+        }
+        
+        for future in as_completed(futures):
+            group = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Section group {group} failed: {e}")
+                result = {}
+            
+            collect_section_group(group, result, sections, failed)
+    
+    return sections, failed
+
+def collect_section_group(group, result, sections, failed):
+    """Sort one group's sections into `sections` (valid) and `failed`"""
+    for key in group:
+        value = result.get(key)
+        if validate_roadmap_section(key, value):
+            sections[key] = value
+        else:
+            failed.append(key)
+
+def generate_roadmap_parallel(answers):
+    """Generate the roadmap as concurrent section groups and merge the results.
+    
+    Groups that fail or return invalid sections are filled in from
+    create_fallback_roadmap, section by section.
+    Returns (roadmap, fallback_sections).
+    """
+    sections, failed = generate_roadmap_sections(answers, ROADMAP_SECTION_GROUPS)
+    return merge_parallel_roadmap(answers, sections, failed)
+
+def merge_parallel_roadmap(answers, sections, failed):
+    """Fill failed sections from the fallback; returns (roadmap, fallback_sections)"""
+    if failed:
+        fallback_roadmap = create_fallback_roadmap(answers)
+        for key in failed:
+            sections[key] = fallback_roadmap[key]
+    
+    roadmap = {key: sections[key] for key in ROADMAP_SECTIONS}
+    fallback_sections = [key for key in ROADMAP_SECTIONS if key in failed]
+    
+    return roadmap, fallback_sections
+
+# Notes on fallback roadmaps: upstream failure, or skipped by the load governor
+FALLBACK_NOTE = 'Generated using structured fallback due to API issue'
+DEGRADED_NOTE = 'Generated using structured fallback while the service is under heavy load'
+
+def build_roadmap_response(answers, mode=None, encode_fallback=False):
+    """Generate a roadmap and return the /api/generate-roadmap response body
+    
+    With `encode_fallback`, a fallback response is returned as pre-encoded
+    JSON bytes instead of a dict.
+    """
+    mode = mode or ROADMAP_MODE
+    
+    if governor.degraded('roadmap'):
+        print(f"Under load, serving fallback roadmap for {len(answers)} assessment answers")
+        return fallback_roadmap_response(answers, encode_fallback, note=DEGRADED_NOTE)
+    
+    print(f"Generating roadmap for {len(answers)} assessment answers (mode: {mode})")
+    
+    if mode == 'parallel':
+        return parallel_roadmap_response(*generate_roadmap_parallel(answers))
+    
+    # Generate enhanced prompt
+    prompt = create_enhanced_roadmap_prompt(answers)
+    
+    try:
+        # Call Groq API for roadmap generation
+        roadmap_data = routed_call_groq_api('roadmap', prompt, validate=lambda reply: sections_valid(reply, ROADMAP_SECTIONS), max_tokens=4000, temperature=0.7)
+        
+        return {
+            'success': True,
+            'roadmap': roadmap_data,
+            'course': 'Data Structures and Algorithms',
+            'generated_by': 'groq_api'
+        }
+        
+    except Exception as api_error:
+        print(f"API Error, using fallback: {api_error}")
+        return fallback_roadmap_response(answers, encode_fallback)
+
+def parallel_roadmap_response(roadmap_data, fallback_sections):
+    """Response body for a roadmap built from section groups"""
+    if not fallback_sections:
+        generated_by = 'groq_api_parallel'
+    elif len(fallback_sections) == len(ROADMAP_SECTIONS):
+        generated_by = 'fallback'
+    else:
+        generated_by = 'partial_fallback'
+    
+    return {
+        'success': True,
+        'roadmap': roadmap_data,
+        'course': 'Data Structures and Algorithms',
+        'generated_by': generated_by,
+        'fallback_sections': fallback_sections
+    }
+
+def fallback_roadmap_response(answers, encode_fallback=False, note=FALLBACK_NOTE):
+    """Response body when the single-call roadmap failed (or was skipped under load)"""
+    if encode_fallback:
+        return encode_fallback_response(answers, note=note)
+    
+    fallback_roadmap = create_fallback_roadmap(answers)
+    
+    return {
+        'success': True,
+        'roadmap': fallback_roadmap,
+        'course': 'Data Structures and Algorithms',
+        'generated_by': 'fallback',
+        'note': note
+    }
+
+def run_roadmap_job(payload):
+    """Job queue handler: build the roadmap response for a queued job
+    
+    Nobody is waiting on the response, so its LLM calls queue behind
+    interactive and synchronous roadmap calls.
+    """
+    usage_accounting.set_route('roadmap_job')
+    with priority_class('background'):
+        if payload.get('learner_id'):
+            return build_versioned_roadmap_response(payload['learner_id'], payload['answers'], payload.get('mode'))
+        return build_roadmap_response(payload['answers'], payload.get('mode'))
+
+# Bounded background worker pool for queued roadmap jobs, persisted to disk
+roadmap_jobs = RoadmapJobQueue(
+    run_roadmap_job,
+    db_path=os.getenv('ROADMAP_JOBS_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'roadmap_jobs.db')),
+    max_workers=int(os.getenv('ROADMAP_JOB_WORKERS', '2')),
+    max_queue_depth=int(os.getenv('ROADMAP_JOB_MAX_QUEUE', '100')),
+    callback_hosts=[host.strip() for host in os.getenv('ROADMAP_CALLBACK_HOSTS', '').split(',') if host.strip()]
+)
+registry.register_collector('roadmap_jobs', roadmap_jobs.metrics)
+
+def build_swr_roadmap_response(answers, mode=None, callback_url=None, learner_id=None):
+    """Stale-while-revalidate delivery: return the fallback roadmap now and
+    queue the personalized LLM roadmap under the same roadmap ID.
+    
+    The upgraded roadmap replaces the fallback in GET /api/roadmap/<id>
+    once it is ready, and is POSTed to `callback_url` if one was given.
+    """
+    fallback_response = {
+        'success': True,
+        'roadmap': create_fallback_roadmap(answers),
+        'course': 'Data Structures and Algorithms',
+        'generated_by': 'fallback'
+    }
+    
+    payload = {'answers': answers, 'mode': mode or ROADMAP_MODE}
+    if learner_id:
+        payload['learner_id'] = str(learner_id)
+    
+    job = roadmap_jobs.submit(
+        payload,
+        callback_url=callback_url,
+        provisional_result=fallback_response
+    )
+    
+    print(f"Served fallback roadmap, upgrading in background as {job['job_id']}")
+    
+    return {
+        **fallback_response,
+        'roadmap_id': job['job_id'],
+        'status_url': f"/api/roadmap/{job['job_id']}",
+        'upgrade_pending': True
+    }
+
+def parse_roadmap_request(data, args):
+    """Read /api/generate-roadmap options from the body and query string.
+    
+    Returns (options, error) where `error` is a message for a 400 response.
+    """
+    answers = data.get('answers', [])
+    if not answers:
+        return None, 'No assessment answers provided'
+    
+    callback_url = data.get('callback_url')
+    if callback_url:
+        try:
+            check_callback_url(str(callback_url), roadmap_jobs.callback_hosts)
+        except ValueError as e:
+            return None, str(e)
+    
+    return {
+        'answers': answers,
+        'mode': data.get('mode') or args.get('mode') or ROADMAP_MODE,
+        'delivery': data.get('delivery') or args.get('delivery') or ROADMAP_DELIVERY,
+        'callback_url': callback_url,
+        'learner_id': data.get('learner_id')
+    }, None
+
+# ============================================================================
+# SECTION 5: INCREMENTAL ROADMAP UPDATES (Assessment Retakes)
+# ============================================================================
+
+# Last few roadmaps per learner, with the answers they were generated from
+roadmap_versions = RoadmapVersionStore(
+    db_path=os.getenv('ROADMAP_VERSIONS_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'roadmap_versions.db'))
+)
+
+# Sections that mention the learner's individual answers
+ANSWER_DEPENDENT_SECTIONS = ['overview', 'currentLevel', 'priorityConcepts', 'strengths', 'improvements', 'recommendations']
+
+# Sections planned around the concepts the learner still needs to learn
+GAP_DEPENDENT_SECTIONS = ['phases', 'weeklyPlan']
+
+def get_assessment_level(answers):
+    """Return the user level for a set of answers, as used in the roadmap prompt"""
+    total_score = sum(a['answer'] for a in answers)
+    max_score = len(answers) * 2
+    percentage = (total_score / max_score * 100) if max_score > 0 else 0
+    return get_performance_level(percentage)[0]
+
+def get_affected_sections(previous, answers):
+    """Work out which sections of the previous roadmap a retake invalidates"""
+    diff = diff_answers(previous['answers'], answers)
+    
+    # Sections the previous roadmap is missing, has in the wrong shape, or
+    # could not generate for its answers (kept from older content)
+    stale = set(previous.get('stale_sections', []))
+    invalid = [key for key in ROADMAP_SECTIONS
+               if key in stale or not validate_roadmap_section(key, previous['roadmap'].get(key))]
+    
+    if not any(diff.values()):
+        return invalid, diff
+    
+    # A level change re-pitches every section
+    if get_assessment_level(previous['answers']) != get_assessment_level(answers):
+        return list(ROADMAP_SECTIONS), diff
+    
+    affected = set(ANSWER_DEPENDENT_SECTIONS) | set(invalid)
+    
+    old_gaps = {a['question'] for a in previous['answers'] if a['answer'] == 0}
+    new_gaps = {a['question'] for a in answers if a['answer'] == 0}
+    if old_gaps != new_gaps:
+        affected |= set(GAP_DEPENDENT_SECTIONS)
+    
+    return [key for key in ROADMAP_SECTIONS if key in affected], diff
+
+def build_versioned_roadmap_response(learner_id, answers, mode=None):
+    """Build a roadmap for a learner, regenerating only what a retake changed.
+    
+    The first roadmap for a learner (or one that came from the fallback) is
+    generated in full. After that, the new answers are diffed against the
+    stored ones and only the affected section groups are sent to the LLM;
+    every other section is reused from the previous version.
+    """
+    previous = roadmap_versions.latest(learner_id)
+    
+    if previous is None or previous['generated_by'] == 'fallback':
+        affected, diff = list(ROADMAP_SECTIONS), None
+    else:
+        affected, diff = get_affected_sections(previous, answers)
+    
+    if not affected:
+        print(f"Roadmap for learner {learner_id} unchanged, reusing version {previous['version']}")
+        return {
+            'success': True,
+            'roadmap': previous['roadmap'],
+            'course': 'Data Structures and Algorithms',
+            'generated_by': previous['generated_by'],
+            'learner_id': learner_id,
+            'version': previous['version'],
+            'regenerated_sections': [],
+            'reused_sections': list(ROADMAP_SECTIONS)
+        }
+    
+    if len(affected) == len(ROADMAP_SECTIONS):
+        response = build_roadmap_response(answers, mode)
+        stale = list(response.get('fallback_sections', []))
+        regenerated = [key for key in ROADMAP_SECTIONS if key not in stale]
+    else:
+        print(f"Retake for learner {learner_id}: regenerating {', '.join(affected)}")
+        
+        # Keep the usual grouping, trimmed to the affected sections
+        groups = []
+        for group, max_tokens in ROADMAP_SECTION_GROUPS:
+            subset = [key for key in group if key in affected]
+            if subset:
+                groups.append((subset, max(300, max_tokens * len(subset) // len(group))))
+        
+        sections, failed = generate_roadmap_sections(answers, groups)
+        
+        # Sections that failed to regenerate keep their previous content
+        roadmap = {key: sections.get(key, previous['roadmap'].get(key)) for key in ROADMAP_SECTIONS}
+        if failed:
+            fallback_roadmap = create_fallback_roadmap(answers)
+            for key in failed:
+                if not validate_roadmap_section(key, roadmap[key]):
+                    roadmap[key] = fallback_roadmap[key]
+        
+        regenerated = [key for key in affected if key in sections]
+        stale = [key for key in ROADMAP_SECTIONS if key in failed]
+        response = {
+            'success': True,
+            'roadmap': roadmap,
+            'course': 'Data Structures and Algorithms',
+            'generated_by': 'groq_api_incremental'
+        }
+    
+    version = roadmap_versions.save(learner_id, answers, response['roadmap'], response['generated_by'], stale)
+    
+    response.update({
+        'learner_id': learner_id,
+        'version': version,
+        'regenerated_sections': regenerated,
+        'reused_sections': [key for key in ROADMAP_SECTIONS if key not in regenerated and key not in stale]
+    })
+    if stale:
+        response['stale_sections'] = stale
+    if diff:
+        response['answer_changes'] = diff
+    
+    return response
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
 
-@app.route('/api/start', methods=['POST'])
+@bp.route('/api/start', methods=['POST'])
 def start_assessment():
     """Start a new assessment - generates first question"""
-    global asked_topics
     asked_topics.clear()
     
     try:
-        first_question = generate_question(1, [])
+        first_question = generate_question(1, [], asked_topics)
         return jsonify({
             'success': True,
             'question': first_question,
@@ -567,7 +1011,8 @@ def start_assessment():
         print(f"Error in start_assessment: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/next-question', methods=['POST'])
+@bp.route('/api/next-question', methods=['POST'])
+@idempotent
 def next_question():
     """Get next question based on previous answers"""
     try:
@@ -582,7 +1027,7 @@ def next_question():
                 'message': 'Assessment completed - ready for roadmap generation'
             })
         
-        next_q = generate_question(question_number, previous_answers)
+        next_q = generate_question(question_number, previous_answers, asked_topics)
         
         return jsonify({
             'success': True,
@@ -596,7 +1041,7 @@ def next_question():
         print(f"Error in next_question: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/complete-assessment', methods=['POST'])
+@bp.route('/api/complete-assessment', methods=['POST'])
 def complete_assessment():
     """Complete assessment and return score summary"""
     try:
@@ -639,7 +1084,8 @@ def complete_assessment():
         print(f"Error in complete_assessment: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/generate-roadmap', methods=['POST'])
+@bp.route('/api/generate-roadmap', methods=['POST'])
+@idempotent
 def generate_roadmap():
     """Generate personalized learning roadmap based on assessment results"""
     try:
@@ -649,43 +1095,26 @@ def generate_roadmap():
                 'success': False
             }), 500
         
-        data = request.get_json()
-        answers = data.get('answers', [])
-        
-        if not answers:
+        options, error = parse_roadmap_request(request.get_json(), request.args)
+        if error:
             return jsonify({
-                'error': 'No assessment answers provided',
+                'error': error,
                 'success': False
             }), 400
         
-        print(f"Generating roadmap for {len(answers)} assessment answers")
+        answers, mode = options['answers'], options['mode']
         
-        # Generate enhanced prompt
-        prompt = create_enhanced_roadmap_prompt(answers)
+        if options['delivery'] == 'swr':
+            return jsonify(build_swr_roadmap_response(answers, mode, options['callback_url'], options['learner_id'])), 200
         
-        try:
-            # Call Groq API for roadmap generation
-            roadmap_data = call_groq_api(prompt, max_tokens=4000, temperature=0.7)
-            
-            return jsonify({
-                'success': True,
-                'roadmap': roadmap_data,
-                'course': 'Data Structures and Algorithms',
-                'generated_by': 'groq_api'
-            }), 200
-            
-        except Exception as api_error:
-            print(f"API Error, using fallback: {api_error}")
-            # Use fallback roadmap
-            fallback_roadmap = create_fallback_roadmap(answers)
-            
-            return jsonify({
-                'success': True,
-                'roadmap': fallback_roadmap,
-                'course': 'Data Structures and Algorithms',
-                'generated_by': 'fallback',
-                'note': 'Generated using structured fallback due to API issue'
-            }), 200
+        if options['learner_id']:
+            return jsonify(build_versioned_roadmap_response(str(options['learner_id']), answers, mode)), 200
+        
+        body = build_roadmap_response(answers, mode, encode_fallback=True)
+        if isinstance(body, bytes):
+            return Response(body, status=200, mimetype='application/json')
+        
+        return jsonify(body), 200
     
     except Exception as e:
         print(f"Error in generate_roadmap: {e}")
@@ -696,7 +1125,95 @@ def generate_roadmap():
             'success': False
         }), 500
 
-@app.route('/health', methods=['GET'])
+@bp.route('/api/generate-roadmap/stream', methods=['POST'])
+def generate_roadmap_stream():
+    """Stream the roadmap section by section as NDJSON (default) or SSE"""
+    if not GROQ_API_KEY:
+        return jsonify({
+            'error': 'GROQ_API_KEY not configured',
+            'success': False
+        }), 500
+    
+    data = request.get_json(silent=True) or {}
+    answers = data.get('answers', [])
+    
+    if not answers:
+        return jsonify({
+            'error': 'No assessment answers provided',
+            'success': False
+        }), 400
+    
+    use_sse = request.args.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', '')
+    
+    print(f"Streaming roadmap for {len(answers)} assessment answers ({'sse' if use_sse else 'ndjson'})")
+    
+    def generate():
+        for event in stream_roadmap_events(answers):
+            yield format_stream_event(event, use_sse)
+    
+    return Response(
+        generate(),
+        mimetype='text/event-stream' if use_sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@bp.route('/api/roadmap', methods=['POST'])
+def enqueue_roadmap():
+    """Queue a roadmap generation job and return its ID immediately"""
+    try:
+        if not GROQ_API_KEY:
+            return jsonify({
+                'error': 'GROQ_API_KEY not configured',
+                'success': False
+            }), 500
+        
+        options, error = parse_roadmap_request(request.get_json(silent=True) or {}, request.args)
+        if error:
+            return jsonify({
+                'error': error,
+                'success': False
+            }), 400
+        
+        payload = {'answers': options['answers'], 'mode': options['mode']}
+        if options['learner_id']:
+            payload['learner_id'] = str(options['learner_id'])
+        job = roadmap_jobs.submit(payload, callback_url=options['callback_url'])
+        
+        print(f"Queued roadmap job {job['job_id']} ({roadmap_jobs.metrics()['queue_depth']} waiting)")
+        
+        return jsonify({
+            'success': True,
+            'job_id': job['job_id'],
+            'status': job['status'],
+            'status_url': f"/api/roadmap/{job['job_id']}"
+        }), 202
+    
+    except QueueFullError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except Exception as e:
+        print(f"Error in enqueue_roadmap: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@bp.route('/api/roadmap/metrics', methods=['GET'])
+def roadmap_job_metrics():
+    """Roadmap job queue depth and wait-time metrics"""
+    return jsonify(roadmap_jobs.metrics())
+
+@bp.route('/api/roadmap/<job_id>', methods=['GET'])
+def get_roadmap_job(job_id):
+    """Return the status of a roadmap job, with the roadmap once it has completed
+    
+    Pass ?wait=<seconds> (max 30) to long-poll until the job finishes.
+    """
+    wait = min(request.args.get('wait', 0, type=float), 30.0)
+    job = roadmap_jobs.wait(job_id, wait) if wait > 0 else roadmap_jobs.get(job_id)
+    
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown roadmap job ID'}), 404
+    
+    return jsonify({'success': True, **job})
+
+@bp.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
     return jsonify({
@@ -706,7 +1223,7 @@ def health():
         'service': 'Integrated Assessment & Roadmap Generator'
     })
 
-@app.route('/', methods=['GET'])
+@bp.route('/', methods=['GET'])
 def home():
     """API documentation"""
     return jsonify({
@@ -735,8 +1252,31 @@ def home():
                 'method': 'POST',
                 'description': 'Generate personalized learning roadmap from assessment',
                 'required': 'answers array from assessment',
+                'optional': 'mode: "single" (default) or "parallel" to generate section groups concurrently; delivery: "sync" (default) or "swr" to get the fallback roadmap immediately plus a roadmap_id that is upgraded in the background; learner_id to version roadmaps per learner and only regenerate sections a retake changes',
                 'response': 'Comprehensive personalized learning roadmap'
             },
+            '/api/generate-roadmap/stream': {
+                'method': 'POST',
+                'description': 'Stream the roadmap one section at a time as it is generated',
+                'required': 'answers array from assessment',
+                'response': 'NDJSON events (start, section, done); SSE with ?format=sse or Accept: text/event-stream'
+            },
+            '/api/roadmap': {
+                'method': 'POST',
+                'description': 'Queue roadmap generation in the background and return a job ID immediately',
+                'required': 'answers array from assessment',
+                'optional': 'mode, callback_url (receives a POST with the finished job)',
+                'response': 'job_id and status_url (HTTP 202)'
+            },
+            '/api/roadmap/<job_id>': {
+                'method': 'GET',
+                'description': 'Poll a queued roadmap job or a stale-while-revalidate roadmap_id (?wait=<seconds> to long-poll)',
+                'response': 'Job status (queued, running, completed, failed) and the roadmap once completed (or the provisional fallback while it runs)'
+            },
+            '/api/roadmap/metrics': {
+                'method': 'GET',
+                'description': 'Roadmap job queue depth, worker usage and wait times'
+            },
             '/health': {
                 'method': 'GET',
                 'description': 'Check API health and configuration status'
@@ -758,6 +1298,213 @@ def home():
         }
     }), 200
 
+# ============================================================================
+# ASYNC ENDPOINTS (ASGI app): same contracts, upstream calls are awaited
+# ============================================================================
+
+async def generate_roadmap_parallel_async(answers):
+    """Async generate_roadmap_parallel: the section groups are awaited together"""
+    async def generate_group(group, max_tokens):
+        prompt = create_enhanced_roadmap_prompt(answers, sections=group)
+        result = await async_routed_call_groq_api('roadmap', prompt, validate=lambda reply: sections_valid(reply, group), call_type='roadmap_section', max_tokens=max_tokens, temperature=0.7)
+        if not isinstance(result, dict):
+            raise ValueError(f"Expected a JSON object for sections {group}")
+        return result
+    
+    results = await asyncio.gather(
+        *(generate_group(group, max_tokens) for group, max_tokens in ROADMAP_SECTION_GROUPS),
+        return_exceptions=True
+    )
+    
+    sections = {}
+    failed = []
+    for (group, _), result in zip(ROADMAP_SECTION_GROUPS, results):
+        if isinstance(result, Exception):
+            print(f"Section group {group} failed: {result}")
+            result = {}
+        collect_section_group(group, result, sections, failed)
+    
+    return merge_parallel_roadmap(answers, sections, failed)
+
+async def build_roadmap_response_async(answers, mode=None, encode_fallback=False):
+    """Async build_roadmap_response"""
+    mode = mode or ROADMAP_MODE
+    
+    if governor.degraded('roadmap'):
+        print(f"Under load, serving fallback roadmap for {len(answers)} assessment answers")
+        return fallback_roadmap_response(answers, encode_fallback, note=DEGRADED_NOTE)
+    
+    print(f"Generating roadmap for {len(answers)} assessment answers (mode: {mode})")
+    
+    if mode == 'parallel':
+        return parallel_roadmap_response(*await generate_roadmap_parallel_async(answers))
+    
+    prompt = create_enhanced_roadmap_prompt(answers)
+    
+    try:
+        roadmap_data = await async_routed_call_groq_api('roadmap', prompt, validate=lambda reply: sections_valid(reply, ROADMAP_SECTIONS), max_tokens=4000, temperature=0.7)
+        
+        return {
+            'success': True,
+            'roadmap': roadmap_data,
+            'course': 'Data Structures and Algorithms',
+            'generated_by': 'groq_api'
+        }
+        
+    except Exception as api_error:
+        print(f"API Error, using fallback: {api_error}")
+        return fallback_roadmap_response(answers, encode_fallback)
+
+async def stream_roadmap_events_async(answers):
+    """Async stream_roadmap_events"""
+    prompt = create_enhanced_roadmap_prompt(answers)
+    parser = RoadmapSectionParser()
+    emitted = set()
+    
+    yield STREAM_START_EVENT
+    
+    if governor.degraded('roadmap'):
+        for event in stream_fallback_events(answers, emitted):
+            yield event
+        return
+    
+    try:
+        async for delta in async_stream_groq_api(prompt, max_tokens=4000, temperature=0.7, model=model_for('roadmap'), call_type='roadmap_stream'):
+            for event in parse_stream_sections(parser, delta, emitted):
+                yield event
+            if parser.finished:
+                break
+    except Exception as e:
+        print(f"Streaming error, filling remaining sections from fallback: {e}")
+    
+    for event in stream_fallback_events(answers, emitted):
+        yield event
+
+@async_routes.route('/api/start', methods=['POST'])
+async def start_assessment_async(req):
+    asked_topics.clear()
+    
+    try:
+        first_question = await generate_question_async(1, [], asked_topics)
+        return json_response({
+            'success': True,
+            'question': first_question,
+            'question_number': 1,
+            'total_questions': 5
+        })
+    except Exception as e:
+        print(f"Error in start_assessment: {e}")
+        return json_response({'success': False, 'error': str(e)}, 500)
+
+@async_routes.route('/api/next-question', methods=['POST'])
+@idempotent_async
+async def next_question_async(req):
+    try:
+        data = req.get_json()
+        previous_answers = data.get('previous_answers', [])
+        question_number = len(previous_answers) + 1
+        
+        if question_number > 5:
+            return json_response({
+                'success': True,
+                'completed': True,
+                'message': 'Assessment completed - ready for roadmap generation'
+            })
+        
+        next_q = await generate_question_async(question_number, previous_answers, asked_topics)
+        
+        return json_response({
+            'success': True,
+            'question': next_q,
+            'question_number': question_number,
+            'total_questions': 5,
+            'completed': False
+        })
+    
+    except Exception as e:
+        print(f"Error in next_question: {e}")
+        return json_response({'success': False, 'error': str(e)}, 500)
+
+@async_routes.route('/api/generate-roadmap', methods=['POST'])
+@idempotent_async
+async def generate_roadmap_async(req):
+    """Single and parallel roadmaps are awaited; SWR delivery and learner
+    versioning touch SQLite and run on a worker thread."""
+    try:
+        if not GROQ_API_KEY:
+            return json_response({
+                'error': 'GROQ_API_KEY not configured',
+                'success': False
+            }, 500)
+        
+        options, error = parse_roadmap_request(req.get_json(), req.args)
+        if error:
+            return json_response({
+                'error': error,
+                'success': False
+            }, 400)
+        
+        answers, mode = options['answers'], options['mode']
+        
+        if options['delivery'] == 'swr':
+            body = await asyncio.to_thread(build_swr_roadmap_response, answers, mode, options['callback_url'], options['learner_id'])
+            return json_response(body, 200)
+        
+        if options['learner_id']:
+            body = await asyncio.to_thread(build_versioned_roadmap_response, str(options['learner_id']), answers, mode)
+            return json_response(body, 200)
+        
+        body = await build_roadmap_response_async(answers, mode, encode_fallback=True)
+        if isinstance(body, bytes):
+            return AsyncResponse(body, 200)
+        
+        return json_response(body, 200)
+    
+    except Exception as e:
+        print(f"Error in generate_roadmap: {e}")
+        import traceback
+        traceback.print_exc()
+        return json_response({
+            'error': str(e),
+            'success': False
+        }, 500)
+
+@async_routes.route('/api/generate-roadmap/stream', methods=['POST'])
+async def generate_roadmap_stream_async(req):
+    if not GROQ_API_KEY:
+        return json_response({
+            'error': 'GROQ_API_KEY not configured',
+            'success': False
+        }, 500)
+    
+    data = req.get_json(silent=True) or {}
+    answers = data.get('answers', [])
+    
+    if not answers:
+        return json_response({
+            'error': 'No assessment answers provided',
+            'success': False
+        }, 400)
+    
+    use_sse = req.args.get('format') == 'sse' or 'text/event-stream' in req.headers.get('accept', '')
+    
+    print(f"Streaming roadmap for {len(answers)} assessment answers ({'sse' if use_sse else 'ndjson'})")
+    
+    async def generate():
+        async for event in stream_roadmap_events_async(answers):
+            yield format_stream_event(event, use_sse)
+    
+    return AsyncResponse(
+        generate(),
+        mimetype='text/event-stream' if use_sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Standalone app for running this service on its own
+app = Flask(__name__)
+CORS(app)
+app.register_blueprint(bp)
+
 if __name__ == '__main__':
     print("=" * 70)
     print("🚀 INTEGRATED ASSESSMENT & ROADMAP GENERATOR API")
@@ -781,4 +1528,8 @@ if __name__ == '__main__':
     print("=" * 70)
     print("\n🔥 Starting Flask server...\n")
     
+    # Only the reloader's child process serves requests, so only it runs jobs
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        roadmap_jobs.start()
+    
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,116 @@
+from flask import Flask, jsonify, request, g
+from flask_cors import CORS
+import os
+import time
+
+from metrics import registry
+from usage_accounting import accountant, set_route
+import lifecycle
+import ignite
+import analysis
+import ana_road
+import mit_resource
+
+# Every backend service, mounted under its own URL prefix
+SERVICES = [
+    (ignite.bp, '/chatbot', 'Data Structures chatbot'),
+    (analysis.bp, '/assessment', 'Adaptive assessment and scoring'),
+    (ana_road.bp, '/roadmap', 'Assessment and personalized roadmap generator'),
+    (mit_resource.bp, '/ocw', 'MIT OpenCourseWare finder')
+]
+
+def create_app():
+    """Build one Flask app serving all backend services.
+
+    The services share this process's LLM client (llm_client), cache
+    (cache.cache) and metrics registry (metrics.registry).
+    """
+    app = Flask(__name__)
+    CORS(app)
+
+    for blueprint, prefix, _ in SERVICES:
+        app.register_blueprint(blueprint, url_prefix=prefix)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.time()
+        # LLM calls made while handling this request are accounted to its endpoint
+        set_route(request.endpoint or 'unmatched')
+
+    @app.after_request
+    def record_request_metrics(response):
+        endpoint = request.endpoint or 'unmatched'
+        registry.inc('http_requests_total', endpoint=endpoint, status=response.status_code)
+        if 'request_start' in g:
+            registry.observe('http_request_seconds', time.time() - g.request_start, endpoint=endpoint)
+        return response
+
+    @app.route('/')
+    def home():
+        return jsonify({
+            'message': 'AI Ignite backend',
+            'services': {prefix: description for _, prefix, description in SERVICES},
+            'endpoints': {
+                '/health': 'GET - Check API health',
+                '/livez': 'GET - Liveness probe',
+                '/readyz': 'GET - Readiness probe (503 while starting or draining)',
+                '/metrics': 'GET - Shared request, LLM, cache and job metrics',
+                '/stats/usage': 'GET - Groq token usage and cost per call type and route (?minutes=N)'
+            }
+        })
+
+    @app.route('/health')
+    def health():
+        return jsonify({
+            'status': 'healthy',
+            'services': [prefix for _, prefix, _ in SERVICES]
+        })
+
+    @app.route('/metrics')
+    def metrics():
+        return jsonify(registry.snapshot())
+
+    @app.route('/stats/usage')
+    def usage_stats():
+        """Token usage, cost and latency over the rolling window, plus prompt size alerts"""
+        minutes = request.args.get('minutes', type=int)
+        if minutes is not None and minutes < 1:
+            return jsonify({'success': False, 'error': 'minutes must be a positive integer'}), 400
+        return jsonify({'success': True, **accountant.stats(minutes)})
+
+    @app.route('/livez')
+    def livez():
+        """Liveness probe: the process is up and serving requests"""
+        return jsonify({'status': 'alive'})
+
+    @app.route('/readyz')
+    def readyz():
+        """Readiness probe: fails before startup completes and while draining"""
+        body = {
+            'ready': lifecycle.is_ready(),
+            'draining': lifecycle.is_draining(),
+            'inflight_upstream_calls': lifecycle.inflight_count()
+        }
+        return jsonify(body), 200 if body['ready'] else 503
+
+    return app
+
+if __name__ == '__main__':
+    port = int(os.getenv('PORT', '5000'))
+
+    print("=" * 70)
+    print("🚀 AI IGNITE BACKEND (all services)")
+    print("=" * 70)
+    for _, prefix, description in SERVICES:
+        print(f"✓ {description}: http://localhost:{port}{prefix}/")
+    print(f"✓ Metrics: http://localhost:{port}/metrics")
+    print("=" * 70)
+
+    app = create_app()
+
+    # Only the reloader's child process serves requests, so only it runs jobs
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        ana_road.roadmap_jobs.start()
+        lifecycle.mark_ready()
+
+    app.run(debug=True, host='0.0.0.0', port=port)
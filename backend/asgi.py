@@ -0,0 +1,152 @@
+"""ASGI entry point: every backend service, with the upstream-bound routes async.
+
+Routes that wait on Groq or ocw.mit.edu have async versions (each service's
+`async_routes` table). They await their upstream calls and retry sleeps
+on the event loop instead of holding a thread each, so one process can keep
+thousands of upstream waits in flight. Every other route is served by the
+Flask app from app.create_app() through a bounded thread pool. URLs,
+request bodies and JSON responses are the same as the WSGI app's.
+
+Usage: python asgi.py [--bind 0.0.0.0:5000]   (production: python serve.py --mode async)
+"""
+import argparse
+import asyncio
+import os
+import time
+import traceback
+
+from a2wsgi import WSGIMiddleware
+
+from async_routes import AsyncRequest, AsyncResponse
+from metrics import registry
+import lifecycle
+import usage_accounting
+import llm_client
+import app as wsgi_app
+import ignite
+import analysis
+import ana_road
+import mit_resource
+
+# Async route tables, each mounted under its blueprint's prefix from app.SERVICES
+ASYNC_ROUTES = [ignite.async_routes, analysis.async_routes, ana_road.async_routes, mit_resource.async_routes]
+
+class BackendASGI:
+    """Dispatch to the async route tables, falling back to the Flask app"""
+    def __init__(self, flask_app, wsgi_threads=8, drain_timeout=30):
+        self.wsgi = WSGIMiddleware(flask_app, workers=wsgi_threads)
+        self.drain_timeout = drain_timeout
+        self.routes = {}
+
+        prefixes = {blueprint.name: prefix for blueprint, prefix, _ in wsgi_app.SERVICES}
+        for table in ASYNC_ROUTES:
+            for (method, path), route in table.routes.items():
+                self.routes[(method, prefixes[table.name] + path)] = route
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        route = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if route is None:
+            await self.wsgi(scope, receive, send)
+            return
+
+        await self.handle(route, scope, receive, send)
+
+    async def handle(self, route, scope, receive, send):
+        endpoint, handler = route
+        start = time.time()
+
+        body = b''
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        request = AsyncRequest(scope, body)
+        usage_accounting.set_route(endpoint)
+        try:
+            response = await handler(request)
+        except Exception:
+            traceback.print_exc()
+            response = AsyncResponse(b'Internal Server Error', 500, mimetype='text/plain')
+
+        registry.inc('http_requests_total', endpoint=endpoint, status=response.status)
+        registry.observe('http_request_seconds', time.time() - start, endpoint=endpoint)
+
+        content_type = response.mimetype
+        if content_type.startswith('text/'):
+            content_type += '; charset=utf-8'
+        headers = [(b'content-type', content_type.encode('latin-1'))]
+        headers += [(key.lower().encode('latin-1'), str(value).encode('latin-1')) for key, value in response.headers.items()]
+        # Same headers as CORS(app) in create_app: any origin, echoed back when sent
+        origin = request.headers.get('origin')
+        if origin:
+            headers.append((b'access-control-allow-origin', origin.encode('latin-1')))
+            headers.append((b'vary', b'Origin'))
+        else:
+            headers.append((b'access-control-allow-origin', b'*'))
+
+        if isinstance(response.body, bytes):
+            headers.append((b'content-length', str(len(response.body)).encode('latin-1')))
+            await send({'type': 'http.response.start', 'status': response.status, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': response.body})
+        else:
+            await send({'type': 'http.response.start', 'status': response.status, 'headers': headers})
+            await self.stream(response.body, receive, send)
+
+    async def stream(self, chunks, receive, send):
+        """Send an async iterator of chunks, stopping early if the client goes away"""
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            async for chunk in chunks:
+                if disconnected.done():
+                    break
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            await chunks.aclose()
+
+    @staticmethod
+    async def wait_for_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                ana_road.roadmap_jobs.start()
+                lifecycle.mark_ready()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # The server has stopped accepting connections and finished open requests
+                await asyncio.to_thread(lifecycle.drain, ana_road.roadmap_jobs, self.drain_timeout)
+                await llm_client.close_async_client()
+                await mit_resource.close_ocw_async_client()
+                usage_accounting.accountant.flush(final=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+def create_asgi_app(wsgi_threads=8, drain_timeout=30):
+    """Build the ASGI app; `wsgi_threads` bounds the pool serving the sync Flask routes"""
+    return BackendASGI(wsgi_app.create_app(), wsgi_threads=wsgi_threads, drain_timeout=drain_timeout)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', default=os.getenv('WEB_BIND', '0.0.0.0:5000'))
+    args = parser.parse_args()
+
+    host, port = args.bind.rsplit(':', 1)
+    print(f"🚀 AI IGNITE BACKEND (async) on http://{args.bind}/")
+    uvicorn.run(create_asgi_app(), host=host, port=int(port))
@@ -0,0 +1,59 @@
+"""Async route tables for the ASGI app (asgi.py).
+
+A service module that has async versions of its slow routes declares them
+on an AsyncRoutes table next to its Flask blueprint. asgi.py mounts each
+table under the same prefix as the blueprint. Requests that match an async
+route are awaited on the event loop. Every other request goes to the Flask
+app as usual.
+"""
+import json
+from urllib.parse import parse_qsl
+
+class AsyncRoutes:
+    """Async handlers for some of a blueprint's routes.
+
+    Handlers take an AsyncRequest and return an AsyncResponse. Endpoint
+    names default to the blueprint's (handler name minus its `_async`
+    suffix), so request metrics line up across both modes.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.routes = {}
+
+    def route(self, path, methods=('GET',), endpoint=None):
+        def decorator(handler):
+            name = endpoint or handler.__name__.removesuffix('_async')
+            for method in methods:
+                self.routes[(method, path)] = (f"{self.name}.{name}", handler)
+            return handler
+        return decorator
+
+class AsyncRequest:
+    """The parts of an ASGI request the async handlers use"""
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query_string = scope.get('query_string', b'')
+        self.args = dict(parse_qsl(self.query_string.decode('latin-1')))
+        self.headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope.get('headers', [])}
+        self.body = body
+
+    def get_json(self, silent=False):
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            if silent:
+                return None
+            raise
+
+class AsyncResponse:
+    """A response body as bytes, or an async iterator of str/bytes chunks to stream"""
+    def __init__(self, body, status=200, mimetype='application/json', headers=None):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.headers = headers or {}
+
+def json_response(body, status=200):
+    """Encode `body` the way Flask's jsonify does (sorted keys, compact, trailing newline)"""
+    return AsyncResponse((json.dumps(body, sort_keys=True, separators=(',', ':')) + '\n').encode('utf-8'), status)
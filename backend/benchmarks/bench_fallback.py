@@ -0,0 +1,108 @@
+"""Micro-benchmark for the fallback roadmap path.
+
+Compares rebuilding the fallback roadmap dict and serializing it on every
+request (the old behaviour) with splicing the learner's fields into the
+pre-serialized level templates, both as bare functions and through the
+/api/generate-roadmap route with the Groq call failing immediately.
+
+Usage: python benchmarks/bench_fallback.py [--seconds 2]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from flask import jsonify
+
+import ana_road
+
+ANSWERS = [
+    {'question': 'How well do you understand arrays?', 'answer': 2},
+    {'question': 'How familiar are you with linked lists?', 'answer': 1},
+    {'question': 'How well do you know stacks?', 'answer': 0},
+    {'question': 'How comfortable are you with queues?', 'answer': 2},
+    {'question': 'How well do you understand recursion?', 'answer': 1}
+]
+
+def legacy_fallback_roadmap(answers):
+    """Rebuild the whole fallback roadmap dict, as create_fallback_roadmap used to"""
+    level, dynamic = ana_road._fallback_dynamic_fields(answers)
+    template = ana_road._build_fallback_template(level, ana_road.FALLBACK_LEVEL_PHASES[level])
+    return {
+        'overview': dynamic['overview'],
+        'currentLevel': dynamic['currentLevel'],
+        **{k: v for k, v in template.items() if k != 'recommendations'},
+        'strengths': dynamic['strengths'],
+        'improvements': dynamic['improvements'],
+        'recommendations': template['recommendations']
+    }
+
+def measure(fn, seconds):
+    """Call fn repeatedly for about `seconds` and return calls per second"""
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(50):
+            fn()
+        calls += 50
+    return calls / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=2.0, help='time budget per measurement')
+    args = parser.parse_args()
+
+    # The pre-encoded body must decode to exactly what the old builder produced
+    assert json.loads(ana_road.encode_fallback_roadmap(ANSWERS)) == legacy_fallback_roadmap(ANSWERS)
+
+    def fail_fast(*_args, **_kwargs):
+        raise Exception('benchmark: upstream unavailable')
+
+    # ana_road calls Groq through the model router
+    ana_road.routed_call_groq_api = fail_fast
+    app = ana_road.app
+
+    @app.route('/bench/legacy-fallback', methods=['POST'])
+    def legacy_fallback_route():
+        ana_road.request.get_json()
+        return jsonify({
+            'success': True,
+            'roadmap': legacy_fallback_roadmap(ANSWERS),
+            'course': 'Data Structures and Algorithms',
+            'generated_by': 'fallback',
+            'note': 'Generated using structured fallback due to API issue'
+        }), 200
+
+    client = app.test_client()
+    body = {'answers': ANSWERS}
+
+    # Make sure the route row times the fallback path, not real upstream calls
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = client.post('/api/generate-roadmap', json=body)
+    assert response.get_json()['generated_by'] == 'fallback', response.get_json().get('generated_by')
+
+    results = [
+        ('build dict + json.dumps (legacy)', lambda: json.dumps(legacy_fallback_roadmap(ANSWERS)).encode('utf-8')),
+        ('encode_fallback_response (precompiled)', lambda: ana_road.encode_fallback_response(ANSWERS)),
+        ('create_fallback_roadmap (dict, precompiled)', lambda: ana_road.create_fallback_roadmap(ANSWERS)),
+        ('route: jsonify(dict) (legacy)', lambda: client.post('/bench/legacy-fallback', json=body)),
+        ('route: /api/generate-roadmap fallback', lambda: client.post('/api/generate-roadmap', json=body))
+    ]
+
+    print(f"{'path':<46}{'ops/s':>12}")
+    print('-' * 58)
+    for name, fn in results:
+        # The route logs every request; keep that out of the measurement
+        with contextlib.redirect_stdout(io.StringIO()):
+            rate = measure(fn, args.seconds)
+        print(f"{name:<46}{rate:>12,.0f}")
+
+if __name__ == '__main__':
+    main()
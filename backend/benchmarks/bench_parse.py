@@ -0,0 +1,113 @@
+"""Parse benchmark for scraped OCW pages.
+
+For each page it reports the median parse time and the tracemalloc peak
+of four variants:
+- a full tree with html.parser, which is what the scrapers used to build
+- the same page parsed with the SoupStrainer ocw_parsing applies to it
+- both again with lxml, when lxml is installed
+
+Pages come from --fixtures, a directory of saved pages. The file name
+prefix picks the strainer: search-*.html, course-*.html (course home
+pages, parsed for links and catalog info) and section-*.html (links).
+Without --fixtures, synthetic pages shaped like OCW's markup are
+generated: nav, footer and inline scripts around the part the scrapers
+read.
+
+Usage: python benchmarks/bench_parse.py [--fixtures DIR] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+import ocw_parsing
+
+STRAINERS = {
+    'search': ocw_parsing.SEARCH_RESULTS,
+    'course': ocw_parsing.COURSE_INFO,
+    'section': ocw_parsing.LINKS
+}
+
+def _chrome(body):
+    """OCW page chrome (head, navigation, footer, scripts) around `body`"""
+    nav = ''.join(f'<li class="nav-item"><a class="nav-link" href="/topics/{i}/">Topic {i}</a></li>' for i in range(120))
+    footer = ''.join(f'<div class="footer-col"><h4>Section {i}</h4><ul>' + ''.join(
+        f'<li><a href="/about/{i}-{j}/">Link {j}</a></li>' for j in range(12)) + '</ul></div>' for i in range(8))
+    script = '<script>window.__STATE__ = {' + ','.join(f'"k{i}": "{"x" * 40}"' for i in range(400)) + '};</script>'
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+        '<title>MIT OpenCourseWare | Free Online Course Materials</title>'
+        '<meta name="description" content="MIT OpenCourseWare course page">'
+        + ''.join(f'<link rel="stylesheet" href="/static/css/{i}.css">' for i in range(10)) + script +
+        f'</head><body><header><nav><ul class="navbar">{nav}</ul></nav></header>'
+        f'<div class="page-wrapper"><main id="main-content">{body}</main></div>'
+        f'<footer class="site-footer">{footer}</footer>{script}</body></html>'
+    )
+
+def synthetic_pages():
+    search = _chrome('<div class="search-results">' + ''.join(
+        f'<article class="resource"><div class="resource-meta"><span>6.{i:03d}</span></div>'
+        f'<h3><a href="/courses/6-{i:03d}-course-{i}-fall-2020/">Course {i}</a></h3>'
+        f'<p class="description">{"Description text. " * 12}</p></article>' for i in range(10)) + '</div>')
+    course = _chrome(
+        '<h1>Introduction to Algorithms</h1><div class="course-info">'
+        '<a href="/search/?d=Electrical%20Engineering%20and%20Computer%20Science">EECS</a></div>'
+        '<nav class="course-nav">' + ''.join(
+            f'<a href="/courses/6-006-intro-fall-2020/pages/{name}/">{name.title()}</a>'
+            for name in ('syllabus', 'calendar', 'lecture-notes', 'assignments', 'exams', 'readings')) + '</nav>'
+        + f'<section class="course-description"><p>{"About this course. " * 80}</p></section>')
+    section = _chrome('<table class="resources">' + ''.join(
+        f'<tr><td>L{i}</td><td><a href="/courses/6-006-intro-fall-2020/resources/lec{i}/">Lecture {i} notes</a></td>'
+        f'<td><a href="/courses/6-006-intro-fall-2020/lec{i}.pdf">Download File</a></td></tr>' for i in range(30)) + '</table>')
+    return {'search-synthetic.html': search.encode(), 'course-synthetic.html': course.encode(), 'section-synthetic.html': section.encode()}
+
+def load_fixtures(directory):
+    pages = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.html') and name.split('-', 1)[0] in STRAINERS:
+            with open(os.path.join(directory, name), 'rb') as f:
+                pages[name] = f.read()
+    return pages
+
+def measure(content, parser, strainer, repeat):
+    """(median seconds, peak bytes, elements built) of one parse configuration"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        BeautifulSoup(content, parser, parse_only=strainer)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    soup = BeautifulSoup(content, parser, parse_only=strainer)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak, len(soup.find_all(True))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', help='directory of saved OCW pages')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.fixtures) if args.fixtures else synthetic_pages()
+    if not pages:
+        sys.exit(f"No search-/course-/section-*.html pages in {args.fixtures}")
+
+    parsers = ['html.parser'] + (['lxml'] if ocw_parsing.DEFAULT_PARSER == 'lxml' else [])
+    print(f"{'page':28} {'KB':>6} {'parser':12} {'strainer':9} {'median ms':>10} {'peak KB':>9} {'elements':>9}")
+    for name, content in pages.items():
+        strainer = STRAINERS[name.split('-', 1)[0]]
+        for backend in parsers:
+            for label, only in (('none', None), ('targeted', strainer)):
+                seconds, peak, elements = measure(content, backend, only, args.repeat)
+                print(f"{name[:28]:28} {len(content) / 1024:6.0f} {backend:12} {label:9} "
+                      f"{seconds * 1000:10.2f} {peak / 1024:9.0f} {elements:9}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Closed-loop HTTP load generator for the backend.
+
+Runs --concurrency clients, each sending requests back to back for
+--duration seconds, and reports throughput and latency percentiles.
+Clients are threads by default; --async-clients runs them as asyncio tasks
+on plain keep-alive sockets, which is cheap enough to hold thousands of
+connections from the same machine.
+
+Usage:
+  python benchmarks/load_test.py http://127.0.0.1:5000/chatbot/chat \\
+      --json '{"message": "What is a stack?"}' --concurrency 32 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_load(url, body, concurrency, duration, timeout):
+    """Drive the target and return (latencies, errors, elapsed seconds)"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if body is None:
+                    response = session.get(url, timeout=timeout)
+                else:
+                    response = session.post(url, json=body, timeout=timeout)
+                ok = response.status_code < 500
+                error = None if ok else f"HTTP {response.status_code}"
+            except requests.exceptions.RequestException as e:
+                error = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                if error:
+                    errors.append(error)
+                else:
+                    latencies.append(elapsed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return latencies, errors, time.perf_counter() - started
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, connection closed)"""
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    status = int(head[0].split()[1])
+    headers = {name.strip().lower(): value.strip() for name, _, value in (line.partition(':') for line in head[1:] if line)}
+
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        return status, True
+
+    return status, headers.get('connection', '').lower() == 'close'
+
+def run_load_async(url, body, concurrency, duration, timeout):
+    """run_load with asyncio tasks on keep-alive sockets instead of threads (http:// only)"""
+    target = urlsplit(url)
+    host, port = target.hostname, target.port or 80
+    path = target.path + ('?' + target.query if target.query else '')
+
+    if body is None:
+        request_bytes = f"GET {path} HTTP/1.1\r\nHost: {target.netloc}\r\n\r\n".encode('latin-1')
+    else:
+        payload = json.dumps(body).encode('utf-8')
+        request_bytes = (f"POST {path} HTTP/1.1\r\nHost: {target.netloc}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(payload)}\r\n\r\n").encode('latin-1') + payload
+
+    latencies = []
+    errors = []
+
+    async def client(deadline):
+        writer = None
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                writer.write(request_bytes)
+                status, closed = await asyncio.wait_for(read_response(reader), timeout)
+                error = None if status < 500 else f"HTTP {status}"
+                if closed:
+                    writer.close()
+                    writer = None
+            except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                error = type(e).__name__
+                if writer is not None:
+                    writer.close()
+                    writer = None
+            elapsed = time.perf_counter() - start
+            if error:
+                errors.append(error)
+            else:
+                latencies.append(elapsed)
+        if writer is not None:
+            writer.close()
+
+    async def drive():
+        started = time.perf_counter()
+        await asyncio.gather(*(client(started + duration) for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(drive())
+    return latencies, errors, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url')
+    parser.add_argument('--json', help='JSON request body (sends POST); omit for GET')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--async-clients', action='store_true', help='drive the load from asyncio tasks instead of threads')
+    args = parser.parse_args()
+
+    body = json.loads(args.json) if args.json else None
+    run = run_load_async if args.async_clients else run_load
+    latencies, errors, elapsed = run(args.url, body, args.concurrency, args.duration, args.timeout)
+    latencies.sort()
+
+    print(f"target       {args.url}")
+    print(f"concurrency  {args.concurrency}")
+    print(f"requests     {len(latencies)} ok, {len(errors)} failed in {elapsed:.1f}s")
+    print(f"throughput   {len(latencies) / elapsed:.1f} req/s")
+    print(f"latency      p50 {percentile(latencies, 50) * 1000:.0f} ms   "
+          f"p95 {percentile(latencies, 95) * 1000:.0f} ms   p99 {percentile(latencies, 99) * 1000:.0f} ms")
+    if errors:
+        kinds = {kind: errors.count(kind) for kind in set(errors)}
+        print(f"errors       {kinds}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Stand-in for the Groq chat completions API, for load tests.
+
+Answers every POST with a canned completion after a fixed delay, so the
+backend's serving capacity can be measured without spending quota.
+Requests with "stream": true get the completion as server-sent events.
+Point the backend at it with GROQ_API_URL=http://127.0.0.1:<port>/.
+
+Usage: python benchmarks/mock_groq.py [--port 8099] [--latency 0.5]
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def build_handler(latency):
+    class MockGroqHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            prompt = body.get('messages', [{}])[-1].get('content', '')
+
+            if 'STRICT classifier' in prompt:
+                content = 'RELEVANT'
+            elif 'Generate the question NOW' in prompt:
+                content = '{"question": "How well do you know binary heaps?", "topic": "heaps (min/max heap)"}'
+            elif '**overview**' in prompt:
+                content = '{"overview": "You have a solid base to build on.", "currentLevel": "Intermediate"}'
+            else:
+                content = 'A stack is a LIFO structure: push and pop both work on the top element in O(1).'
+
+            time.sleep(latency)
+
+            usage = {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(content) // 4,
+                     'total_tokens': (len(prompt) + len(content)) // 4}
+            if body.get('stream'):
+                self.send_stream(content, usage)
+                return
+
+            payload = json.dumps({
+                'choices': [{'message': {'role': 'assistant', 'content': content}}],
+                'usage': usage
+            }).encode('utf-8')
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def send_stream(self, content, usage):
+            # A few delta chunks, usage in the last one (as Groq sends it), then the [DONE] sentinel
+            step = max(1, len(content) // 4)
+            events = [
+                'data: ' + json.dumps({'choices': [{'delta': {'content': content[i:i + step]}}]}) + '\n\n'
+                for i in range(0, len(content), step)
+            ]
+            events.append('data: ' + json.dumps({'choices': [{'delta': {}, 'finish_reason': 'stop'}], 'x_groq': {'usage': usage}}) + '\n\n')
+            payload = (''.join(events) + 'data: [DONE]\n\n').encode('utf-8')
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return MockGroqHandler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds to wait before answering')
+    args = parser.parse_args()
+
+    # Room for bursts of thousands of connections (the socketserver default backlog is 5)
+    ThreadingHTTPServer.request_queue_size = 4096
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), build_handler(args.latency))
+    server.daemon_threads = True
+    print(f"Mock Groq API on http://127.0.0.1:{args.port}/ ({args.latency}s latency)")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import registry
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache.db')
+
+class CacheBackend:
+    """Interface shared by every cache tier.
+
+    Keys are grouped into namespaces (e.g. 'chat_answers', 'ocw_search')
+    so each use site gets its own statistics. `get` returns `default` for
+    a missing or expired key; `set` stores a value for `ttl` seconds.
+    """
+
+    def get(self, namespace, key, default=None):
+        raise NotImplementedError
+
+    def set(self, namespace, key, value, ttl):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+    def get_or_set(self, namespace, key, fn, ttl):
+        """Return the cached value, or call fn(), cache its result and return it"""
+        missing = object()
+        value = self.get(namespace, key, missing)
+        if value is missing:
+            value = fn()
+            self.set(namespace, key, value, ttl)
+        return value
+
+class TTLCache(CacheBackend):
+    """In-process LRU cache with per-entry TTLs; the whole cache, or the
+    first tier of a TieredCache"""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {}
+
+    def _stat(self, namespace, field):
+        stats = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0, 'sets': 0})
+        stats[field] += 1
+
+    def get(self, namespace, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None or entry[1] < now:
+                if entry is not None:
+                    del self._entries[(namespace, key)]
+                self._stat(namespace, 'misses')
+                return default
+            self._entries.move_to_end((namespace, key))
+            self._stat(namespace, 'hits')
+            return entry[0]
+
+    def set(self, namespace, key, value, ttl, expires_at=None):
+        with self._lock:
+            self._entries[(namespace, key)] = (value, expires_at or time.time() + ttl)
+            self._entries.move_to_end((namespace, key))
+            self._stat(namespace, 'sets')
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            namespaces = {name: dict(stats) for name, stats in self._stats.items()}
+            size = len(self._entries)
+        return {'backend': 'memory', 'entries': size, 'max_entries': self.max_entries, 'namespaces': namespaces}
+
+class SQLiteCache(CacheBackend):
+    """Cache in a local SQLite file (WAL mode) shared by every worker process.
+
+    Values are stored as JSON, so they come back as lists/dicts (a cached
+    tuple is returned as a list). Size is bounded by entry count and total
+    value bytes; expired entries go first, then the least recently read.
+    Reads refresh an entry's recency at most once a minute, so hits stay
+    read-only most of the time.
+    """
+
+    # Check the size limits every this many writes
+    ENFORCE_EVERY = 100
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_entries=50000, max_bytes=256 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._writes = 0
+        self._evicted = 0
+        self._init_db()
+
+    def _connect(self):
+        # One connection per thread, reopened in a forked worker
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+
+    def _stat(self, namespace, field):
+        with self._lock:
+            stats = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0, 'sets': 0})
+            stats[field] += 1
+
+    def get_entry(self, namespace, key):
+        """Return (value, expires_at), or None if missing or expired"""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM cache WHERE namespace = ? AND key = ?",
+            (namespace, json.dumps(key))
+        ).fetchone()
+        if row is None or row[1] < now:
+            self._stat(namespace, 'misses')
+            return None
+
+        if now - row[2] > self.TOUCH_INTERVAL:
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, json.dumps(key)))
+        self._stat(namespace, 'hits')
+        return json.loads(row[0]), row[1]
+
+    def get(self, namespace, key, default=None):
+        entry = self.get_entry(namespace, key)
+        return default if entry is None else entry[0]
+
+    def set(self, namespace, key, value, ttl):
+        if ttl <= 0:
+            return
+        try:
+            encoded = json.dumps(value)
+        except (TypeError, ValueError) as e:
+            print(f"Not caching {namespace} value in the shared cache: {e}")
+            return
+
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, json.dumps(key), encoded, len(encoded), now + ttl, now)
+        )
+        self._stat(namespace, 'sets')
+
+        with self._lock:
+            self._writes += 1
+            enforce = self._writes % self.ENFORCE_EVERY == 1
+        if enforce:
+            self.enforce_limits()
+
+    def enforce_limits(self):
+        """Drop expired entries, then least recently read ones until within limits"""
+        conn = self._connect()
+        evicted = conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),)).rowcount
+
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if count > self.max_entries or total > self.max_bytes:
+            # Trim to 90% so the next few writes do not trigger another pass
+            keep_entries = int(self.max_entries * 0.9)
+            keep_bytes = int(self.max_bytes * 0.9)
+            kept, kept_bytes = 0, 0
+            cutoff = None
+            for accessed_at, size in conn.execute("SELECT accessed_at, size FROM cache ORDER BY accessed_at DESC"):
+                kept += 1
+                kept_bytes += size
+                if kept > keep_entries or kept_bytes > keep_bytes:
+                    cutoff = accessed_at
+                    break
+            if cutoff is not None:
+                evicted += conn.execute("DELETE FROM cache WHERE accessed_at <= ?", (cutoff,)).rowcount
+
+        with self._lock:
+            self._evicted += evicted
+
+    def stats(self):
+        rows = self._connect().execute(
+            "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE expires_at >= ? GROUP BY namespace",
+            (time.time(),)
+        ).fetchall()
+        with self._lock:
+            namespaces = {name: dict(stats) for name, stats in self._stats.items()}
+            evicted = self._evicted
+
+        # Entry counts and sizes are shared; hits/misses/sets are this process's
+        for namespace, count, size in rows:
+            namespaces.setdefault(namespace, {'hits': 0, 'misses': 0, 'sets': 0}).update(entries=count, bytes=size)
+
+        return {
+            'backend': 'sqlite',
+            'path': self.db_path,
+            'entries': sum(row[1] for row in rows),
+            'bytes': sum(row[2] for row in rows),
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'evicted': evicted,
+            'namespaces': namespaces
+        }
+
+class TieredCache(CacheBackend):
+    """In-process LRU in front of a shared tier.
+
+    Reads try the local tier, then the shared one; a shared hit is copied
+    into the local tier for the rest of its TTL. Writes go to both, so a
+    value one worker computed is a hit in every other worker.
+    """
+
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+
+    def get(self, namespace, key, default=None):
+        missing = object()
+        value = self.local.get(namespace, key, missing)
+        if value is not missing:
+            return value
+
+        try:
+            entry = self.shared.get_entry(namespace, key)
+        except sqlite3.Error as e:
+            print(f"Shared cache read failed: {e}")
+            entry = None
+        if entry is None:
+            return default
+
+        value, expires_at = entry
+        self.local.set(namespace, key, value, 0, expires_at=expires_at)
+        return value
+
+    def set(self, namespace, key, value, ttl):
+        self.local.set(namespace, key, value, ttl)
+        try:
+            self.shared.set(namespace, key, value, ttl)
+        except sqlite3.Error as e:
+            print(f"Shared cache write failed: {e}")
+
+    def stats(self):
+        local, shared = self.local.stats(), self.shared.stats()
+        namespaces = {}
+        for name in set(local['namespaces']) | set(shared['namespaces']):
+            local_stats = local['namespaces'].get(name, {})
+            shared_stats = shared['namespaces'].get(name, {})
+            namespaces[name] = {
+                'hits': local_stats.get('hits', 0) + shared_stats.get('hits', 0),
+                # A request misses only when the shared tier misses too
+                'misses': shared_stats.get('misses', 0),
+                'sets': shared_stats.get('sets', 0),
+                'local_hits': local_stats.get('hits', 0),
+                'shared_hits': shared_stats.get('hits', 0),
+                'shared_entries': shared_stats.get('entries', 0),
+                'shared_bytes': shared_stats.get('bytes', 0)
+            }
+        return {'backend': 'tiered', 'local': local, 'shared': shared, 'namespaces': namespaces}
+
+def create_cache(backend=None):
+    """Build the cache named by `backend` (or CACHE_BACKEND): memory, sqlite or tiered"""
+    backend = backend or os.getenv('CACHE_BACKEND', 'tiered')
+    if backend == 'memory':
+        return TTLCache(max_entries=int(os.getenv('CACHE_MAX_ENTRIES', '2048')))
+
+    shared = SQLiteCache(
+        db_path=os.getenv('CACHE_DB', DEFAULT_DB_PATH),
+        max_entries=int(os.getenv('CACHE_SHARED_MAX_ENTRIES', '50000')),
+        max_bytes=int(os.getenv('CACHE_SHARED_MAX_BYTES', str(256 * 1024 * 1024)))
+    )
+    if backend == 'sqlite':
+        return shared
+    if backend == 'tiered':
+        return TieredCache(TTLCache(max_entries=int(os.getenv('CACHE_MAX_ENTRIES', '2048'))), shared)
+    raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+
+# Shared cache for every backend service in this process
+cache = create_cache()
+registry.register_collector('cache', cache.stats)
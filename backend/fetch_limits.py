@@ -0,0 +1,127 @@
+"""Bounded reads of pages scraped from OCW.
+
+`/materials` accepts any course URL, so a scrape can land on a large PDF
+or an endless page. Reading `response.content` would hold that whole body
+in a worker before anything looks at it. BodyLimits streams bodies in
+chunks instead, and stops early:
+
+- before the body, if the Content-Type is not in the allow-list or the
+  Content-Length is over `max_bytes`
+- during the body, as soon as more than `max_bytes` have arrived
+
+Either way a FetchRejected (a requests RequestException) is raised, so
+callers handle it like any other failed fetch. A scrape therefore never
+holds more than `max_bytes` of body per page it is reading. Bodies held
+right now, and the most ever held at once, are in the stats.
+"""
+import os
+import threading
+
+import requests
+
+from metrics import registry
+
+DEFAULT_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+class FetchRejected(requests.exceptions.RequestException):
+    reason = 'rejected'
+
+class BodyTooLarge(FetchRejected):
+    reason = 'too_large'
+
+class UnsupportedContentType(FetchRejected):
+    reason = 'content_type'
+
+def media_type(headers):
+    return (headers.get('Content-Type') or '').split(';')[0].strip().lower()
+
+class BodyLimits:
+    """Size cap and Content-Type allow-list for streamed response bodies"""
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, max_bytes=5 * 1024 * 1024, content_types=DEFAULT_CONTENT_TYPES):
+        self.max_bytes = max_bytes
+        self.content_types = tuple(content_types)
+        self._lock = threading.Lock()
+        self._buffered = 0
+        self._peak_buffered = 0
+        self._largest = 0
+        self._rejected = {BodyTooLarge.reason: 0, UnsupportedContentType.reason: 0}
+
+    def _reject(self, error):
+        with self._lock:
+            self._rejected[error.reason] += 1
+        registry.inc('ocw_fetch_rejected_total', reason=error.reason)
+        return error
+
+    def check(self, url, status, headers):
+        """Reject a response from its headers, before any of the body is read"""
+        if not 200 <= status < 300:
+            # Error pages and 304s are small and never parsed as content
+            return
+        kind = media_type(headers)
+        if kind and kind not in self.content_types:
+            raise self._reject(UnsupportedContentType(f"{url} is {kind}, not a page"))
+        try:
+            length = int(headers.get('Content-Length') or 0)
+        except ValueError:
+            length = 0
+        if length > self.max_bytes:
+            raise self._reject(BodyTooLarge(f"{url} is {length} bytes (limit {self.max_bytes})"))
+
+    def _grow(self, size):
+        with self._lock:
+            self._buffered += size
+            self._peak_buffered = max(self._peak_buffered, self._buffered)
+
+    def _finish(self, held):
+        with self._lock:
+            self._buffered -= held
+
+    def _append(self, url, body, chunk):
+        if len(body) + len(chunk) > self.max_bytes:
+            raise self._reject(BodyTooLarge(f"{url} is over {self.max_bytes} bytes"))
+        body += chunk
+        self._grow(len(chunk))
+
+    def _done(self, body):
+        with self._lock:
+            self._largest = max(self._largest, len(body))
+        registry.observe('ocw_fetch_body_bytes', len(body))
+        return bytes(body)
+
+    def read(self, url, status, headers, chunks):
+        """Body from an iterator of byte chunks, within the limits"""
+        self.check(url, status, headers)
+        body = bytearray()
+        try:
+            for chunk in chunks:
+                self._append(url, body, chunk)
+            return self._done(body)
+        finally:
+            self._finish(len(body))
+
+    async def read_async(self, url, status, headers, chunks):
+        """Same as read, from an async iterator of byte chunks"""
+        self.check(url, status, headers)
+        body = bytearray()
+        try:
+            async for chunk in chunks:
+                self._append(url, body, chunk)
+            return self._done(body)
+        finally:
+            self._finish(len(body))
+
+    def stats(self):
+        with self._lock:
+            return {'max_bytes': self.max_bytes, 'content_types': list(self.content_types),
+                    'buffered_bytes': self._buffered, 'peak_buffered_bytes': self._peak_buffered,
+                    'largest_body_bytes': self._largest, 'rejected': dict(self._rejected)}
+
+# Limits for OCW pages fetched by the search and materials scrapers
+page_limits = BodyLimits(
+    max_bytes=int(os.getenv('OCW_FETCH_MAX_BYTES', str(5 * 1024 * 1024))),
+    content_types=[kind.strip() for kind in os.getenv('OCW_FETCH_CONTENT_TYPES', ','.join(DEFAULT_CONTENT_TYPES)).split(',') if kind.strip()]
+)
+registry.register_collector('ocw_fetch', page_limits.stats)
@@ -0,0 +1,356 @@
+"""On-disk HTTP cache for pages fetched from ocw.mit.edu.
+
+OCW course pages rarely change, yet every search and /materials click
+used to download the full HTML again. HTTPCache sits between the OCW
+service and its HTTP clients (requests for the Flask routes, httpx for
+the async ones), and keeps responses in a SQLite file shared by all
+workers:
+
+- A response stays fresh for its Cache-Control max-age (or Expires).
+  Without either, it stays fresh for 10% of its Last-Modified age, up to
+  a day. Fresh responses are served without a request.
+- Stale responses are revalidated with If-None-Match / If-Modified-Since.
+  A 304 refreshes the stored copy and downloads no body.
+- When OCW fails (connection error, timeout, 5xx), a stale copy is served
+  for up to `stale_if_error` seconds, or the response's own
+  stale-if-error. This does not apply under must-revalidate.
+- 404s are cached for `negative_ttl` seconds.
+- Entries are evicted least recently used first once the file holds more
+  than `max_bytes` of bodies.
+
+Responses marked no-store are not kept. no-cache ones are revalidated on
+every use.
+
+With `limits` (a fetch_limits.BodyLimits), bodies are streamed and
+rejected when too large or not a page. Rejections are not cached and
+never fall back to a stale copy.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from fetch_limits import FetchRejected, page_limits
+from metrics import registry
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'http_cache.db')
+
+CACHEABLE_STATUSES = (200, 203, 300, 301, 308)
+
+# Response headers kept with a cached body
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Expires', 'Date')
+
+OUTCOMES = ('hit', 'revalidated', 'miss', 'stale', 'negative_hit', 'uncacheable')
+
+class CachedResponse:
+    """The parts of a requests/httpx response the OCW parsers use"""
+
+    def __init__(self, url, status_code, headers, content, cache_status):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.cache_status = cache_status
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error for url: {self.url}", response=self)
+
+def parse_cache_control(value):
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"')
+    return directives
+
+def _seconds(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+def _http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+class HTTPCache:
+    """Conditional-GET cache of HTTP responses in a SQLite file"""
+
+    # Check the size limit every this many stores
+    ENFORCE_EVERY = 50
+    HEURISTIC_FRACTION = 0.1
+    HEURISTIC_MAX = 24 * 3600
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_bytes=256 * 1024 * 1024, negative_ttl=600, stale_if_error=86400,
+                 limits=None):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.negative_ttl = negative_ttl
+        self.stale_if_error = stale_if_error
+        self.limits = limits
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(OUTCOMES, 0)
+        self._stores = 0
+        self._evicted = 0
+        self._init_db()
+
+    # ------------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------------
+
+    def _connect(self):
+        # One connection per thread, reopened in a forked worker
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fresh_until REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                revalidate INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._connect().execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def _lookup(self, url):
+        row = self._connect().execute(
+            "SELECT status, headers, body, fresh_until, stale_until, revalidate FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._connect().execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        status, headers, body, fresh_until, stale_until, revalidate = row
+        return {'status': status, 'headers': json.loads(headers), 'body': body,
+                'fresh_until': fresh_until, 'stale_until': stale_until, 'revalidate': bool(revalidate)}
+
+    def _store(self, url, status, headers, body):
+        """Keep a response if its status and Cache-Control allow it; returns whether it was kept"""
+        now = time.time()
+        directives = parse_cache_control(headers.get('Cache-Control'))
+        if 'no-store' in directives:
+            return False
+
+        if status == 404:
+            fresh_until = now + self.negative_ttl
+        elif status in CACHEABLE_STATUSES:
+            fresh_until = now + self._freshness(headers, directives, now)
+        else:
+            return False
+
+        stale_if_error = _seconds(directives.get('stale-if-error'))
+        if 'must-revalidate' in directives:
+            stale_if_error = 0
+        stale_until = fresh_until + (self.stale_if_error if stale_if_error is None else stale_if_error)
+        kept = {name: headers[name] for name in STORED_HEADERS if name in headers}
+
+        self._connect().execute(
+            "INSERT OR REPLACE INTO responses (url, status, headers, body, size, fresh_until, stale_until, revalidate, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, status, json.dumps(kept), body, len(body), fresh_until, stale_until, int('no-cache' in directives), now)
+        )
+        with self._lock:
+            self._stores += 1
+            enforce = self._stores % self.ENFORCE_EVERY == 1
+        if enforce:
+            self.enforce_limit()
+        return True
+
+    def _refresh(self, url, entry, headers):
+        """Apply a 304's headers to the stored entry"""
+        merged = CaseInsensitiveDict(entry['headers'])
+        merged.update({name: headers[name] for name in STORED_HEADERS if name in headers})
+        self._store(url, entry['status'], merged, entry['body'])
+        return merged
+
+    def _freshness(self, headers, directives, now):
+        if 'no-cache' in directives:
+            return 0
+        max_age = _seconds(directives.get('max-age'))
+        if max_age is not None:
+            return max(0, max_age - (_seconds(headers.get('Age')) or 0))
+        expires = _http_date(headers.get('Expires'))
+        if expires is not None:
+            return max(0, expires - (_http_date(headers.get('Date')) or now))
+        last_modified = _http_date(headers.get('Last-Modified'))
+        if last_modified is not None:
+            return min(self.HEURISTIC_MAX, max(0, now - last_modified) * self.HEURISTIC_FRACTION)
+        return 0
+
+    def enforce_limit(self):
+        """Evict least recently used responses until the bodies fit in max_bytes"""
+        conn = self._connect()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% so the next few stores do not trigger another pass
+        excess = total - int(self.max_bytes * 0.9)
+        cutoff, freed = None, 0
+        for accessed_at, size in conn.execute("SELECT accessed_at, size FROM responses ORDER BY accessed_at"):
+            freed += size
+            cutoff = accessed_at
+            if freed >= excess:
+                break
+        evicted = conn.execute("DELETE FROM responses WHERE accessed_at <= ?", (cutoff,)).rowcount
+        with self._lock:
+            self._evicted += evicted
+
+    # ------------------------------------------------------------------------
+    # Fetching
+    # ------------------------------------------------------------------------
+
+    def _count(self, outcome):
+        with self._lock:
+            self._counts[outcome] += 1
+        registry.inc('http_cache_requests_total', outcome=outcome)
+
+    def _before(self, url, headers):
+        """(stored entry, response to serve without a request, request headers)"""
+        try:
+            entry = self._lookup(url)
+        except sqlite3.Error as e:
+            print(f"HTTP cache read failed: {e}")
+            entry = None
+        if entry is None:
+            return None, None, headers
+
+        if not entry['revalidate'] and entry['fresh_until'] >= time.time():
+            self._count('negative_hit' if entry['status'] == 404 else 'hit')
+            return entry, CachedResponse(url, entry['status'], entry['headers'], entry['body'], 'hit'), headers
+
+        conditional = dict(headers)
+        if entry['status'] != 404:
+            stored = CaseInsensitiveDict(entry['headers'])
+            if stored.get('ETag'):
+                conditional['If-None-Match'] = stored['ETag']
+            if stored.get('Last-Modified'):
+                conditional['If-Modified-Since'] = stored['Last-Modified']
+        return entry, None, conditional
+
+    def _after(self, url, entry, status, headers, body):
+        """Store or refresh from the upstream answer and return what the caller gets"""
+        if status == 304 and entry is not None:
+            self._count('revalidated')
+            merged = self._safely(self._refresh, url, entry, headers) or entry['headers']
+            return CachedResponse(url, entry['status'], merged, entry['body'], 'revalidated')
+
+        if status >= 500 and self._usable_stale(entry):
+            return self._stale(url, entry)
+
+        kept = self._safely(self._store, url, status, headers, body)
+        self._count('miss' if kept else 'uncacheable')
+        return CachedResponse(url, status, headers, body, 'miss')
+
+    def _safely(self, fn, *args):
+        try:
+            return fn(*args)
+        except sqlite3.Error as e:
+            print(f"HTTP cache write failed: {e}")
+            return None
+
+    def _usable_stale(self, entry):
+        return entry is not None and entry['status'] != 404 and entry['stale_until'] >= time.time()
+
+    def _stale(self, url, entry):
+        self._count('stale')
+        return CachedResponse(url, entry['status'], entry['headers'], entry['body'], 'stale')
+
+    def get(self, session, url, headers=None, timeout=10):
+        """GET `url` with a requests session, through the cache"""
+        entry, response, request_headers = self._before(url, headers or {})
+        if response is not None:
+            return response
+        try:
+            status, upstream_headers, body = self._download(session, url, request_headers, timeout)
+        except FetchRejected:
+            raise
+        except requests.exceptions.RequestException:
+            if self._usable_stale(entry):
+                return self._stale(url, entry)
+            raise
+        return self._after(url, entry, status, upstream_headers, body)
+
+    def _download(self, session, url, headers, timeout):
+        if self.limits is None:
+            upstream = session.get(url, headers=headers, timeout=timeout)
+            return upstream.status_code, upstream.headers, upstream.content
+        with session.get(url, headers=headers, timeout=timeout, stream=True) as upstream:
+            body = self.limits.read(url, upstream.status_code, upstream.headers,
+                                    upstream.iter_content(self.limits.CHUNK_SIZE))
+            return upstream.status_code, upstream.headers, body
+
+    async def get_async(self, client, url, headers=None):
+        """GET `url` with an httpx client, through the cache (storage runs on a worker thread)"""
+        entry, response, request_headers = await asyncio.to_thread(self._before, url, headers or {})
+        if response is not None:
+            return response
+        if self.limits is None:
+            fetch = self._download_async(client, url, request_headers)
+        else:
+            fetch = self._stream_async(client, url, request_headers)
+        try:
+            status, upstream_headers, body = await fetch
+        except FetchRejected:
+            raise
+        except Exception:
+            if self._usable_stale(entry):
+                return self._stale(url, entry)
+            raise
+        return await asyncio.to_thread(self._after, url, entry, status, upstream_headers, body)
+
+    async def _download_async(self, client, url, headers):
+        upstream = await client.get(url, headers=headers)
+        return upstream.status_code, upstream.headers, upstream.content
+
+    async def _stream_async(self, client, url, headers):
+        async with client.stream('GET', url, headers=headers) as upstream:
+            body = await self.limits.read_async(url, upstream.status_code, upstream.headers,
+                                                upstream.aiter_bytes(self.limits.CHUNK_SIZE))
+            return upstream.status_code, upstream.headers, body
+
+    def stats(self):
+        try:
+            entries, total = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        except sqlite3.Error:
+            entries, total = None, None
+        with self._lock:
+            counts = dict(self._counts)
+            evicted = self._evicted
+        return {'path': self.db_path, 'entries': entries, 'bytes': total, 'max_bytes': self.max_bytes,
+                'evicted': evicted, 'requests': counts}
+
+# Shared HTTP cache for OCW pages in this process
+http_cache = HTTPCache(
+    db_path=os.getenv('HTTP_CACHE_DB', DEFAULT_DB_PATH),
+    max_bytes=int(os.getenv('HTTP_CACHE_MAX_BYTES', str(256 * 1024 * 1024))),
+    negative_ttl=int(os.getenv('HTTP_CACHE_NEGATIVE_TTL', '600')),
+    stale_if_error=int(os.getenv('HTTP_CACHE_STALE_IF_ERROR', '86400')),
+    limits=page_limits
+)
+registry.register_collector('http_cache', http_cache.stats)
@@ -0,0 +1,226 @@
+"""Idempotency-Key support for the LLM-backed POST endpoints.
+
+The Flutter client retries requests on flaky connections. A request that
+sends an `Idempotency-Key` header runs once: a duplicate (same key, path
+and body) arriving while the first is still running waits for it, and one
+arriving later within the TTL gets the stored response, marked with an
+`Idempotent-Replayed: true` header. Neither makes another Groq call, and
+an assessment's asked topics are only updated once.
+
+Reusing a key with a different body is rejected with 422. Responses with a
+5xx status are not stored, so the client's next retry runs again. The
+store is bounded (least recently used completed entries are evicted) and
+per process.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request, jsonify, make_response, Response
+
+from async_routes import AsyncResponse, json_response
+from metrics import registry
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Response headers worth replaying along with the body
+REPLAYED_HEADERS = ('Content-Type', 'Location', 'Retry-After')
+
+class _Entry:
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.response = None        # (status, body, headers) once completed
+        self.expires_at = None
+        self.waiters = []           # callbacks run when the first request finishes
+
+class IdempotencyStore:
+    """Bounded TTL store of responses by (path, Idempotency-Key)"""
+
+    def __init__(self, max_entries=1024, ttl=600, wait_timeout=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def begin(self, scope, fingerprint, on_done):
+        """Claim `scope` or join it.
+
+        Returns ('run', None) when the caller should handle the request,
+        ('replay', response) for a stored response, ('mismatch', None) when
+        the key was used with a different body, or ('wait', None) after
+        registering `on_done` to be called when the running request ends.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(scope)
+            if entry is not None and entry.expires_at is not None and entry.expires_at < now:
+                del self._entries[scope]
+                entry = None
+
+            if entry is None:
+                self._entries[scope] = _Entry(fingerprint)
+                self._evict()
+                return 'run', None
+
+            if entry.fingerprint != fingerprint:
+                return 'mismatch', None
+
+            if entry.response is not None:
+                self._entries.move_to_end(scope)
+                return 'replay', entry.response
+
+            entry.waiters.append(on_done)
+            return 'wait', None
+
+    def complete(self, scope, response):
+        """Store the first request's response, or drop the claim if `response` is None"""
+        with self._lock:
+            entry = self._entries.get(scope)
+            if entry is None:
+                return
+            if response is None:
+                del self._entries[scope]
+            else:
+                entry.response = response
+                entry.expires_at = time.time() + self.ttl
+            waiters, entry.waiters = entry.waiters, []
+
+        for on_done in waiters:
+            on_done()
+
+    def stats(self):
+        with self._lock:
+            pending = sum(1 for entry in self._entries.values() if entry.response is None)
+            return {'entries': len(self._entries), 'in_flight': pending, 'max_entries': self.max_entries, 'ttl_seconds': self.ttl}
+
+    def _evict(self):
+        """Drop the least recently used completed entries beyond max_entries"""
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        for scope in [scope for scope, entry in self._entries.items() if entry.response is not None][:excess]:
+            del self._entries[scope]
+
+# Shared store for every service in this process
+store = IdempotencyStore(
+    max_entries=int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', '1024')),
+    ttl=int(os.getenv('IDEMPOTENCY_TTL', '600')),
+    wait_timeout=float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', '60'))
+)
+registry.register_collector('idempotency', store.stats)
+
+def fingerprint(body, query_string):
+    """Digest of the request; JSON bodies are compared by content, not formatting"""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(',', ':')).encode('utf-8')
+    except ValueError:
+        pass
+    return hashlib.sha256(query_string + b'?' + body).hexdigest()
+
+def _stored(status, body, headers):
+    if status >= 500:
+        return None
+    return status, body, [(name, headers[name]) for name in REPLAYED_HEADERS if name in headers]
+
+# Error bodies; the client should not retry these with the same key unchanged
+KEY_TOO_LONG = {'success': False, 'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}
+KEY_REUSED = {'success': False, 'error': f'{HEADER} was already used with a different request body'}
+STILL_RUNNING = {'success': False, 'error': f'A request with this {HEADER} is still in progress; retry later'}
+
+def idempotent(view):
+    """Flask view decorator (below @bp.route) honouring the Idempotency-Key header"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify(KEY_TOO_LONG), 400
+
+        scope = (request.path, key)
+        digest = fingerprint(request.get_data(), request.query_string)
+        waited = False
+        while True:
+            done = threading.Event()
+            action, stored = store.begin(scope, digest, done.set)
+            if action == 'run':
+                break
+            if action == 'mismatch':
+                registry.inc('idempotency_requests_total', outcome='mismatch')
+                return jsonify(KEY_REUSED), 422
+            if action == 'replay':
+                registry.inc('idempotency_requests_total', outcome='waited' if waited else 'replayed')
+                status, body, headers = stored
+                return Response(body, status=status, headers=headers + [('Idempotent-Replayed', 'true')])
+            if not done.wait(store.wait_timeout):
+                registry.inc('idempotency_requests_total', outcome='timeout')
+                return jsonify(STILL_RUNNING), 409
+            # The first request finished: replay its response, or run ourselves if it failed
+            waited = True
+
+        registry.inc('idempotency_requests_total', outcome='new')
+        response = None
+        try:
+            response = make_response(view(*args, **kwargs))
+        finally:
+            if response is None or response.is_streamed:
+                store.complete(scope, None)
+            else:
+                store.complete(scope, _stored(response.status_code, response.get_data(), response.headers))
+        return response
+    return wrapper
+
+def idempotent_async(handler):
+    """AsyncRoutes handler decorator (below @async_routes.route), same contract as idempotent"""
+    @functools.wraps(handler)
+    async def wrapper(req):
+        key = req.headers.get(HEADER.lower())
+        if not key:
+            return await handler(req)
+        if len(key) > MAX_KEY_LENGTH:
+            return json_response(KEY_TOO_LONG, 400)
+
+        scope = (req.path, key)
+        digest = fingerprint(req.body, req.query_string)
+        loop = asyncio.get_running_loop()
+        waited = False
+        while True:
+            done = loop.create_future()
+            action, stored = store.begin(scope, digest, lambda: loop.call_soon_threadsafe(lambda: done.done() or done.set_result(None)))
+            if action == 'run':
+                break
+            if action == 'mismatch':
+                registry.inc('idempotency_requests_total', outcome='mismatch')
+                return json_response(KEY_REUSED, 422)
+            if action == 'replay':
+                registry.inc('idempotency_requests_total', outcome='waited' if waited else 'replayed')
+                status, body, headers = stored
+                headers = dict(headers)
+                mimetype = headers.pop('Content-Type', 'application/json').split(';')[0]
+                return AsyncResponse(body, status, mimetype=mimetype, headers={**headers, 'Idempotent-Replayed': 'true'})
+            try:
+                await asyncio.wait_for(done, store.wait_timeout)
+            except asyncio.TimeoutError:
+                registry.inc('idempotency_requests_total', outcome='timeout')
+                return json_response(STILL_RUNNING, 409)
+            waited = True
+
+        registry.inc('idempotency_requests_total', outcome='new')
+        response = None
+        try:
+            response = await handler(req)
+        finally:
+            if response is None or not isinstance(response.body, bytes):
+                store.complete(scope, None)
+            else:
+                content_type = response.mimetype + ('; charset=utf-8' if response.mimetype.startswith('text/') else '')
+                store.complete(scope, _stored(response.status, response.body, {'Content-Type': content_type, **response.headers}))
+        return response
+    return wrapper
@@ -1,18 +1,23 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify
 from flask_cors import CORS
-import requests
-import json
 import os
+import re
+import requests
 
-app = Flask(__name__)
-CORS(app)
+from llm_client import GROQ_API_KEY, routed_chat_completion, async_routed_chat_completion
+from cache import cache
+from async_routes import AsyncRoutes, json_response
+from idempotency import idempotent, idempotent_async
+from load_governor import governor
 
-# Configuration
-import os
+bp = Blueprint('chatbot', __name__)
+async_routes = AsyncRoutes('chatbot')
+
+# How long classifications/answers stay cached (seconds); models come from model_router
+CHAT_CACHE_TTL = int(os.getenv('CHAT_CACHE_TTL', '3600'))
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-  # Get free API key from https://console.groq.com
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+# Answer for questions with no cached answer while the load governor has chat degraded
+BUSY_REPLY = "The tutor is handling a lot of questions right now. Please ask again in a minute."
 
 # Subject definition
 SUBJECT = "Data Structures"
@@ -25,12 +30,9 @@ SUBJECT_TOPICS = [
     "dynamic programming", "recursion", "data structure"
 ]
 
-def check_relevance_strict(user_query):
-    """
-    STRICT relevance check - only Data Structure questions allowed
-    Returns: (is_relevant: bool, reason: str)
-    """
-    system_prompt = f"""You are a STRICT classifier for {SUBJECT} questions ONLY.
+def create_relevance_prompt(user_query):
+    """Build the one-word RELEVANT/IRRELEVANT classifier prompt"""
+    return f"""You are a STRICT classifier for {SUBJECT} questions ONLY.
 
 RELEVANT topics: arrays, linked lists, stacks, queues, trees, graphs, hash tables, heaps, sorting, searching, Big-O, time/space complexity, BST, AVL, recursion, algorithms related to data structures.
 
@@ -48,39 +50,70 @@ Question: "{user_query}"
 
 Respond with ONLY ONE WORD - either "RELEVANT" or "IRRELEVANT". Nothing else."""
 
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
+def completion_text(result):
+    return result['choices'][0]['message']['content']
+
+def is_classification(result):
+    """The classifier answered with exactly one of its two words"""
+    return completion_text(result).strip().strip('."\'').upper() in ('RELEVANT', 'IRRELEVANT')
+
+def has_content(result):
+    return bool(completion_text(result).strip())
+
+def chat_cache_key(user_query):
+    """Cache key for a chat query under the current /configure subject and topics"""
+    return (SUBJECT, tuple(SUBJECT_TOPICS), user_query.strip().lower())
+
+def relevance_from_completion(user_query, result):
+    """Read the classifier's answer and cache it"""
+    classification = completion_text(result).strip().upper()
     
-    payload = {
-        "model": "llama-3.3-70b-versatile",
-        "messages": [
-            {"role": "user", "content": system_prompt}
-        ],
-        "temperature": 0.0,  # More deterministic
-        "max_tokens": 5
-    }
+    is_relevant = 'RELEVANT' in classification and 'IRRELEVANT' not in classification
+    cache.set('chat_relevance', chat_cache_key(user_query), (is_relevant, classification), CHAT_CACHE_TTL)
+    return is_relevant, classification
+
+def topic_pattern(topics):
+    """Whole-word match of any topic, singular or plural ("heap", "heaps"); None when there are no topics"""
+    stems = sorted({re.escape(topic.lower().removesuffix('s')) for topic in topics if topic}, key=len, reverse=True)
+    return re.compile(r'\b(?:' + '|'.join(stems) + r')s?\b') if stems else None
+
+# Keyword fallback pattern, rebuilt by /configure when the topics change
+TOPIC_PATTERN = topic_pattern(SUBJECT_TOPICS)
+
+def keyword_relevance(user_query):
+    """Strict fallback when the classifier is unavailable (or skipped under load): keyword matching"""
+    is_relevant = TOPIC_PATTERN is not None and TOPIC_PATTERN.search(user_query.lower()) is not None
+    return is_relevant, "FALLBACK_CHECK"
+
+def check_relevance_strict(user_query):
+    """
+    STRICT relevance check - only Data Structure questions allowed
+    Returns: (is_relevant: bool, reason: str)
+    """
+    cached = cache.get('chat_relevance', chat_cache_key(user_query))
+    if cached is not None:
+        return cached
+    
+    if governor.degraded('chat'):
+        return keyword_relevance(user_query)
     
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload, timeout=10)
-        response.raise_for_status()
-        result = response.json()
-        classification = result['choices'][0]['message']['content'].strip().upper()
-        
-        is_relevant = 'RELEVANT' in classification and 'IRRELEVANT' not in classification
-        return is_relevant, classification
+        result = routed_chat_completion(
+            'classify',
+            [{"role": "user", "content": create_relevance_prompt(user_query)}],
+            validate=is_classification,
+            temperature=0.0,  # More deterministic
+            max_tokens=5,
+            timeout=10,
+            priority='interactive'
+        )
+        return relevance_from_completion(user_query, result)
     except Exception as e:
         print(f"Error in relevance check: {str(e)}")
-        # Strict fallback: keyword matching
-        query_lower = user_query.lower()
-        is_relevant = any(topic in query_lower for topic in SUBJECT_TOPICS)
-        return is_relevant, "FALLBACK_CHECK"
+        return keyword_relevance(user_query)
 
-def get_chatbot_response(user_query):
-    """
-    Get response from LLM for Data Structure questions ONLY
-    """
+def create_chat_messages(user_query):
+    """System and user messages for the tutor answer"""
     system_prompt = f"""You are a specialized {SUBJECT} tutor. You ONLY answer questions about data structures and algorithms.
 
 STRICT RULES:
@@ -90,33 +123,52 @@ STRICT RULES:
 4. Be educational and provide examples for data structure concepts
 
 Answer this question ONLY if it's about Data Structures:"""
+    
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_query}
+    ]
 
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
+def get_chatbot_response(user_query):
+    """
+    Get response from LLM for Data Structure questions ONLY
+    """
+    cache_key = chat_cache_key(user_query)
+    cached = cache.get('chat_answers', cache_key)
+    if cached is not None:
+        return cached
     
-    payload = {
-        "model": "llama-3.3-70b-versatile",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_query}
-        ],
-        "temperature": 0.7,
-        "max_tokens": 1000
-    }
+    if governor.degraded('chat'):
+        return BUSY_REPLY
     
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        result = response.json()
-        return result['choices'][0]['message']['content']
+        result = routed_chat_completion(
+            'chat',
+            create_chat_messages(user_query),
+            validate=has_content,
+            temperature=0.7,
+            max_tokens=1000,
+            timeout=30,
+            priority='interactive'
+        )
+        answer = completion_text(result)
+        cache.set('chat_answers', cache_key, answer, CHAT_CACHE_TTL)
+        return answer
     except requests.exceptions.RequestException as e:
         return f"Error communicating with LLM: {str(e)}"
     except Exception as e:
         return f"Unexpected error: {str(e)}"
 
-@app.route('/')
+def irrelevant_reply(classification):
+    """Response body for a question outside the subject"""
+    return {
+        "response": f"❌ IRRELEVANT QUESTION DETECTED\n\nI am a specialized {SUBJECT} tutor. I can ONLY answer questions about:\n• Arrays, Linked Lists, Stacks, Queues\n• Trees (Binary Trees, BST, AVL, B-Trees)\n• Graphs (DFS, BFS, Dijkstra)\n• Hash Tables, Heaps\n• Sorting & Searching Algorithms\n• Time & Space Complexity (Big-O)\n• Recursion & Dynamic Programming\n\nPlease ask me a question related to Data Structures!",
+        "relevant": False,
+        "subject": SUBJECT,
+        "classification": classification
+    }
+
+@bp.route('/')
 def home():
     return jsonify({
         "message": f"Welcome to {SUBJECT} Chatbot API",
@@ -128,7 +180,7 @@ def home():
         }
     })
 
-@app.route('/health')
+@bp.route('/health')
 def health():
     return jsonify({
         "status": "healthy",
@@ -137,7 +189,8 @@ def health():
         "guardrails": "STRICT"
     })
 
-@app.route('/chat', methods=['POST'])
+@bp.route('/chat', methods=['POST'])
+@idempotent
 def chat():
     """
     Main chat endpoint with STRICT guardrails
@@ -161,12 +214,7 @@ def chat():
         is_relevant, classification = check_relevance_strict(user_message)
         
         if not is_relevant:
-            return jsonify({
-                "response": f"❌ IRRELEVANT QUESTION DETECTED\n\nI am a specialized {SUBJECT} tutor. I can ONLY answer questions about:\n• Arrays, Linked Lists, Stacks, Queues\n• Trees (Binary Trees, BST, AVL, B-Trees)\n• Graphs (DFS, BFS, Dijkstra)\n• Hash Tables, Heaps\n• Sorting & Searching Algorithms\n• Time & Space Complexity (Big-O)\n• Recursion & Dynamic Programming\n\nPlease ask me a question related to Data Structures!",
-                "relevant": False,
-                "subject": SUBJECT,
-                "classification": classification
-            }), 200
+            return jsonify(irrelevant_reply(classification)), 200
         
         # Get response only if relevant
         bot_response = get_chatbot_response(user_message)
@@ -182,19 +230,20 @@ def chat():
             "error": f"Internal server error: {str(e)}"
         }), 500
 
-@app.route('/configure', methods=['POST'])
+@bp.route('/configure', methods=['POST'])
 def configure():
     """
     Change subject and topics dynamically
     """
     try:
         data = request.get_json()
-        global SUBJECT, SUBJECT_TOPICS
+        global SUBJECT, SUBJECT_TOPICS, TOPIC_PATTERN
         
         if 'subject' in data:
             SUBJECT = data['subject']
         if 'topics' in data:
             SUBJECT_TOPICS = data['topics']
+            TOPIC_PATTERN = topic_pattern(SUBJECT_TOPICS)
         
         return jsonify({
             "message": "Configuration updated successfully",
@@ -206,6 +255,101 @@ def configure():
             "error": f"Configuration error: {str(e)}"
         }), 500
 
+# ============================================================================
+# ASYNC ROUTES (ASGI app): same contract, upstream calls are awaited
+# ============================================================================
+
+async def check_relevance_strict_async(user_query):
+    cached = cache.get('chat_relevance', chat_cache_key(user_query))
+    if cached is not None:
+        return cached
+    
+    if governor.degraded('chat'):
+        return keyword_relevance(user_query)
+    
+    try:
+        result = await async_routed_chat_completion(
+            'classify',
+            [{"role": "user", "content": create_relevance_prompt(user_query)}],
+            validate=is_classification,
+            temperature=0.0,
+            max_tokens=5,
+            timeout=10,
+            priority='interactive'
+        )
+        return relevance_from_completion(user_query, result)
+    except Exception as e:
+        print(f"Error in relevance check: {str(e)}")
+        return keyword_relevance(user_query)
+
+async def get_chatbot_response_async(user_query):
+    cache_key = chat_cache_key(user_query)
+    cached = cache.get('chat_answers', cache_key)
+    if cached is not None:
+        return cached
+    
+    if governor.degraded('chat'):
+        return BUSY_REPLY
+    
+    try:
+        result = await async_routed_chat_completion(
+            'chat',
+            create_chat_messages(user_query),
+            validate=has_content,
+            temperature=0.7,
+            max_tokens=1000,
+            timeout=30,
+            priority='interactive'
+        )
+        answer = completion_text(result)
+        cache.set('chat_answers', cache_key, answer, CHAT_CACHE_TTL)
+        return answer
+    except requests.exceptions.RequestException as e:
+        return f"Error communicating with LLM: {str(e)}"
+    except Exception as e:
+        return f"Unexpected error: {str(e)}"
+
+@async_routes.route('/chat', methods=['POST'])
+@idempotent_async
+async def chat_async(req):
+    try:
+        data = req.get_json()
+        
+        if not data or 'message' not in data:
+            return json_response({
+                "error": "Missing 'message' field in request body"
+            }, 400)
+        
+        user_message = data['message'].strip()
+        
+        if not user_message:
+            return json_response({
+                "error": "Message cannot be empty"
+            }, 400)
+        
+        is_relevant, classification = await check_relevance_strict_async(user_message)
+        
+        if not is_relevant:
+            return json_response(irrelevant_reply(classification), 200)
+        
+        bot_response = await get_chatbot_response_async(user_message)
+        
+        return json_response({
+            "response": bot_response,
+            "relevant": True,
+            "subject": SUBJECT
+        }, 200)
+        
+    except Exception as e:
+        return json_response({
+            "error": f"Internal server error: {str(e)}"
+        }, 500)
+
+# Standalone app for running this service on its own
+app = Flask(__name__)
+CORS(app)
+app.register_blueprint(bp)
+
 if __name__ == '__main__':
     if GROQ_API_KEY == "your_groq_api_key_here":
         print("\n" + "="*60)
@@ -0,0 +1,61 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Process lifecycle state used by the readiness probe and graceful shutdown
+
+_lock = threading.Condition()
+_inflight = 0
+_ready = threading.Event()
+_draining = threading.Event()
+
+@contextmanager
+def track_upstream_call():
+    """Count an in-flight upstream (LLM) call for the duration of the block"""
+    global _inflight
+    with _lock:
+        _inflight += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _inflight -= 1
+            _lock.notify_all()
+
+def inflight_count():
+    return _inflight
+
+def mark_ready():
+    _ready.set()
+
+def is_ready():
+    return _ready.is_set() and not _draining.is_set()
+
+def begin_drain():
+    """Stop reporting ready so the load balancer sends no new traffic"""
+    _draining.set()
+
+def is_draining():
+    return _draining.is_set()
+
+def wait_for_drain(timeout):
+    """Wait up to `timeout` seconds for in-flight upstream calls to finish; returns True if they did"""
+    deadline = time.time() + timeout
+    with _lock:
+        while _inflight > 0:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            _lock.wait(remaining)
+    return True
+
+def drain(job_queue, timeout):
+    """Stop taking work and wait for in-flight upstream calls to finish"""
+    begin_drain()
+    job_queue.stop()
+
+    pending = inflight_count()
+    if pending:
+        print(f"Draining {pending} in-flight LLM call(s) (up to {timeout}s)")
+    if not wait_for_drain(timeout):
+        print(f"Gave up waiting: {inflight_count()} LLM call(s) still in flight")
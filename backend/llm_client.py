@@ -0,0 +1,418 @@
+import asyncio
+import json
+import os
+import time
+
+import requests
+from dotenv import load_dotenv
+
+try:
+    import httpx
+except ImportError:  # only needed by the async client (asgi.py)
+    httpx = None
+
+from metrics import registry
+from lifecycle import track_upstream_call
+from llm_scheduler import UpstreamScheduler, UpstreamBusyError, estimate_tokens
+from model_router import TIER_MODELS, escalation_path, record_escalation, tier_of
+from usage_accounting import accountant
+
+load_dotenv()
+
+GROQ_API_KEY = os.getenv('GROQ_API_KEY')
+GROQ_API_URL = os.getenv('GROQ_API_URL', "https://api.groq.com/openai/v1/chat/completions")
+
+# Model for calls that do not name a task (see model_router)
+DEFAULT_MODEL = TIER_MODELS['large']
+
+# A lower-tier call failing with one of these moves on to the next tier:
+# failed requests, and replies that are not JSON or lack the expected fields
+ESCALATING_ERRORS = (requests.exceptions.RequestException, ValueError, KeyError, IndexError, TypeError)
+
+JSON_SYSTEM_PROMPT = "You are a Data Structures and Algorithms expert. You MUST respond ONLY with valid JSON. No markdown, no explanations, just pure JSON."
+
+# One connection pool to Groq for every service in the process
+session = requests.Session()
+session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+# Async connection pool for the ASGI app, created on first use inside its event loop
+GROQ_ASYNC_MAX_CONNECTIONS = int(os.getenv('GROQ_ASYNC_MAX_CONNECTIONS', '1000'))
+async_client = None
+
+# Every call below waits here for admission: priority order, a concurrency
+# cap and client-side RPM/TPM budgets (0 = no limit; the TPM limit is
+# learned from Groq's headers when not set)
+upstream_scheduler = UpstreamScheduler(
+    max_concurrency=int(os.getenv('GROQ_MAX_CONCURRENCY', '0')),
+    rpm_limit=int(os.getenv('GROQ_RPM_LIMIT', '0')),
+    tpm_limit=int(os.getenv('GROQ_TPM_LIMIT', '0')),
+    interactive_reserve=float(os.getenv('GROQ_INTERACTIVE_RESERVE', '0.25')),
+    queue_timeout=float(os.getenv('GROQ_QUEUE_TIMEOUT', '60'))
+)
+registry.register_collector('llm_scheduler', upstream_scheduler.metrics)
+
+def _headers():
+    return {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+def _payload(messages, model, temperature, max_tokens, stream=False):
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+def _json_messages(prompt, system_prompt):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+def _parse_json_content(content):
+    """Parse a model reply as JSON, stripping markdown code fences if present"""
+    if '```json' in content:
+        content = content.split('```json')[1].split('```')[0]
+    elif '```' in content:
+        content = content.split('```')[1].split('```')[0]
+    return json.loads(content.strip())
+
+def _record_usage(model, call_type, usage, latency):
+    """Count prompt and completion tokens per tier and in the usage accounts"""
+    if not usage:
+        return
+    tier = tier_of(model)
+    registry.inc('llm_tokens_total', usage.get('prompt_tokens', 0), tier=tier, kind='prompt')
+    registry.inc('llm_tokens_total', usage.get('completion_tokens', 0), tier=tier, kind='completion')
+    accountant.record(call_type or 'other', model, usage, latency)
+
+def _parse_stream_line(line):
+    """Return (content delta, usage) for one SSE line; the delta is '' for none and None at [DONE]
+
+    Groq sends the call's usage in the last chunk, under x_groq.
+    """
+    if not line or not line.startswith('data:'):
+        return '', None
+    data = line[len('data:'):].strip()
+    if data == '[DONE]':
+        return None, None
+
+    chunk = json.loads(data)
+    choices = chunk.get('choices') or [{}]
+    usage = (chunk.get('x_groq') or {}).get('usage') or chunk.get('usage')
+    return choices[0].get('delta', {}).get('content') or '', usage
+
+def chat_completion(messages, model=DEFAULT_MODEL, temperature=0.7, max_tokens=1000, timeout=30, priority=None, call_type=None):
+    """Send one chat completion request to Groq and return the decoded response body
+
+    The request is admitted by upstream_scheduler at `priority` (default:
+    the caller's llm_scheduler.priority_class).
+    """
+    payload = _payload(messages, model, temperature, max_tokens)
+
+    outcome = 'error'
+    try:
+        with upstream_scheduler.slot(priority, estimate_tokens(messages, max_tokens)) as slot:
+            start = time.time()
+            try:
+                with track_upstream_call():
+                    response = session.post(GROQ_API_URL, headers=_headers(), json=payload, timeout=timeout)
+                    slot.record_response(response.status_code, response.headers)
+                    response.raise_for_status()
+                    result = response.json()
+                    slot.record_usage(result.get('usage'))
+                    _record_usage(model, call_type, result.get('usage'), time.time() - start)
+            finally:
+                registry.observe('llm_latency_seconds', time.time() - start, model=model, tier=tier_of(model))
+        outcome = 'ok'
+        return result
+    except UpstreamBusyError:
+        outcome = 'busy'
+        raise
+    finally:
+        registry.inc('llm_calls_total', model=model, tier=tier_of(model), outcome=outcome)
+
+def call_groq_api(prompt, max_tokens=200, temperature=0.8, max_retries=3, system_prompt=JSON_SYSTEM_PROMPT, model=DEFAULT_MODEL, priority=None, call_type=None):
+    """Call Groq API with retry logic and return the parsed JSON reply"""
+    messages = _json_messages(prompt, system_prompt)
+
+    content = ''
+    for attempt in range(max_retries):
+        try:
+            result = chat_completion(messages, model=model, temperature=temperature, max_tokens=max_tokens, priority=priority, call_type=call_type)
+            content = result['choices'][0]['message']['content'].strip()
+            return _parse_json_content(content)
+
+        except requests.exceptions.RequestException as e:
+            print(f"API Request Error (attempt {attempt + 1}): {e}")
+            if attempt < max_retries - 1:
+                time.sleep(1)
+            else:
+                raise
+        except json.JSONDecodeError as e:
+            print(f"JSON Parse Error (attempt {attempt + 1}): {e}")
+            print(f"Content: {content}")
+            if attempt < max_retries - 1:
+                time.sleep(1)
+            else:
+                raise
+        except Exception as e:
+            print(f"Unexpected Error (attempt {attempt + 1}): {e}")
+            if attempt < max_retries - 1:
+                time.sleep(1)
+            else:
+                raise
+
+    raise Exception("Failed to get valid response from API")
+
+def stream_groq_api(prompt, max_tokens=4000, temperature=0.7, system_prompt=JSON_SYSTEM_PROMPT, model=DEFAULT_MODEL, priority=None, call_type=None):
+    """Call Groq API in streaming mode, yielding content deltas as they arrive"""
+    messages = _json_messages(prompt, system_prompt)
+    payload = _payload(messages, model, temperature, max_tokens, stream=True)
+
+    outcome = 'error'
+    try:
+        with upstream_scheduler.slot(priority, estimate_tokens(messages, max_tokens)) as slot:
+            start = time.time()
+            try:
+                with track_upstream_call(), session.post(GROQ_API_URL, headers=_headers(), json=payload, timeout=30, stream=True) as response:
+                    slot.record_response(response.status_code, response.headers)
+                    response.raise_for_status()
+                    response.encoding = 'utf-8'
+
+                    # Server-sent events: one "data: {...}" line per chunk, terminated by "data: [DONE]"
+                    for line in response.iter_lines(decode_unicode=True):
+                        delta, usage = _parse_stream_line(line)
+                        if usage:
+                            slot.record_usage(usage)
+                            _record_usage(model, call_type, usage, time.time() - start)
+                        if delta is None:
+                            break
+                        if delta:
+                            yield delta
+            finally:
+                registry.observe('llm_latency_seconds', time.time() - start, model=model, tier=tier_of(model))
+        outcome = 'ok'
+    except GeneratorExit:
+        # The caller stopped reading early (e.g. the JSON object was complete)
+        outcome = 'ok'
+        raise
+    except UpstreamBusyError:
+        outcome = 'busy'
+        raise
+    finally:
+        registry.inc('llm_calls_total', model=model, tier=tier_of(model), outcome=outcome)
+
+def routed_chat_completion(task, messages, validate=None, call_type=None, **kwargs):
+    """chat_completion on the model tier for `task` (see model_router)
+
+    A failed request on a lower tier, or a reply that `validate` rejects or
+    cannot read, moves on to the next tier up. The top tier's reply is
+    returned as is.
+    """
+    path = escalation_path(task)
+    kwargs['call_type'] = call_type or task
+    for tier, model in path[:-1]:
+        try:
+            result = chat_completion(messages, model=model, **kwargs)
+            if validate is None or validate(result):
+                return result
+        except UpstreamBusyError:
+            raise
+        except ESCALATING_ERRORS as e:
+            record_escalation(task, tier, e)
+            continue
+        record_escalation(task, tier, 'failed validation')
+    return chat_completion(messages, model=path[-1][1], **kwargs)
+
+def routed_call_groq_api(task, prompt, validate=None, call_type=None, **kwargs):
+    """call_groq_api on the model tier for `task`
+
+    Lower tiers get one attempt: a reply that is not JSON, lacks its
+    content, or that `validate` rejects, or a failed request, moves on to
+    the next tier up. The top
+    tier keeps call_groq_api's retries.
+    """
+    path = escalation_path(task)
+    kwargs['call_type'] = call_type or task
+    for tier, model in path[:-1]:
+        try:
+            result = call_groq_api(prompt, model=model, **{**kwargs, 'max_retries': 1})
+            if validate is None or validate(result):
+                return result
+        except UpstreamBusyError:
+            raise
+        except ESCALATING_ERRORS as e:
+            record_escalation(task, tier, e)
+            continue
+        record_escalation(task, tier, 'failed validation')
+    return call_groq_api(prompt, model=path[-1][1], **kwargs)
+
+# ============================================================================
+# ASYNC CLIENT (used by the ASGI app)
+# ============================================================================
+
+def get_async_client():
+    """Return the shared httpx.AsyncClient, creating it on first use"""
+    global async_client
+    if httpx is None:
+        raise RuntimeError("The async LLM client needs httpx (pip install httpx)")
+    if async_client is None:
+        async_client = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=GROQ_ASYNC_MAX_CONNECTIONS,
+            max_keepalive_connections=64
+        ))
+    return async_client
+
+async def close_async_client():
+    global async_client
+    if async_client is not None:
+        await async_client.aclose()
+        async_client = None
+
+def _as_requests_error(error):
+    """Re-raise httpx errors as their requests equivalents so callers handle both clients the same way"""
+    if isinstance(error, httpx.TimeoutException):
+        return requests.exceptions.Timeout(str(error))
+    if isinstance(error, httpx.HTTPStatusError):
+        return requests.exceptions.HTTPError(str(error))
+    return requests.exceptions.ConnectionError(str(error))
+
+async def async_chat_completion(messages, model=DEFAULT_MODEL, temperature=0.7, max_tokens=1000, timeout=30, priority=None, call_type=None):
+    """Async chat_completion: admission and the request are awaited instead of holding a thread"""
+    payload = _payload(messages, model, temperature, max_tokens)
+
+    outcome = 'error'
+    try:
+        async with upstream_scheduler.slot_async(priority, estimate_tokens(messages, max_tokens)) as slot:
+            start = time.time()
+            try:
+                with track_upstream_call():
+                    try:
+                        response = await get_async_client().post(GROQ_API_URL, headers=_headers(), json=payload, timeout=timeout)
+                        slot.record_response(response.status_code, response.headers)
+                        response.raise_for_status()
+                    except httpx.HTTPError as e:
+                        raise _as_requests_error(e) from e
+                    result = response.json()
+                    slot.record_usage(result.get('usage'))
+                    _record_usage(model, call_type, result.get('usage'), time.time() - start)
+            finally:
+                registry.observe('llm_latency_seconds', time.time() - start, model=model, tier=tier_of(model))
+        outcome = 'ok'
+        return result
+    except UpstreamBusyError:
+        outcome = 'busy'
+        raise
+    finally:
+        registry.inc('llm_calls_total', model=model, tier=tier_of(model), outcome=outcome)
+
+async def async_call_groq_api(prompt, max_tokens=200, temperature=0.8, max_retries=3, system_prompt=JSON_SYSTEM_PROMPT, model=DEFAULT_MODEL, priority=None, call_type=None):
+    """Async call_groq_api: same retries and parsing, with non-blocking backoff"""
+    messages = _json_messages(prompt, system_prompt)
+
+    content = ''
+    for attempt in range(max_retries):
+        try:
+            result = await async_chat_completion(messages, model=model, temperature=temperature, max_tokens=max_tokens, priority=priority, call_type=call_type)
+            content = result['choices'][0]['message']['content'].strip()
+            return _parse_json_content(content)
+
+        except requests.exceptions.RequestException as e:
+            print(f"API Request Error (attempt {attempt + 1}): {e}")
+            if attempt < max_retries - 1:
+                await asyncio.sleep(1)
+            else:
+                raise
+        except json.JSONDecodeError as e:
+            print(f"JSON Parse Error (attempt {attempt + 1}): {e}")
+            print(f"Content: {content}")
+            if attempt < max_retries - 1:
+                await asyncio.sleep(1)
+            else:
+                raise
+        except Exception as e:
+            print(f"Unexpected Error (attempt {attempt + 1}): {e}")
+            if attempt < max_retries - 1:
+                await asyncio.sleep(1)
+            else:
+                raise
+
+    raise Exception("Failed to get valid response from API")
+
+async def async_stream_groq_api(prompt, max_tokens=4000, temperature=0.7, system_prompt=JSON_SYSTEM_PROMPT, model=DEFAULT_MODEL, priority=None, call_type=None):
+    """Async stream_groq_api: yields content deltas as they arrive"""
+    messages = _json_messages(prompt, system_prompt)
+    payload = _payload(messages, model, temperature, max_tokens, stream=True)
+
+    outcome = 'error'
+    try:
+        async with upstream_scheduler.slot_async(priority, estimate_tokens(messages, max_tokens)) as slot:
+            start = time.time()
+            try:
+                with track_upstream_call():
+                    try:
+                        async with get_async_client().stream('POST', GROQ_API_URL, headers=_headers(), json=payload, timeout=30) as response:
+                            slot.record_response(response.status_code, response.headers)
+                            response.raise_for_status()
+                            async for line in response.aiter_lines():
+                                delta, usage = _parse_stream_line(line)
+                                if usage:
+                                    slot.record_usage(usage)
+                                    _record_usage(model, call_type, usage, time.time() - start)
+                                if delta is None:
+                                    break
+                                if delta:
+                                    yield delta
+                    except httpx.HTTPError as e:
+                        raise _as_requests_error(e) from e
+            finally:
+                registry.observe('llm_latency_seconds', time.time() - start, model=model, tier=tier_of(model))
+        outcome = 'ok'
+    except GeneratorExit:
+        outcome = 'ok'
+        raise
+    except UpstreamBusyError:
+        outcome = 'busy'
+        raise
+    finally:
+        registry.inc('llm_calls_total', model=model, tier=tier_of(model), outcome=outcome)
+
+async def async_routed_chat_completion(task, messages, validate=None, call_type=None, **kwargs):
+    """Async routed_chat_completion"""
+    path = escalation_path(task)
+    kwargs['call_type'] = call_type or task
+    for tier, model in path[:-1]:
+        try:
+            result = await async_chat_completion(messages, model=model, **kwargs)
+            if validate is None or validate(result):
+                return result
+        except UpstreamBusyError:
+            raise
+        except ESCALATING_ERRORS as e:
+            record_escalation(task, tier, e)
+            continue
+        record_escalation(task, tier, 'failed validation')
+    return await async_chat_completion(messages, model=path[-1][1], **kwargs)
+
+async def async_routed_call_groq_api(task, prompt, validate=None, call_type=None, **kwargs):
+    """Async routed_call_groq_api"""
+    path = escalation_path(task)
+    kwargs['call_type'] = call_type or task
+    for tier, model in path[:-1]:
+        try:
+            result = await async_call_groq_api(prompt, model=model, **{**kwargs, 'max_retries': 1})
+            if validate is None or validate(result):
+                return result
+        except UpstreamBusyError:
+            raise
+        except ESCALATING_ERRORS as e:
+            record_escalation(task, tier, e)
+            continue
+        record_escalation(task, tier, 'failed validation')
+    return await async_call_groq_api(prompt, model=path[-1][1], **kwargs)
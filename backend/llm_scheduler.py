@@ -0,0 +1,340 @@
+"""Admission scheduler shared by every Groq call in the process.
+
+Calls wait for a slot in priority order (interactive first, background
+last). A call is admitted only while these all hold:
+- The concurrency cap is not reached.
+- The requests-per-minute and tokens-per-minute budgets are not used up.
+  The budgets are counted client-side over a sliding 60 s window.
+- Groq's rate-limit headers show capacity left.
+A call's token cost is reserved up front as the prompt estimate plus
+max_tokens. It is corrected to the returned `usage` once the call finishes.
+A 429 pauses all admissions until Groq's reset time, instead of letting
+every queued call collect its own 429.
+
+Lower-priority classes may only use part of each budget. The rest is held
+back for interactive calls, so a burst of roadmap generation cannot starve
+chat.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import re
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+import requests
+
+from metrics import registry
+
+# Priority classes, most urgent first
+PRIORITIES = {'interactive': 0, 'bulk': 1, 'background': 2}
+
+# Class used by calls that do not name one and run outside priority_class()
+DEFAULT_PRIORITY = 'bulk'
+
+_current_priority = contextvars.ContextVar('llm_priority', default=DEFAULT_PRIORITY)
+
+@contextmanager
+def priority_class(name):
+    """Run LLM calls made inside the block (and tasks/threads given its context) at `name`"""
+    token = _current_priority.set(name)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+def current_priority():
+    return _current_priority.get()
+
+class UpstreamBusyError(requests.exceptions.RequestException):
+    """No upstream capacity freed up within the queue timeout"""
+
+def estimate_tokens(messages, max_tokens):
+    """Reservation for a call: ~4 characters per prompt token, plus the completion budget"""
+    return sum(len(message.get('content', '')) for message in messages) // 4 + max_tokens
+
+# Call durations are compared per this many tokens, so a long generation
+# is not mistaken for a slow upstream (smaller calls count as this size)
+LATENCY_UNIT_TOKENS = 1000
+
+def parse_reset(value):
+    """Seconds in a Groq reset header such as '7.66s', '2m59.56s' or '250ms'"""
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    return sum(float(amount) * units[unit] for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', value or ''))
+
+class _Waiter:
+    def __init__(self, priority, tokens, grant):
+        self.priority = priority
+        self.tokens = tokens
+        self.grant = grant
+        self.enqueued_at = time.time()
+        self.admitted_at = None
+        self.granted = False
+        self.cancelled = False
+        self.entry = None
+
+class Slot:
+    """An admitted call; report the upstream response so the budgets stay accurate"""
+    def __init__(self, scheduler, waiter):
+        self._scheduler = scheduler
+        self._waiter = waiter
+
+    def record_response(self, status_code, headers):
+        self._scheduler._observe_response(status_code, headers)
+
+    def record_usage(self, usage):
+        if usage and usage.get('total_tokens') is not None:
+            self._scheduler._reconcile(self._waiter, usage['total_tokens'])
+
+class UpstreamScheduler:
+    """Priority admission for upstream calls; limits of 0 mean unlimited"""
+    def __init__(self, max_concurrency=0, rpm_limit=0, tpm_limit=0, interactive_reserve=0.25, queue_timeout=60, window=60):
+        self.max_concurrency = max_concurrency
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.interactive_reserve = interactive_reserve
+        self.queue_timeout = queue_timeout
+        self.window = window
+
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._inflight = 0
+        self._requests = deque()
+        self._tokens = deque()
+        self._paused_until = 0.0
+        self._upstream_tokens = None
+        self._throttled = 0
+        self._parts = 1
+        self._dispatcher = None
+        # (finished at, seconds) of recent queue waits, and (finished at, seconds per
+        # LATENCY_UNIT_TOKENS) of recent upstream calls, for load_governor
+        self._recent_waits = deque(maxlen=512)
+        self._recent_calls = deque(maxlen=512)
+
+    def split(self, parts):
+        """Give this process an even share of limits meant for `parts` processes"""
+        with self._cond:
+            self._parts = parts
+            if self.max_concurrency:
+                self.max_concurrency = max(1, self.max_concurrency // parts)
+            if self.rpm_limit:
+                self.rpm_limit = max(1, self.rpm_limit // parts)
+            if self.tpm_limit:
+                self.tpm_limit = max(1, self.tpm_limit // parts)
+
+    @contextmanager
+    def slot(self, priority=None, tokens=0):
+        """Block until the call is admitted; raises UpstreamBusyError after queue_timeout"""
+        admitted = threading.Event()
+        waiter = self._enqueue(priority, tokens, admitted.set)
+
+        if not admitted.wait(self.queue_timeout):
+            self._abandon(waiter, busy=True)
+
+        try:
+            yield Slot(self, waiter)
+        finally:
+            self._release(waiter)
+
+    @asynccontextmanager
+    async def slot_async(self, priority=None, tokens=0):
+        """Async slot(): waiting for admission does not block the event loop"""
+        loop = asyncio.get_running_loop()
+        admitted = loop.create_future()
+
+        def grant():
+            loop.call_soon_threadsafe(lambda: admitted.done() or admitted.set_result(None))
+
+        waiter = self._enqueue(priority, tokens, grant)
+        try:
+            await asyncio.wait_for(admitted, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter, busy=True)
+        except asyncio.CancelledError:
+            self._abandon(waiter, busy=False)
+            raise
+
+        try:
+            yield Slot(self, waiter)
+        finally:
+            self._release(waiter)
+
+    def load(self, window=30):
+        """Current load: calls in flight and queued, and the 90th percentile
+        queue wait and call duration (seconds per LATENCY_UNIT_TOKENS tokens)
+        over the last `window` seconds, with the number of calls behind it"""
+        cutoff = time.time() - window
+        with self._cond:
+            queued = sum(1 for _, _, waiter in self._waiters if not waiter.cancelled)
+            waits = sorted(seconds for finished, seconds in self._recent_waits if finished >= cutoff)
+            calls = sorted(seconds for finished, seconds in self._recent_calls if finished >= cutoff)
+            inflight = self._inflight
+        return {
+            'inflight': inflight,
+            'queued': queued,
+            'queue_wait_p90': waits[int(len(waits) * 0.9)] if waits else 0.0,
+            'latency_p90': calls[int(len(calls) * 0.9)] if calls else 0.0,
+            'latency_samples': len(calls)
+        }
+
+    def metrics(self):
+        with self._cond:
+            now = time.time()
+            self._expire(now)
+            queued = {name: 0 for name in PRIORITIES}
+            for _, _, waiter in self._waiters:
+                if not waiter.cancelled:
+                    queued[waiter.priority] += 1
+            return {
+                'inflight': self._inflight,
+                'max_concurrency': self.max_concurrency,
+                'queued': queued,
+                'requests_last_minute': len(self._requests),
+                'rpm_limit': self.rpm_limit,
+                'tokens_last_minute': sum(entry[1] for entry in self._tokens),
+                'tpm_limit': self.tpm_limit,
+                'paused_for_seconds': round(max(0.0, self._paused_until - now), 3),
+                'throttled_total': self._throttled
+            }
+
+    def _enqueue(self, priority, tokens, grant):
+        priority = priority or current_priority()
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown LLM priority class: {priority}")
+
+        waiter = _Waiter(priority, tokens, grant)
+        with self._cond:
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                # Started lazily so each (forked) worker process runs its own
+                self._dispatcher = threading.Thread(target=self._dispatch, name='llm-scheduler', daemon=True)
+                self._dispatcher.start()
+            heapq.heappush(self._waiters, (PRIORITIES[priority], next(self._seq), waiter))
+            self._cond.notify_all()
+        return waiter
+
+    def _abandon(self, waiter, busy):
+        """Give up waiting, unless the grant raced in first (then the caller keeps the slot)"""
+        with self._cond:
+            if waiter.granted:
+                if busy:
+                    return
+                self._inflight -= 1
+                self._cond.notify_all()
+            else:
+                waiter.cancelled = True
+                if busy:
+                    now = time.time()
+                    self._recent_waits.append((now, now - waiter.enqueued_at))
+
+        if busy:
+            registry.inc('llm_queue_timeouts_total', priority=waiter.priority)
+            raise UpstreamBusyError(f"No upstream capacity for {waiter.priority} call within {self.queue_timeout}s")
+
+    def _release(self, waiter):
+        now = time.time()
+        with self._cond:
+            self._inflight -= 1
+            units = max(1.0, waiter.entry[1] / LATENCY_UNIT_TOKENS)
+            self._recent_calls.append((now, (now - waiter.admitted_at) / units))
+            self._cond.notify_all()
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                delay = None
+                while self._waiters:
+                    waiter = self._waiters[0][2]
+                    if waiter.cancelled:
+                        heapq.heappop(self._waiters)
+                        continue
+
+                    now = time.time()
+                    wait = self._wait_time(waiter, now)
+                    if wait != 0:
+                        delay = None if wait is None else max(wait, 0.01)
+                        break
+
+                    heapq.heappop(self._waiters)
+                    self._admit(waiter, now)
+                self._cond.wait(delay)
+
+    def _wait_time(self, waiter, now):
+        """0 if the waiter can go now, else seconds until it might (None: until a slot frees)"""
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        # Classes below interactive leave part of every budget unused
+        share = 1.0 if waiter.priority == 'interactive' else 1.0 - self.interactive_reserve
+
+        if self.max_concurrency and self._inflight >= max(1, int(self.max_concurrency * share)):
+            return None
+
+        self._expire(now)
+        if self.rpm_limit and len(self._requests) >= max(1, int(self.rpm_limit * share)):
+            return self._requests[0] + self.window - now
+
+        if self.tpm_limit:
+            used = sum(entry[1] for entry in self._tokens)
+            # An oversized call still goes once the window is empty
+            if used and used + waiter.tokens > self.tpm_limit * share:
+                return self._tokens[0][0] + self.window - now
+
+        if self._upstream_tokens:
+            remaining, reset_at = self._upstream_tokens
+            if now < reset_at and remaining < waiter.tokens:
+                return reset_at - now
+
+        return 0
+
+    def _admit(self, waiter, now):
+        waiter.granted = True
+        waiter.admitted_at = now
+        waiter.entry = [now, waiter.tokens]
+        self._inflight += 1
+        self._requests.append(now)
+        self._tokens.append(waiter.entry)
+        if self._upstream_tokens:
+            self._upstream_tokens[0] -= waiter.tokens
+
+        registry.observe('llm_queue_wait_seconds', now - waiter.enqueued_at, priority=waiter.priority)
+        self._recent_waits.append((now, now - waiter.enqueued_at))
+        waiter.grant()
+
+    def _expire(self, now):
+        cutoff = now - self.window
+        while self._requests and self._requests[0] <= cutoff:
+            self._requests.popleft()
+        while self._tokens and self._tokens[0][0] <= cutoff:
+            self._tokens.popleft()
+
+    def _reconcile(self, waiter, total_tokens):
+        with self._cond:
+            waiter.entry[1] = total_tokens
+            self._cond.notify_all()
+
+    def _observe_response(self, status_code, headers):
+        now = time.time()
+        with self._cond:
+            remaining = headers.get('x-ratelimit-remaining-tokens')
+            if remaining is not None:
+                self._upstream_tokens = [int(remaining), now + parse_reset(headers.get('x-ratelimit-reset-tokens'))]
+
+            # Groq reports its per-minute token limit; use it unless one was configured
+            if not self.tpm_limit and headers.get('x-ratelimit-limit-tokens'):
+                self.tpm_limit = max(1, int(headers['x-ratelimit-limit-tokens']) // self._parts)
+
+            if status_code == 429:
+                self._throttled += 1
+                retry_after = headers.get('retry-after', '')
+                if retry_after.replace('.', '', 1).isdigit():
+                    pause = float(retry_after)
+                else:
+                    pause = parse_reset(headers.get('x-ratelimit-reset-tokens')) or 1.0
+                self._paused_until = max(self._paused_until, now + pause)
+                registry.inc('llm_throttled_total')
+
+            self._cond.notify_all()
@@ -0,0 +1,146 @@
+"""Load-based degradation of the LLM-backed services.
+
+Under overload every request keeps queueing another long Groq call until
+they all time out. The governor watches three signals from the upstream
+scheduler (llm_client.upstream_scheduler):
+- calls in flight plus queued, against GOVERNOR_MAX_INFLIGHT
+- 90th percentile queue wait over the last 30 s, against GOVERNOR_QUEUE_WAIT_SLO
+- 90th percentile call duration per 1,000 tokens over the last 30 s, against
+  GOVERNOR_LATENCY_SLO. It only counts once GOVERNOR_MIN_LATENCY_SAMPLES calls
+  have finished in that window, so one long roadmap stream on an idle server
+  cannot degrade anything on its own.
+
+Pressure is the largest signal/limit ratio. It selects a degradation
+level, and each level switches one more service to its no-LLM path:
+
+    1  roadmap   fallback roadmap (create_fallback_roadmap), no Groq call
+    2  question  pre-written emergency questions
+    3  chat      keyword relevance check, cached answers only
+
+The level rises as soon as pressure crosses a threshold. It falls one step
+at a time, and only after pressure has stayed below that step's threshold
+(with some hysteresis) for GOVERNOR_COOLDOWN seconds.
+"""
+import os
+import threading
+import time
+
+from metrics import registry
+from llm_client import upstream_scheduler
+
+# Service -> lowest level at which it is degraded
+SERVICE_LEVELS = {'roadmap': 1, 'question': 2, 'chat': 3}
+
+class LoadGovernor:
+    """Degradation level from load signals, evaluated at most once per `interval`"""
+
+    def __init__(self, load_fn, max_inflight=256, queue_wait_slo=5.0, latency_slo=20.0,
+                 min_latency_samples=10, thresholds=(1.0, 1.5, 2.0), hysteresis=0.8, cooldown=30, interval=1.0,
+                 enabled=True):
+        self.load_fn = load_fn
+        self.limits = {'inflight': max_inflight, 'queue_wait_p90': queue_wait_slo, 'latency_p90': latency_slo}
+        self.min_latency_samples = min_latency_samples
+        self.thresholds = thresholds
+        self.hysteresis = hysteresis
+        self.cooldown = cooldown
+        self.interval = interval
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._level = 0
+        self._pressure = 0.0
+        self._signals = {}
+        self._changed_at = time.time()
+        self._calm_since = None
+        self._evaluated_at = 0.0
+
+    def level(self):
+        now = time.time()
+        if self.enabled and now - self._evaluated_at >= self.interval:
+            self._evaluate(now)
+        return self._level
+
+    def degraded(self, service):
+        """Whether `service` should skip its LLM call right now"""
+        level = self.level()
+        if level >= SERVICE_LEVELS[service]:
+            registry.inc('degraded_requests_total', service=service)
+            return True
+        return False
+
+    def status(self):
+        level = self.level()
+        return {
+            'enabled': self.enabled,
+            'level': level,
+            'degraded_services': sorted(service for service, minimum in SERVICE_LEVELS.items() if level >= minimum),
+            'pressure': round(self._pressure, 3),
+            'signals': self._signals,
+            'limits': self.limits,
+            'seconds_at_level': round(time.time() - self._changed_at, 1)
+        }
+
+    def _target_level(self, pressure):
+        return sum(1 for threshold in self.thresholds if pressure >= threshold)
+
+    def _evaluate(self, now):
+        with self._lock:
+            if now - self._evaluated_at < self.interval:
+                return
+            self._evaluated_at = now
+
+            load = self.load_fn()
+            signals = {
+                'inflight': load['inflight'] + load['queued'],
+                'queue_wait_p90': round(load['queue_wait_p90'], 3),
+                'latency_p90': round(load['latency_p90'], 3),
+                'latency_samples': load['latency_samples']
+            }
+            counted = {name: signals[name] for name in self.limits if self.limits[name]}
+            if signals['latency_samples'] < self.min_latency_samples:
+                # Too few calls for a percentile to mean anything
+                counted.pop('latency_p90', None)
+            pressure = max((value / self.limits[name] for name, value in counted.items()), default=0.0)
+            self._signals, self._pressure = signals, pressure
+
+            target = self._target_level(pressure)
+            if target > self._level:
+                self._set_level(target, now)
+            elif self._level and pressure < self.thresholds[self._level - 1] * self.hysteresis:
+                # Calm enough to step down; do it once the cooldown has passed
+                if self._calm_since is None:
+                    self._calm_since = now
+                elif now - self._calm_since >= self.cooldown:
+                    self._set_level(self._level - 1, now)
+            else:
+                self._calm_since = None
+
+    def _set_level(self, level, now):
+        previous, self._level = self._level, level
+        self._changed_at = now
+        self._calm_since = now if level else None
+        degraded = [service for service, minimum in SERVICE_LEVELS.items() if level >= minimum]
+        print(f"Load governor: level {previous} -> {level} (pressure {self._pressure:.2f}, degraded: {', '.join(degraded) or 'none'})")
+        registry.set_gauge('degradation_level', level)
+        for service, minimum in SERVICE_LEVELS.items():
+            registry.set_gauge('service_degraded', int(level >= minimum), service=service)
+        registry.inc('degradation_level_changes_total', direction='up' if level > previous else 'down')
+
+def _thresholds(value):
+    return tuple(float(part) for part in value.split(','))
+
+# Shared governor for every service in this process
+governor = LoadGovernor(
+    upstream_scheduler.load,
+    max_inflight=int(os.getenv('GOVERNOR_MAX_INFLIGHT', '256')),
+    queue_wait_slo=float(os.getenv('GOVERNOR_QUEUE_WAIT_SLO', '5')),
+    latency_slo=float(os.getenv('GOVERNOR_LATENCY_SLO', '20')),
+    min_latency_samples=int(os.getenv('GOVERNOR_MIN_LATENCY_SAMPLES', '10')),
+    thresholds=_thresholds(os.getenv('GOVERNOR_THRESHOLDS', '1.0,1.5,2.0')),
+    cooldown=float(os.getenv('GOVERNOR_COOLDOWN', '30')),
+    enabled=os.getenv('GOVERNOR_ENABLED', '1') != '0'
+)
+registry.set_gauge('degradation_level', 0)
+for _service in SERVICE_LEVELS:
+    registry.set_gauge('service_degraded', 0, service=_service)
+registry.register_collector('load_governor', governor.status)
@@ -0,0 +1,74 @@
+import threading
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and summaries shared by every service.
+
+    Metric names can carry labels as keyword arguments, e.g.
+    registry.inc('llm_calls_total', model='llama-3.3-70b-versatile').
+    Components with their own state (job queues, caches) register a
+    collector function whose result is included in snapshot().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}
+        self._collectors = {}
+
+    @staticmethod
+    def _key(name, labels):
+        if not labels:
+            return name
+        return name + '{' + ','.join(f"{k}={labels[k]}" for k in sorted(labels)) + '}'
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        """Record one observation (e.g. a latency) in a count/sum/max summary"""
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._summaries.setdefault(key, {'count': 0, 'sum': 0.0, 'max': 0.0})
+            summary['count'] += 1
+            summary['sum'] += value
+            summary['max'] = max(summary['max'], value)
+
+    def register_collector(self, name, fn):
+        """Include fn() under `name` in every snapshot"""
+        with self._lock:
+            self._collectors[name] = fn
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            summaries = {
+                key: {**s, 'avg': round(s['sum'] / s['count'], 4) if s['count'] else 0.0}
+                for key, s in self._summaries.items()
+            }
+            collectors = dict(self._collectors)
+
+        collected = {}
+        for name, fn in collectors.items():
+            try:
+                collected[name] = fn()
+            except Exception as e:
+                collected[name] = {'error': str(e)}
+
+        return {
+            'counters': counters,
+            'gauges': gauges,
+            'summaries': summaries,
+            **collected
+        }
+
+# Shared registry for every backend service in this process
+registry = MetricsRegistry()
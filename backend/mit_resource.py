@@ -1,10 +1,56 @@
-from flask import Flask, render_template_string, jsonify, request
+from flask import Flask, Blueprint, Response, render_template_string, jsonify, request, send_file, url_for
+import asyncio
 import feedparser
 import requests
-from bs4 import BeautifulSoup
-import re
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlencode, urlsplit
 
-app = Flask(__name__)
+try:
+    import httpx
+except ImportError:  # only needed by the async routes (asgi.py)
+    httpx = None
+
+from cache import cache
+from metrics import registry
+from ocw_feeds import FeedService
+from ocw_index import course_index
+from http_cache import http_cache
+from ocw_crawler import CourseCrawler
+from ocw_parsing import parse_links, parse_search_page
+from ocw_selectors import selector_registry
+from ocw_mirror import MaterialMirror, MirrorError
+from async_routes import AsyncRoutes, AsyncResponse, json_response
+
+bp = Blueprint('ocw', __name__)
+async_routes = AsyncRoutes('ocw')
+
+# Reused connection pool for ocw.mit.edu (page fetches go through http_cache,
+# which streams them within fetch_limits.page_limits)
+ocw_session = requests.Session()
+
+# Async pool for the ASGI app, created on first use inside its event loop
+ocw_async_client = None
+
+SEARCH_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+MATERIALS_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# How long OCW results stay in the shared cache (seconds)
+OCW_SEARCH_TTL = 600
+OCW_MATERIALS_TTL = 3600
+
+# /materials/batch: most courses per request, and how many are crawled at once
+OCW_BATCH_MAX_COURSES = int(os.getenv('OCW_BATCH_MAX_COURSES', '10'))
+OCW_BATCH_CONCURRENCY = int(os.getenv('OCW_BATCH_CONCURRENCY', '10'))
+
+# /search page size when the local index answers (?page=N&per_page=M)
+SEARCH_PER_PAGE = 10
+SEARCH_MAX_PER_PAGE = 50
 
 # MIT OCW RSS Feed URLs
 MIT_OCW_FEEDS = {
@@ -13,100 +59,60 @@ MIT_OCW_FEEDS = {
 }
 
 def get_mit_ocw_courses(feed_type='new_courses'):
-    """Fetch courses from MIT OCW RSS feeds"""
-    feed_url = MIT_OCW_FEEDS.get(feed_type)
+    """Courses from an MIT OCW RSS feed (the in-memory snapshot)"""
+    snapshot = feed_service.snapshot(feed_type)
+    return list(snapshot.courses) if snapshot else []
+
+def parse_feed_courses(feed):
+    """Course entries from a parsed RSS feed"""
+    courses = []
     
-    if not feed_url:
-        return []
+    for entry in feed.entries[:10]:
+        course = {
+            'title': entry.title,
+            'url': entry.link,
+            'description': entry.get('summary', 'No description'),
+            'published': entry.get('published', 'N/A')
+        }
+        courses.append(course)
     
+    return courses
+
+# Both feeds are kept in memory and re-checked upstream in the background
+feed_service = FeedService(
+    MIT_OCW_FEEDS,
+    lambda content: parse_feed_courses(feedparser.parse(content)),
+    ocw_session,
+    refresh_interval=int(os.getenv('OCW_FEED_REFRESH_INTERVAL', '900'))
+)
+registry.register_collector('ocw_feeds', feed_service.stats)
+
+def _positive_int(value, default):
     try:
-        feed = feedparser.parse(feed_url)
-        courses = []
-        
-        for entry in feed.entries[:10]:
-            course = {
-                'title': entry.title,
-                'url': entry.link,
-                'description': entry.get('summary', 'No description'),
-                'published': entry.get('published', 'N/A')
-            }
-            courses.append(course)
-        
-        return courses
-    except Exception as e:
-        print(f"Error fetching feed: {e}")
-        return []
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return default
+
+def search_local_index(query, args):
+    """(courses, pagination headers) from the local catalog index, or None if it is not built"""
+    if not course_index.available():
+        return None
+    
+    page = _positive_int(args.get('page'), 1)
+    per_page = min(_positive_int(args.get('per_page'), SEARCH_PER_PAGE), SEARCH_MAX_PER_PAGE)
+    total, courses = course_index.search(query, page, per_page)
+    headers = {'X-Total-Count': str(total), 'X-Page': str(page), 'X-Per-Page': str(per_page)}
+    return courses, headers
 
 def search_mit_ocw(query):
     """Search MIT OCW courses with improved selectors"""
     search_url = f"https://ocw.mit.edu/search/?q={query}"
     
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(search_url, headers=headers, timeout=10)
+        response = http_cache.get(ocw_session, search_url, headers=SEARCH_HEADERS, timeout=10)
         response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        courses = []
-        
-        # Try multiple possible selectors for MIT OCW structure
-        # The structure changes, so we try different patterns
-        
-        # Pattern 1: Look for article tags with resource class
-        course_items = soup.find_all('article', class_='resource')
-        
-        # Pattern 2: Look for divs with course-related classes
-        if not course_items:
-            course_items = soup.find_all('div', class_=['course-item', 'resource-item'])
-        
-        # Pattern 3: Look for any article tags
-        if not course_items:
-            course_items = soup.find_all('article')
-        
-        # Pattern 4: Look for links in search results
-        if not course_items:
-            result_section = soup.find('div', class_='search-results') or soup.find('main')
-            if result_section:
-                links = result_section.find_all('a', href=re.compile(r'/courses/'))
-                for link in links[:10]:
-                    if link.text.strip():
-                        courses.append({
-                            'title': link.text.strip(),
-                            'url': link['href'] if link['href'].startswith('http') else 'https://ocw.mit.edu' + link['href'],
-                            'description': 'Click to view course details'
-                        })
-        
-        # Process found course items
-        for item in course_items[:10]:
-            # Try to find title
-            title_elem = item.find('h3') or item.find('h2') or item.find('h4')
-            
-            # Try to find link
-            link_elem = item.find('a', href=True)
-            
-            if title_elem and link_elem:
-                url = link_elem['href']
-                if not url.startswith('http'):
-                    url = 'https://ocw.mit.edu' + url
-                
-                # Try to find description
-                desc_elem = item.find('p', class_=['description', 'summary']) or item.find('p')
-                description = desc_elem.text.strip() if desc_elem else 'No description available'
-                
-                course = {
-                    'title': title_elem.text.strip(),
-                    'url': url,
-                    'description': description[:200]
-                }
-                courses.append(course)
-        
-        # If still no courses found, return a helpful message
-        if not courses:
-            return []
-        
-        return courses
+        registry.observe('ocw_scrape_peak_body_bytes', len(response.content), kind='search')
+        return parse_search_results(response.content)
         
     except requests.exceptions.RequestException as e:
         print(f"Request error: {e}")
@@ -115,87 +121,149 @@ def search_mit_ocw(query):
         print(f"Parsing error: {e}")
         return []
 
+def parse_search_results(content):
+    """Course results from an OCW search page"""
+    return selector_registry.extract(parse_search_page(content))
+
+def empty_materials():
+    return {
+        'lecture_notes': [],
+        'assignments': [],
+        'exams': [],
+        'videos': [],
+        'readings': []
+    }
+
+def fetch_course_page(url):
+    response = http_cache.get(ocw_session, url, headers=MATERIALS_HEADERS, timeout=10)
+    response.raise_for_status()
+    return response.content
+
 def get_course_materials(course_url):
-    """Extract materials from a specific MIT OCW course page"""
+    """Extract materials from a MIT OCW course page and its section pages"""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(course_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        materials = {
-            'lecture_notes': [],
-            'assignments': [],
-            'exams': [],
-            'videos': [],
-            'readings': []
-        }
-        
-        # Find all links on the page
-        links = soup.find_all('a', href=True)
-        
-        for link in links:
-            href = link['href']
-            text = link.text.strip().lower()
-            
-            # Skip empty or navigation links
-            if not text or any(skip in href for skip in ['#', 'javascript:', 'mailto:']):
-                continue
-            
-            # Make URL absolute
-            if href.startswith('/'):
-                full_url = 'https://ocw.mit.edu' + href
-            elif not href.startswith('http'):
-                continue
-            else:
-                full_url = href
-            
-            # Categorize based on URL and text patterns
-            if '.pdf' in href.lower():
-                link_data = {
-                    'title': link.text.strip() or 'Download PDF',
-                    'url': full_url
-                }
-                
-                if any(kw in text for kw in ['lecture', 'notes', 'note']):
-                    materials['lecture_notes'].append(link_data)
-                elif any(kw in text for kw in ['assignment', 'problem', 'pset', 'homework', 'hw']):
-                    materials['assignments'].append(link_data)
-                elif any(kw in text for kw in ['exam', 'quiz', 'test', 'midterm', 'final']):
-                    materials['exams'].append(link_data)
-                elif any(kw in text for kw in ['reading', 'textbook']):
-                    materials['readings'].append(link_data)
-            
-            # Find video links
-            elif any(vid in href for vid in ['youtube.com', 'youtu.be']):
-                materials['videos'].append({
-                    'title': link.text.strip() or 'Video Lecture',
-                    'url': full_url
-                })
-        
-        # Remove duplicates
-        for key in materials:
-            seen = set()
-            unique = []
-            for item in materials[key]:
-                if item['url'] not in seen:
-                    seen.add(item['url'])
-                    unique.append(item)
-            materials[key] = unique
-        
-        return materials
+        return course_crawler.crawl(course_url)
         
     except Exception as e:
         print(f"Error extracting materials: {e}")
-        return {
-            'lecture_notes': [],
-            'assignments': [],
-            'exams': [],
-            'videos': [],
-            'readings': []
-        }
+        return empty_materials()
+
+# Keywords that put a PDF link in a category, checked in this order
+MATERIAL_KEYWORDS = [
+    ('lecture_notes', ['lecture', 'notes', 'note']),
+    ('assignments', ['assignment', 'problem', 'pset', 'homework', 'hw']),
+    ('exams', ['exam', 'quiz', 'test', 'midterm', 'final']),
+    ('readings', ['reading', 'textbook'])
+]
+
+def material_category(text):
+    for category, keywords in MATERIAL_KEYWORDS:
+        if any(kw in text for kw in keywords):
+            return category
+    return None
+
+def parse_course_materials(content, context=''):
+    """Categorized material links from an OCW course page"""
+    return materials_from_soup(parse_links(content), context)
+
+def parse_course_page(content, context=''):
+    """(materials, soup) for the course crawler, which also reads the page's links"""
+    soup = parse_links(content)
+    return materials_from_soup(soup, context), soup
+
+def materials_from_soup(soup, context=''):
+    """Categorized material links from a parsed course page.
+
+    PDF links whose own text names no category are categorized by
+    `context` instead (a section page's path, e.g. 'pages/assignments').
+    """
+    materials = empty_materials()
+    
+    # Find all links on the page
+    links = soup.find_all('a', href=True)
+    
+    for link in links:
+        href = link['href']
+        text = link.text.strip().lower()
+        
+        # Skip empty or navigation links
+        if not text or any(skip in href for skip in ['#', 'javascript:', 'mailto:']):
+            continue
+        
+        # Make URL absolute
+        if href.startswith('/'):
+            full_url = 'https://ocw.mit.edu' + href
+        elif not href.startswith('http'):
+            continue
+        else:
+            full_url = href
+        
+        # Categorize based on URL and text patterns
+        if '.pdf' in href.lower():
+            link_data = {
+                'title': link.text.strip() or 'Download PDF',
+                'url': full_url
+            }
+            
+            category = material_category(text) or material_category(context)
+            if category:
+                materials[category].append(link_data)
+        
+        # Find video links
+        elif any(vid in href for vid in ['youtube.com', 'youtu.be']):
+            materials['videos'].append({
+                'title': link.text.strip() or 'Video Lecture',
+                'url': full_url
+            })
+    
+    # Remove duplicates
+    for key in materials:
+        seen = set()
+        unique = []
+        for item in materials[key]:
+            if item['url'] not in seen:
+                seen.add(item['url'])
+                unique.append(item)
+        materials[key] = unique
+    
+    return materials
+
+# Course pages link to section pages (/pages/, /resources/) that hold the materials
+course_crawler = CourseCrawler(
+    fetch_course_page,
+    lambda url: fetch_course_page_async(url),    # defined with the async routes below
+    parse_course_page,
+    empty_materials,
+    max_depth=int(os.getenv('OCW_CRAWL_DEPTH', '2')),
+    max_pages=int(os.getenv('OCW_CRAWL_MAX_PAGES', '40')),
+    per_host=int(os.getenv('OCW_CRAWL_PER_HOST', '8'))
+)
+
+# Optional local copies of the files /materials links to, served from /mirror
+material_mirror = None
+if os.getenv('OCW_MIRROR_ENABLED', '0') != '0':
+    material_mirror = MaterialMirror(
+        ocw_session,
+        root=os.getenv('OCW_MIRROR_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'mirror')),
+        max_bytes=int(os.getenv('OCW_MIRROR_MAX_BYTES', str(2 * 1024 ** 3))),
+        max_file_bytes=int(os.getenv('OCW_MIRROR_MAX_FILE_BYTES', str(200 * 1024 ** 2))),
+        max_age=int(os.getenv('OCW_MIRROR_MAX_AGE', str(30 * 86400))),
+        headers=MATERIALS_HEADERS
+    )
+    registry.register_collector('ocw_mirror', material_mirror.stats)
+
+def mirror_links(materials, mirror_path):
+    """`materials` with OCW file URLs pointing at the mirror route; the original URL moves to source_url"""
+    if material_mirror is None:
+        return materials
+    return {
+        category: [
+            dict(item, url=f"{mirror_path}?{urlencode({'url': item['url']})}", source_url=item['url'])
+            if material_mirror.mirrors(item['url']) else item
+            for item in items
+        ]
+        for category, items in materials.items()
+    }
 
 # HTML Template (same as before)
 HTML_TEMPLATE = """
@@ -457,9 +525,9 @@ HTML_TEMPLATE = """
             try {
                 let response;
                 if (currentTab === 'search') {
-                    response = await fetch(`/search?q=${encodeURIComponent(query)}`);
+                    response = await fetch(`{{ base_url }}search?q=${encodeURIComponent(query)}`);
                 } else {
-                    response = await fetch(`/feed?type=${currentTab}`);
+                    response = await fetch(`{{ base_url }}feed?type=${currentTab}`);
                 }
                 
                 const data = await response.json();
@@ -480,7 +548,7 @@ HTML_TEMPLATE = """
             results.style.display = 'none';
             
             try {
-                const response = await fetch(`/feed?type=${type}`);
+                const response = await fetch(`{{ base_url }}feed?type=${type}`);
                 const data = await response.json();
                 displayResults(data);
             } catch (error) {
@@ -518,23 +586,83 @@ HTML_TEMPLATE = """
             
             results.innerHTML = html;
             results.style.display = 'block';
+            
+            prefetchMaterials(courses);
         }
         
-        async function loadMaterials(courseUrl, index) {
-            const materialsDiv = document.getElementById(`materials-${index}`);
-            materialsDiv.innerHTML = '<p>Loading materials...</p>';
-            materialsDiv.style.display = 'block';
+        // course URL -> promise of its materials (null if the prefetch did not deliver them)
+        let prefetched = {};
+        
+        function prefetchMaterials(courses) {
+            prefetched = {};
+            const resolvers = {};
+            const urls = courses.map(course => course.url).filter(Boolean);
+            urls.forEach(url => {
+                prefetched[url] = new Promise(resolve => { resolvers[url] = resolve; });
+            });
             
+            readMaterialsBatch(urls, resolvers).finally(() => {
+                // Courses the stream did not deliver are fetched on click instead
+                Object.values(resolvers).forEach(resolve => resolve(null));
+            });
+        }
+        
+        async function readMaterialsBatch(urls, resolvers) {
             try {
-                const response = await fetch('/materials', {
+                const response = await fetch('{{ base_url }}materials/batch', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json'
                     },
-                    body: JSON.stringify({ course_url: decodeURIComponent(courseUrl) })
+                    body: JSON.stringify({ course_urls: urls })
                 });
+                if (!response.ok || !response.body) {
+                    return;
+                }
                 
-                const materials = await response.json();
+                // One JSON line per course, in the order they finish
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                while (true) {
+                    const { done, value } = await reader.read();
+                    if (done) {
+                        break;
+                    }
+                    buffer += decoder.decode(value, { stream: true });
+                    const lines = buffer.split('\\n');
+                    buffer = lines.pop();
+                    lines.filter(line => line.trim()).forEach(line => {
+                        const result = JSON.parse(line);
+                        if (resolvers[result.course_url]) {
+                            resolvers[result.course_url](result.materials);
+                        }
+                    });
+                }
+            } catch (error) {
+                console.warn('Materials prefetch failed:', error);
+            }
+        }
+        
+        async function fetchMaterials(courseUrl) {
+            const response = await fetch('{{ base_url }}materials', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ course_url: courseUrl })
+            });
+            return response.json();
+        }
+        
+        async function loadMaterials(courseUrl, index) {
+            const materialsDiv = document.getElementById(`materials-${index}`);
+            materialsDiv.innerHTML = '<p>Loading materials...</p>';
+            materialsDiv.style.display = 'block';
+            
+            try {
+                const url = decodeURIComponent(courseUrl);
+                const materials = (prefetched[url] && await prefetched[url]) || await fetchMaterials(url);
                 displayMaterials(materials, index);
             } catch (error) {
                 materialsDiv.innerHTML = `<p>Error loading materials: ${error.message}</p>`;
@@ -580,41 +708,249 @@ HTML_TEMPLATE = """
 </html>
 """
 
-@app.route('/')
+@bp.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    # API calls from the page are relative to wherever this blueprint is mounted
+    return render_template_string(HTML_TEMPLATE, base_url=url_for('ocw.index'))
 
-@app.route('/search')
+@bp.route('/search')
 def search():
     query = request.args.get('q', '')
     if not query:
         return jsonify([]), 400
     
-    courses = search_mit_ocw(query)
+    indexed = search_local_index(query, request.args)
+    if indexed is not None:
+        courses, headers = indexed
+        return jsonify(courses), 200, headers
+    
+    # No local index yet: scrape ocw.mit.edu's search page
+    cache_key = query.strip().lower()
+    courses = cache.get('ocw_search', cache_key)
+    if courses is None:
+        courses = search_mit_ocw(query)
+        if courses:
+            cache.set('ocw_search', cache_key, courses, OCW_SEARCH_TTL)
     return jsonify(courses)
 
-@app.route('/feed')
+@bp.route('/feed')
 def feed():
-    feed_type = request.args.get('type', 'new_courses')
-    courses = get_mit_ocw_courses(feed_type)
-    return jsonify(courses)
+    snapshot = feed_service.snapshot(request.args.get('type', 'new_courses'))
+    if snapshot is None:
+        return jsonify([])
+    # 304 when the client already has this snapshot (If-None-Match)
+    return Response(snapshot.body, mimetype='application/json', headers=snapshot.headers()).make_conditional(request)
+
+def lookup_materials(course_url):
+    """Course materials from the shared cache, or crawled and cached"""
+    materials = cache.get('ocw_materials', course_url)
+    if materials is None:
+        materials = get_course_materials(course_url)
+        if any(materials.values()):
+            cache.set('ocw_materials', course_url, materials, OCW_MATERIALS_TTL)
+    return materials
+
+def batch_course_urls(data):
+    """Distinct course URLs from a /materials/batch body, in order, or None if invalid"""
+    course_urls = (data or {}).get('course_urls')
+    if not isinstance(course_urls, list) or not course_urls:
+        return None
+    unique = list(dict.fromkeys(url for url in course_urls if isinstance(url, str) and url))
+    return unique[:OCW_BATCH_MAX_COURSES] or None
 
-@app.route('/materials', methods=['POST'])
+def format_batch_line(index, course_url, materials):
+    return json.dumps({'index': index, 'course_url': course_url, 'materials': materials}) + '\n'
+
+# Runs the courses of /materials/batch requests (each crawl fans out on the crawler's own pool)
+batch_executor = ThreadPoolExecutor(max_workers=2 * OCW_BATCH_CONCURRENCY, thread_name_prefix='ocw-batch')
+
+@bp.route('/materials', methods=['POST'])
 def materials():
     data = request.get_json()
     course_url = data.get('course_url', '')
     
     if not course_url:
-        return jsonify({
-            'lecture_notes': [],
-            'assignments': [],
-            'exams': [],
-            'videos': [],
-            'readings': []
-        }), 400
+        return jsonify(empty_materials()), 400
+    
+    return jsonify(mirror_links(lookup_materials(course_url), url_for('ocw.mirror')))
+
+@bp.route('/materials/batch', methods=['POST'])
+def materials_batch():
+    """Materials for several courses, one NDJSON line per course as each finishes"""
+    course_urls = batch_course_urls(request.get_json(silent=True))
+    if course_urls is None:
+        return jsonify({'success': False, 'error': 'course_urls must be a non-empty list of course URLs'}), 400
+    
+    mirror_path = url_for('ocw.mirror')
+    
+    def generate():
+        queued = iter(enumerate(course_urls))
+        running = {}
+        for index, course_url in queued:
+            running[batch_executor.submit(lookup_materials, course_url)] = (index, course_url)
+            if len(running) >= OCW_BATCH_CONCURRENCY:
+                break
+        
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, course_url = running.pop(future)
+                yield format_batch_line(index, course_url, mirror_links(future.result(), mirror_path))
+                for next_index, next_url in queued:
+                    running[batch_executor.submit(lookup_materials, next_url)] = (next_index, next_url)
+                    break
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def send_mirrored(url):
+    path, content_type, digest = material_mirror.local_copy(url)
+    # send_file answers Range and If-None-Match requests, and hands the open
+    # file to the server's wsgi.file_wrapper (sendfile under gunicorn)
+    return send_file(path, mimetype=content_type, download_name=os.path.basename(urlsplit(url).path),
+                     etag=digest, max_age=86400, conditional=True)
+
+@bp.route('/mirror')
+def mirror():
+    """A material file from the local mirror, downloaded from OCW on first use"""
+    if material_mirror is None:
+        return jsonify({'success': False, 'error': 'The materials mirror is not enabled'}), 404
+    
+    url = request.args.get('url', '')
+    try:
+        try:
+            return send_mirrored(url)
+        except FileNotFoundError:
+            # Evicted by another worker between lookup and open: download it again
+            return send_mirrored(url)
+    except MirrorError as e:
+        return jsonify({'success': False, 'error': str(e)}), e.status
+
+# ============================================================================
+# ASYNC ROUTES (ASGI app): pages are fetched with awaits, parsed on a worker thread
+# ============================================================================
+
+def get_ocw_async_client():
+    global ocw_async_client
+    if httpx is None:
+        raise RuntimeError("The async OCW routes need httpx (pip install httpx)")
+    if ocw_async_client is None:
+        ocw_async_client = httpx.AsyncClient(follow_redirects=True, timeout=10)
+    return ocw_async_client
+
+async def close_ocw_async_client():
+    global ocw_async_client
+    if ocw_async_client is not None:
+        await ocw_async_client.aclose()
+        ocw_async_client = None
+
+async def search_mit_ocw_async(query):
+    try:
+        response = await http_cache.get_async(get_ocw_async_client(), f"https://ocw.mit.edu/search/?q={query}", headers=SEARCH_HEADERS)
+        response.raise_for_status()
+        registry.observe('ocw_scrape_peak_body_bytes', len(response.content), kind='search')
+        return await asyncio.to_thread(parse_search_results, response.content)
+        
+    except (httpx.HTTPError, requests.exceptions.RequestException) as e:
+        print(f"Request error: {e}")
+        return []
+    except Exception as e:
+        print(f"Parsing error: {e}")
+        return []
+
+async def fetch_course_page_async(url):
+    response = await http_cache.get_async(get_ocw_async_client(), url, headers=MATERIALS_HEADERS)
+    response.raise_for_status()
+    return response.content
+
+async def get_course_materials_async(course_url):
+    try:
+        return await course_crawler.crawl_async(course_url)
+        
+    except Exception as e:
+        print(f"Error extracting materials: {e}")
+        return empty_materials()
+
+async def lookup_materials_async(course_url):
+    materials = cache.get('ocw_materials', course_url)
+    if materials is None:
+        materials = await get_course_materials_async(course_url)
+        if any(materials.values()):
+            cache.set('ocw_materials', course_url, materials, OCW_MATERIALS_TTL)
+    return materials
+
+@async_routes.route('/search')
+async def search_async(req):
+    query = req.args.get('q', '')
+    if not query:
+        return json_response([], 400)
+    
+    indexed = search_local_index(query, req.args)
+    if indexed is not None:
+        courses, headers = indexed
+        response = json_response(courses)
+        response.headers = headers
+        return response
+    
+    cache_key = query.strip().lower()
+    courses = cache.get('ocw_search', cache_key)
+    if courses is None:
+        courses = await search_mit_ocw_async(query)
+        if courses:
+            cache.set('ocw_search', cache_key, courses, OCW_SEARCH_TTL)
+    return json_response(courses)
+
+@async_routes.route('/feed')
+async def feed_async(req):
+    feed_type = req.args.get('type', 'new_courses')
+    # Served from memory; only a feed's very first request waits for the fetch
+    snapshot = feed_service.snapshot(feed_type, wait=False) or await asyncio.to_thread(feed_service.snapshot, feed_type)
+    if snapshot is None:
+        return json_response([])
+    if snapshot.etag in req.headers.get('if-none-match', ''):
+        return AsyncResponse(b'', 304, headers=snapshot.headers())
+    return AsyncResponse(snapshot.body, headers=snapshot.headers())
+
+def mirror_path_async(req):
+    """Path of the Flask /mirror route, under the same prefix as this request"""
+    return req.path.rsplit('/materials', 1)[0] + '/mirror'
+
+@async_routes.route('/materials', methods=['POST'])
+async def materials_async(req):
+    data = req.get_json()
+    course_url = data.get('course_url', '')
+    
+    if not course_url:
+        return json_response(empty_materials(), 400)
+    
+    return json_response(mirror_links(await lookup_materials_async(course_url), mirror_path_async(req)))
+
+@async_routes.route('/materials/batch', methods=['POST'])
+async def materials_batch_async(req):
+    course_urls = batch_course_urls(req.get_json(silent=True))
+    if course_urls is None:
+        return json_response({'success': False, 'error': 'course_urls must be a non-empty list of course URLs'}, 400)
+    
+    slots = asyncio.Semaphore(OCW_BATCH_CONCURRENCY)
+    mirror_path = mirror_path_async(req)
     
-    materials = get_course_materials(course_url)
-    return jsonify(materials)
+    async def lookup(index, course_url):
+        async with slots:
+            return index, course_url, mirror_links(await lookup_materials_async(course_url), mirror_path)
+    
+    async def generate():
+        tasks = [asyncio.ensure_future(lookup(index, course_url)) for index, course_url in enumerate(course_urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield format_batch_line(*await next_done)
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return AsyncResponse(generate(), mimetype='application/x-ndjson', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Standalone app for running this service on its own
+app = Flask(__name__)
+app.register_blueprint(bp)
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
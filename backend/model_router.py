@@ -0,0 +1,83 @@
+"""Which Groq model each kind of LLM call uses.
+
+Calls name a task instead of a model. Each task maps to a tier and each
+tier to a model:
+
+    classify  - the one-word RELEVANT/IRRELEVANT chat guardrail
+    question  - adaptive assessment question generation
+    chat      - tutor answers
+    roadmap   - roadmap generation (single call, section groups, streaming)
+
+A reply from a lower tier that fails the caller's validation is retried
+once on the next tier up, so cheap tasks run on the small model without
+getting worse output when it slips. Both maps can be changed through the
+environment:
+
+    GROQ_SMALL_MODEL=llama-3.1-8b-instant
+    GROQ_LARGE_MODEL=llama-3.3-70b-versatile
+    GROQ_TASK_TIERS=classify=small,question=large
+"""
+import os
+
+from metrics import registry
+
+# Model tiers, smallest first; a failed validation escalates one step up this list
+TIERS = ['small', 'large']
+
+TIER_MODELS = {
+    'small': os.getenv('GROQ_SMALL_MODEL', 'llama-3.1-8b-instant'),
+    'large': os.getenv('GROQ_LARGE_MODEL', 'llama-3.3-70b-versatile')
+}
+
+DEFAULT_TASK_TIERS = {
+    'classify': 'small',
+    'question': 'small',
+    'chat': 'large',
+    'roadmap': 'large'
+}
+
+def parse_task_tiers(value):
+    """Read 'task=tier,task=tier' overrides, ignoring unknown tiers"""
+    tiers = {}
+    for item in value.split(','):
+        task, _, tier = item.partition('=')
+        task, tier = task.strip(), tier.strip()
+        if not task:
+            continue
+        if tier not in TIER_MODELS:
+            print(f"Ignoring GROQ_TASK_TIERS entry '{item.strip()}': unknown tier '{tier}'")
+            continue
+        tiers[task] = tier
+    return tiers
+
+TASK_TIERS = {**DEFAULT_TASK_TIERS, **parse_task_tiers(os.getenv('GROQ_TASK_TIERS', ''))}
+
+def tier_for(task):
+    return TASK_TIERS.get(task, TIERS[-1])
+
+def model_for(task):
+    """The model a task's first attempt uses"""
+    return TIER_MODELS[tier_for(task)]
+
+def escalation_path(task):
+    """(tier, model) pairs to try for `task`, starting at its tier"""
+    return [(tier, TIER_MODELS[tier]) for tier in TIERS[TIERS.index(tier_for(task)):]]
+
+def tier_of(model):
+    """Tier label for a model in metrics ('other' for models outside the tier map)"""
+    for tier in reversed(TIERS):
+        if TIER_MODELS[tier] == model:
+            return tier
+    return 'other'
+
+def record_escalation(task, tier, reason):
+    print(f"Escalating {task} call past the {tier} tier: {reason}")
+    registry.inc('llm_escalations_total', task=task, tier=tier)
+
+def routing_table():
+    return {
+        'tiers': dict(TIER_MODELS),
+        'tasks': dict(TASK_TIERS)
+    }
+
+registry.register_collector('llm_routing', routing_table)
@@ -0,0 +1,220 @@
+"""Crawl an OCW course's section pages for materials.
+
+On current OCW a course landing page links to section pages
+(/courses/<slug>/pages/syllabus/, .../pages/assignments/) and resource
+pages (/courses/<slug>/resources/<name>/). The lecture notes, problem sets
+and exams are linked from those pages, not from the landing page.
+CourseCrawler starts at the landing page and follows links that stay
+inside the course, up to `max_depth` links away and `max_pages` pages in
+total. Each URL is fetched once. It merges the materials found on every
+page.
+
+A page is fetched as soon as a link to it is found, so the crawl takes
+roughly one fetch per level of depth, not one per page. Concurrent
+fetches to one host are capped at `per_host` across every crawl in the
+process. Sync crawls (Flask) run fetches on a shared thread pool. Async
+crawls (ASGI) run them as tasks.
+
+Each crawl reports the most page body bytes it held at once, as
+ocw_scrape_peak_body_bytes. Bodies are capped by fetch_limits, so this is
+at most the cap times the number of pages being parsed at once.
+"""
+import asyncio
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urljoin, urlsplit
+
+from metrics import registry
+
+# Pages under a course worth following (not downloads, not other courses)
+SECTION_PATH = re.compile(r'^/courses/[^/]+/(pages|resources|lists|video_galleries)/[^.?#]*$')
+
+def course_root(url):
+    """https://ocw.mit.edu/courses/<slug>/ for any URL inside that course"""
+    parts = urlsplit(url)
+    segments = parts.path.strip('/').split('/')
+    if len(segments) < 2 or segments[0] != 'courses':
+        return None
+    return f"{parts.scheme}://{parts.netloc}/courses/{segments[1]}/"
+
+def normalize(url):
+    """Dedup key: no query or fragment, trailing slash"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path.rstrip('/')}/"
+
+def section_links(soup, page_url):
+    """(normalized url, link text) for links from a parsed page to section pages of the same course"""
+    root = course_root(page_url)
+    links = []
+    for link in soup.find_all('a', href=True):
+        url = urljoin(page_url, link['href'])
+        parts = urlsplit(url)
+        if root and url.startswith(root) and SECTION_PATH.match(parts.path):
+            links.append((normalize(url), link.get_text(' ', strip=True).lower()))
+    return links
+
+def merge_materials(merged, materials):
+    for category, items in materials.items():
+        seen = {item['url'] for item in merged.setdefault(category, [])}
+        for item in items:
+            if item['url'] not in seen:
+                seen.add(item['url'])
+                merged[category].append(item)
+
+class HeldBytes:
+    """Page bodies one crawl holds at once: fetched and not yet parsed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current = 0
+        self.peak = 0
+
+    def add(self, size):
+        with self._lock:
+            self.current += size
+            self.peak = max(self.peak, self.current)
+
+    def release(self, size):
+        with self._lock:
+            self.current -= size
+
+class CourseCrawler:
+    """Bounded, deduplicating crawl of one course's section pages.
+
+    `fetch(url)` returns page bytes (sync), `fetch_async(url)` awaits
+    them, and `parse(content, context)` returns (materials, soup) for a page.
+    """
+
+    def __init__(self, fetch, fetch_async, parse, empty, max_depth=2, max_pages=40, per_host=4, workers=16):
+        self.fetch = fetch
+        self.fetch_async = fetch_async
+        self.parse = parse
+        self.empty = empty
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.per_host = per_host
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocw-crawl')
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._async_host_slots = {}
+
+    def _slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def _async_slot(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._async_host_slots:
+            self._async_host_slots[host] = asyncio.Semaphore(self.per_host)
+        return self._async_host_slots[host]
+
+    def _context(self, url, text, parent_context):
+        """Words that categorize PDF links with uninformative text ('Download File').
+
+        A page inherits the context of the page linking to it, plus the
+        link's text and its own path after the course slug, so a resource
+        page reached from 'pages/lecture-notes' counts as lecture notes.
+        """
+        path = '/'.join(urlsplit(url).path.split('/')[3:]).replace('-', ' ')
+        return ' '.join(part for part in (parent_context, text, path) if part)
+
+    def _visit(self, url, depth, context, content, held):
+        held.add(len(content))
+        try:
+            materials, soup = self.parse(content, context)
+        finally:
+            held.release(len(content))
+        links = section_links(soup, url) if depth < self.max_depth else []
+        return materials, links
+
+    def _fetch_page(self, url, depth, context, held):
+        with self._slot(url):
+            content = self.fetch(url)
+        return self._visit(url, depth, context, content, held)
+
+    def crawl(self, course_url):
+        """Merged materials from the course page and its section pages"""
+        start = normalize(course_url)
+        seen = {start}
+        found = {}
+        held = HeldBytes()
+        pending = {self._executor.submit(self._fetch_page, course_url, 0, '', held): (course_url, 0, '')}
+        failed = 0
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, depth, context = pending.pop(future)
+                try:
+                    materials, links = future.result()
+                except Exception as e:
+                    if depth == 0:
+                        # Without the landing page there is nothing to crawl
+                        raise
+                    print(f"Error crawling {url}: {e}")
+                    failed += 1
+                    continue
+                found[url] = materials
+                for link, text in links:
+                    if link not in seen and len(seen) < self.max_pages:
+                        seen.add(link)
+                        child = (link, depth + 1, self._context(link, text, context))
+                        pending[self._executor.submit(self._fetch_page, *child, held)] = child
+
+        return self._merge(found, failed, held)
+
+    async def _fetch_page_async(self, url, depth, context, held):
+        async with self._async_slot(url):
+            content = await self.fetch_async(url)
+        return await asyncio.to_thread(self._visit, url, depth, context, content, held)
+
+    async def crawl_async(self, course_url):
+        """Same as crawl, with fetches awaited on the event loop"""
+        start = normalize(course_url)
+        seen = {start}
+        found = {}
+        held = HeldBytes()
+        pending = {asyncio.ensure_future(self._fetch_page_async(course_url, 0, '', held)): (course_url, 0, '')}
+        failed = 0
+
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url, depth, context = pending.pop(task)
+                    try:
+                        materials, links = task.result()
+                    except Exception as e:
+                        if depth == 0:
+                            raise
+                        print(f"Error crawling {url}: {e}")
+                        failed += 1
+                        continue
+                    found[url] = materials
+                    for link, text in links:
+                        if link not in seen and len(seen) < self.max_pages:
+                            seen.add(link)
+                            child = (link, depth + 1, self._context(link, text, context))
+                            pending[asyncio.ensure_future(self._fetch_page_async(*child, held))] = child
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return self._merge(found, failed, held)
+
+    def _merge(self, found, failed, held):
+        # Pages finish in any order; merge them in URL order so results are stable
+        merged = self.empty()
+        for url in sorted(found):
+            merge_materials(merged, found[url])
+        registry.inc('ocw_crawls_total')
+        registry.observe('ocw_crawl_pages', len(found))
+        registry.observe('ocw_scrape_peak_body_bytes', held.peak, kind='crawl')
+        if failed:
+            registry.inc('ocw_crawl_page_errors_total', failed)
+        return merged
@@ -0,0 +1,166 @@
+"""Background-refreshed snapshots of the MIT OCW RSS feeds.
+
+The new and updated course feeds change a few times a day at most, so
+/feed no longer fetches them per request. A FeedService thread re-checks
+each feed every `refresh_interval` seconds with a conditional GET
+(If-None-Match / If-Modified-Since). A 304 only marks the snapshot as
+fresh. A 200 is parsed and replaces it. Failed checks keep serving the
+last snapshot.
+
+A snapshot is immutable. It holds the parsed courses, the JSON body
+already encoded, and an ETag for that body, so /feed only looks up a dict
+and writes bytes. Its age (seconds since the upstream last confirmed it)
+goes out in the `Age` header.
+"""
+import hashlib
+import threading
+import time
+
+from async_routes import json_response
+from metrics import registry
+
+class FeedSnapshot:
+    """One feed's courses at one point in time; never mutated after creation"""
+
+    __slots__ = ('feed_type', 'courses', 'body', 'etag', 'upstream_etag', 'upstream_last_modified',
+                 'changed_at', 'checked_at')
+
+    def __init__(self, feed_type, courses, upstream_etag=None, upstream_last_modified=None, changed_at=None, checked_at=None):
+        self.feed_type = feed_type
+        self.courses = tuple(courses)
+        # Same bytes jsonify / json_response would produce
+        self.body = json_response(list(self.courses)).body
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.upstream_etag = upstream_etag
+        self.upstream_last_modified = upstream_last_modified
+        self.changed_at = changed_at or time.time()
+        self.checked_at = checked_at or self.changed_at
+
+    def confirmed(self, checked_at):
+        """Copy of this snapshot after the upstream answered 304"""
+        return FeedSnapshot(self.feed_type, self.courses, self.upstream_etag, self.upstream_last_modified,
+                            self.changed_at, checked_at)
+
+    def age(self):
+        return max(0, int(time.time() - self.checked_at))
+
+    def headers(self):
+        return {
+            'ETag': self.etag,
+            'Age': str(self.age()),
+            'Last-Modified': time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(self.changed_at)),
+            'Cache-Control': 'no-cache'
+        }
+
+class FeedService:
+    """Keeps a FeedSnapshot per feed, refreshed by a background thread"""
+
+    def __init__(self, feeds, parse, session, refresh_interval=900, timeout=10, retry_after=30):
+        self.feeds = feeds
+        self.parse = parse
+        self.session = session
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.retry_after = retry_after
+
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._fetch_locks = {feed_type: threading.Lock() for feed_type in feeds}
+        self._attempted_at = {}
+        self._errors = {}
+        self._refresher = None
+
+    def snapshot(self, feed_type, wait=True):
+        """Current snapshot of `feed_type`, or None for an unknown feed.
+
+        Only the very first request for a feed (before the background thread
+        has fetched it) waits on ocw.mit.edu; with `wait=False` it gets None
+        instead. While the feed cannot be fetched at all, an empty snapshot
+        is returned and the fetch is retried at most every `retry_after`
+        seconds.
+        """
+        if feed_type not in self.feeds:
+            return None
+        self._start_refresher()
+
+        snapshot = self._snapshots.get(feed_type)
+        if snapshot is not None:
+            registry.inc('ocw_feed_requests_total', source='snapshot')
+            return snapshot
+        if not wait:
+            return None
+
+        with self._fetch_locks[feed_type]:
+            snapshot = self._snapshots.get(feed_type)
+            if snapshot is None and time.time() - self._attempted_at.get(feed_type, 0) >= self.retry_after:
+                snapshot = self.refresh(feed_type)
+        registry.inc('ocw_feed_requests_total', source='cold' if snapshot else 'unavailable')
+        return snapshot or FeedSnapshot(feed_type, [])
+
+    def refresh(self, feed_type):
+        """Check one feed upstream and swap in the new snapshot; returns it (or None)"""
+        current = self._snapshots.get(feed_type)
+        headers = {}
+        if current is not None and current.upstream_etag:
+            headers['If-None-Match'] = current.upstream_etag
+        if current is not None and current.upstream_last_modified:
+            headers['If-Modified-Since'] = current.upstream_last_modified
+
+        now = time.time()
+        self._attempted_at[feed_type] = now
+        try:
+            response = self.session.get(self.feeds[feed_type], headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and current is not None:
+                snapshot = current.confirmed(now)
+                outcome = 'not_modified'
+            else:
+                response.raise_for_status()
+                courses = self.parse(response.content)
+                if not courses:
+                    raise ValueError("feed has no entries")
+                # Same content under new validators keeps its original change time
+                unchanged = current is not None and tuple(courses) == current.courses
+                snapshot = FeedSnapshot(feed_type, courses, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                                        changed_at=current.changed_at if unchanged else now, checked_at=now)
+                outcome = 'updated'
+        except Exception as e:
+            print(f"Error refreshing {feed_type} feed: {e}")
+            self._errors[feed_type] = {'error': str(e), 'at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now))}
+            registry.inc('ocw_feed_refreshes_total', feed=feed_type, outcome='error')
+            return current
+
+        with self._lock:
+            self._snapshots[feed_type] = snapshot
+            self._errors.pop(feed_type, None)
+        registry.inc('ocw_feed_refreshes_total', feed=feed_type, outcome=outcome)
+        return snapshot
+
+    def stats(self):
+        feeds = {}
+        for feed_type in self.feeds:
+            snapshot = self._snapshots.get(feed_type)
+            feeds[feed_type] = {
+                'courses': len(snapshot.courses) if snapshot else 0,
+                'bytes': len(snapshot.body) if snapshot else 0,
+                'age_seconds': snapshot.age() if snapshot else None,
+                'last_error': self._errors.get(feed_type)
+            }
+        return {'refresh_interval_seconds': self.refresh_interval, 'feeds': feeds}
+
+    def _start_refresher(self):
+        if self._refresher is None or not self._refresher.is_alive():
+            with self._lock:
+                if self._refresher is None or not self._refresher.is_alive():
+                    # Started lazily so each (forked) worker process runs its own
+                    self._refresher = threading.Thread(target=self._refresh_loop, name='ocw-feed-refresh', daemon=True)
+                    self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            for feed_type in self.feeds:
+                with self._fetch_locks[feed_type]:
+                    snapshot = self._snapshots.get(feed_type)
+                    # A request may have just fetched it cold
+                    if snapshot is None or time.time() - snapshot.checked_at >= self.refresh_interval / 2:
+                        self.refresh(feed_type)
+            time.sleep(self.refresh_interval)
@@ -0,0 +1,243 @@
+"""Local full-text index of the OCW course catalog.
+
+/ocw/search used to scrape ocw.mit.edu's search page for every query. It
+now ranks courses from a local BM25 index over course titles, course
+numbers, departments and descriptions. The index is built from the
+catalog file (JSON lines, one course per line: url, title, description,
+department, course_number) and stored as one file:
+
+    magic (8 bytes) | meta length (8 bytes) | meta JSON | padding | postings
+
+The meta JSON holds the documents, their lengths and the term dictionary
+(term -> offset and document count into the postings). Postings are
+uint32 pairs (doc id, weighted term frequency), memory-mapped and read
+in place, so workers share them through the page cache. `build` writes a
+new file next to the old one and renames it over, and readers pick up
+the new file on their next query.
+
+    python ocw_index.py build [--catalog data/ocw_catalog.jsonl]
+    python ocw_index.py search "linear algebra"
+"""
+import argparse
+import array
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+
+from metrics import registry
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DEFAULT_CATALOG_PATH = os.path.join(DATA_DIR, 'ocw_catalog.jsonl')
+DEFAULT_INDEX_PATH = os.path.join(DATA_DIR, 'ocw_index.bin')
+
+MAGIC = b'OCWIDX1\0'
+
+# Term frequency weight of each field (title and course number matches count most)
+FIELD_WEIGHTS = {'title': 3, 'course_number': 3, 'department': 2, 'description': 1}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset('a an and are as at be by for from in into is it of on or the to with'.split())
+
+# Words, plus course numbers such as 6.006 or 18.06sc kept whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+
+def tokenize(text):
+    """Lowercase terms of `text`; plurals folded, course numbers also split at the dot"""
+    terms = []
+    for token in TOKEN_PATTERN.findall((text or '').lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss') and token.isalpha():
+            token = token[:-1]
+        terms.append(token)
+        if '.' in token:
+            terms.extend(part for part in token.split('.') if part)
+    return terms
+
+def load_catalog(path=DEFAULT_CATALOG_PATH):
+    """Courses from a JSON lines catalog, skipping malformed lines"""
+    courses = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                course = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(course, dict) and course.get('url') and course.get('title'):
+                courses.append(course)
+    return courses
+
+def build_index(courses, path=DEFAULT_INDEX_PATH):
+    """Write the index for `courses` to `path` (atomically); returns its meta stats"""
+    docs, lengths, postings = [], [], {}
+    for course in courses:
+        doc_id = len(docs)
+        docs.append({
+            'url': course['url'],
+            'title': course['title'],
+            'description': (course.get('description') or '')[:200],
+            'department': course.get('department') or '',
+            'course_number': course.get('course_number') or ''
+        })
+
+        frequencies = {}
+        length = 0
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(course.get(field)):
+                frequencies[term] = frequencies.get(term, 0) + weight
+                length += weight
+        lengths.append(length)
+        for term, frequency in frequencies.items():
+            postings.setdefault(term, []).append((doc_id, frequency))
+
+    terms = {}
+    data = array.array('I')
+    for term in sorted(postings):
+        terms[term] = [len(data) // 2, len(postings[term])]
+        for doc_id, frequency in postings[term]:
+            data.append(doc_id)
+            data.append(frequency)
+
+    meta = json.dumps({
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'docs': docs,
+        'lengths': lengths,
+        'avg_length': sum(lengths) / len(lengths) if lengths else 0.0,
+        'terms': terms
+    }, separators=(',', ':')).encode('utf-8')
+    padding = -(len(MAGIC) + 8 + len(meta)) % data.itemsize
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(meta)) + meta + b'\0' * padding)
+        data.tofile(f)
+    os.replace(tmp_path, path)
+    return {'docs': len(docs), 'terms': len(terms), 'bytes': os.path.getsize(path)}
+
+class _Segment:
+    """An opened index file: meta in memory, postings memory-mapped"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mtime = os.fstat(f.fileno()).st_mtime
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an OCW index")
+
+        meta_length = struct.unpack_from('<Q', self._mmap, len(MAGIC))[0]
+        start = len(MAGIC) + 8
+        meta = json.loads(self._mmap[start:start + meta_length])
+        self.docs = meta['docs']
+        self.lengths = meta['lengths']
+        self.avg_length = meta['avg_length'] or 1.0
+        self.terms = meta['terms']
+        self.built_at = meta['built_at']
+        start += meta_length
+        start += -start % 4
+        self.postings = memoryview(self._mmap)[start:].cast('I')
+        self.size = len(self._mmap)
+
+    def search(self, terms):
+        """{doc_id: BM25 score} over documents containing any of `terms`"""
+        scores = {}
+        count = len(self.docs)
+        for term in set(terms):
+            entry = self.terms.get(term)
+            if entry is None:
+                continue
+            offset, doc_frequency = entry
+            idf = math.log(1 + (count - doc_frequency + 0.5) / (doc_frequency + 0.5))
+            postings = self.postings[offset * 2:(offset + doc_frequency) * 2]
+            for i in range(0, len(postings), 2):
+                doc_id, frequency = postings[i], postings[i + 1]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return scores
+
+class CourseIndex:
+    """Searches the index file at `path`, reopening it when it is rebuilt"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, check_interval=5):
+        self.path = path
+        self.check_interval = check_interval
+        self._segment = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _current(self):
+        now = time.time()
+        if now - self._checked_at >= self.check_interval:
+            with self._lock:
+                if now - self._checked_at >= self.check_interval:
+                    self._checked_at = now
+                    try:
+                        mtime = os.path.getmtime(self.path)
+                        if self._segment is None or mtime != self._segment.mtime:
+                            self._segment = _Segment(self.path)
+                    except (OSError, ValueError) as e:
+                        if self._segment is None and not isinstance(e, FileNotFoundError):
+                            print(f"Could not open OCW index {self.path}: {e}")
+        return self._segment
+
+    def available(self):
+        segment = self._current()
+        return segment is not None and bool(segment.docs)
+
+    def search(self, query, page=1, per_page=10):
+        """(total matches, courses on `page`), best match first"""
+        segment = self._current()
+        if segment is None:
+            return 0, []
+
+        start = time.perf_counter()
+        scores = segment.search(tokenize(query))
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        first = (page - 1) * per_page
+        courses = [
+            dict(segment.docs[doc_id], score=round(score, 3))
+            for doc_id, score in ranked[first:first + per_page]
+        ]
+        registry.observe('ocw_index_search_seconds', time.perf_counter() - start)
+        return len(ranked), courses
+
+    def stats(self):
+        segment = self._current()
+        if segment is None:
+            return {'path': self.path, 'available': False}
+        return {'path': self.path, 'available': True, 'docs': len(segment.docs), 'terms': len(segment.terms),
+                'bytes': segment.size, 'built_at': segment.built_at}
+
+# Shared index for the OCW service in this process
+course_index = CourseIndex(os.getenv('OCW_INDEX_PATH', DEFAULT_INDEX_PATH))
+registry.register_collector('ocw_index', course_index.stats)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='build the index from the catalog')
+    build.add_argument('--catalog', default=DEFAULT_CATALOG_PATH)
+    build.add_argument('--index', default=course_index.path)
+    search = commands.add_parser('search', help='query the index')
+    search.add_argument('query')
+    search.add_argument('--page', type=int, default=1)
+    search.add_argument('--index', default=course_index.path)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        try:
+            courses = load_catalog(args.catalog)
+        except OSError as e:
+            sys.exit(f"Could not read catalog: {e}")
+        print(json.dumps(build_index(courses, args.index)))
+    else:
+        total, courses = CourseIndex(args.index).search(args.query, page=args.page)
+        print(json.dumps({'total': total, 'courses': courses}, indent=2))
@@ -0,0 +1,254 @@
+"""Local mirror of the OCW files (PDFs, archives) that /materials links to.
+
+Students open the same lecture notes over and over, and each click used
+to download the PDF from ocw.mit.edu across the campus uplink again.
+With the mirror on, /materials links point at this server instead. The
+first request for a file downloads it once. Later requests are served
+from local disk.
+
+Files are stored content-addressed: objects/<aa>/<sha256>, where the
+name is the SHA-256 of the body. Two URLs with the same content share
+one file. A SQLite index maps URLs to digests and records each file's
+size and last use. When the files outgrow `max_bytes`, the least
+recently used ones are removed. A URL is fetched again once its copy is
+`max_age` seconds old.
+
+Only https URLs on `hosts` (ocw.mit.edu by default) with a file
+extension are mirrored, so course pages and outside links (YouTube,
+publishers) are left alone.
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from metrics import registry
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'mirror')
+
+# Extensions never mirrored: pages that link to other pages by relative URL
+PAGE_EXTENSIONS = ('', '.html', '.htm')
+
+OUTCOMES = ('hit', 'fetched', 'deduplicated', 'rejected', 'failed')
+
+class MirrorError(Exception):
+    """A file could not be mirrored; `status` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=502):
+        super().__init__(message)
+        self.status = status
+
+class MaterialMirror:
+    """Content-addressed disk mirror of OCW material files"""
+
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, session, root=DEFAULT_ROOT, max_bytes=2 * 1024 ** 3, max_file_bytes=200 * 1024 ** 2,
+                 max_age=30 * 86400, hosts=('ocw.mit.edu',), headers=None, timeout=30):
+        self.session = session
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        self.max_age = max_age
+        self.hosts = tuple(hosts)
+        self.headers = headers or {}
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._fetching = {}
+        self._counts = dict.fromkeys(OUTCOMES, 0)
+        self._evicted = 0
+        os.makedirs(os.path.join(self.root, 'tmp'), exist_ok=True)
+        self._init_db()
+
+    # ------------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------------
+
+    def _connect(self):
+        # One connection per thread, reopened in a forked worker
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(os.path.join(self.root, 'index.db'), timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS blobs_accessed ON blobs (accessed_at)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                content_type TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+
+    def path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest)
+
+    def _count(self, outcome):
+        with self._lock:
+            self._counts[outcome] += 1
+        registry.inc('ocw_mirror_requests_total', outcome=outcome)
+
+    # ------------------------------------------------------------------------
+    # Mirroring
+    # ------------------------------------------------------------------------
+
+    def mirrors(self, url):
+        """Whether `url` is a file this mirror would serve"""
+        parts = urlsplit(url)
+        extension = os.path.splitext(parts.path)[1].lower()
+        return parts.scheme == 'https' and parts.hostname in self.hosts and extension not in PAGE_EXTENSIONS
+
+    def _cached(self, url):
+        row = self._connect().execute(
+            "SELECT u.digest, u.content_type, u.fetched_at FROM urls u JOIN blobs b ON b.digest = u.digest WHERE u.url = ?",
+            (url,)
+        ).fetchone()
+        if row is None or row[2] + self.max_age < time.time() or not os.path.exists(self.path(row[0])):
+            return None
+        self._connect().execute("UPDATE blobs SET accessed_at = ? WHERE digest = ?", (time.time(), row[0]))
+        return row[0], row[1]
+
+    def local_copy(self, url):
+        """(file path, content type, digest) of the local copy of `url`, downloading it if needed"""
+        if not self.mirrors(url):
+            self._count('rejected')
+            raise MirrorError(f"{url} is not an OCW file", status=400)
+
+        found = self._cached(url)
+        if found is None:
+            # One download per URL in this process: concurrent requests wait for it
+            with self._lock:
+                lock = self._fetching.setdefault(url, threading.Lock())
+            with lock:
+                found = self._cached(url)
+                if found is None:
+                    try:
+                        found = self._download(url)
+                    finally:
+                        with self._lock:
+                            self._fetching.pop(url, None)
+                else:
+                    self._count('hit')
+        else:
+            self._count('hit')
+        digest, content_type = found
+        return self.path(digest), content_type, digest
+
+    def _download(self, url):
+        """Stream `url` into a temp file while hashing it, then move it to its digest's path"""
+        try:
+            response = self.session.get(url, headers=self.headers, timeout=self.timeout, stream=True)
+        except requests.exceptions.RequestException as e:
+            self._count('failed')
+            raise MirrorError(f"Could not fetch {url}: {e}")
+
+        with response:
+            if response.status_code != 200:
+                self._count('failed')
+                raise MirrorError(f"{url} returned {response.status_code}",
+                                  status=404 if response.status_code == 404 else 502)
+            content_type = response.headers.get('Content-Type', 'application/octet-stream')
+            if content_type.split(';')[0].strip().lower() == 'text/html':
+                self._count('rejected')
+                raise MirrorError(f"{url} is a page, not a file", status=400)
+            if int(response.headers.get('Content-Length') or 0) > self.max_file_bytes:
+                self._count('rejected')
+                raise MirrorError(f"{url} is larger than {self.max_file_bytes} bytes", status=413)
+
+            digest, size, temp_path = self._write_temp(url, response)
+
+        final_path = self.path(digest)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        if os.path.exists(final_path):
+            # Same bytes as a file already stored under another URL
+            os.unlink(temp_path)
+            self._count('deduplicated')
+        else:
+            os.replace(temp_path, final_path)
+            self._count('fetched')
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO blobs (digest, size, accessed_at) VALUES (?, ?, ?)", (digest, size, now))
+        conn.execute("INSERT OR REPLACE INTO urls (url, digest, content_type, fetched_at) VALUES (?, ?, ?, ?)",
+                     (url, digest, content_type, now))
+        self.enforce_quota(keep=digest)
+        return digest, content_type
+
+    def _write_temp(self, url, response):
+        sha = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=os.path.join(self.root, 'tmp'))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(self.CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.max_file_bytes:
+                        self._count('rejected')
+                        raise MirrorError(f"{url} is larger than {self.max_file_bytes} bytes", status=413)
+                    sha.update(chunk)
+                    f.write(chunk)
+        except requests.exceptions.RequestException as e:
+            os.unlink(temp_path)
+            self._count('failed')
+            raise MirrorError(f"Could not fetch {url}: {e}")
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return sha.hexdigest(), size, temp_path
+
+    def enforce_quota(self, keep=None):
+        """Remove least recently used files until the mirror fits in max_bytes"""
+        conn = self._connect()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% so the next few downloads do not trigger another pass
+        excess = total - int(self.max_bytes * 0.9)
+        victims, freed = [], 0
+        for digest, size in conn.execute("SELECT digest, size FROM blobs ORDER BY accessed_at"):
+            if freed >= excess:
+                break
+            if digest != keep:
+                victims.append(digest)
+                freed += size
+        for digest in victims:
+            conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            conn.execute("DELETE FROM urls WHERE digest = ?", (digest,))
+            try:
+                os.unlink(self.path(digest))
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._evicted += len(victims)
+
+    def stats(self):
+        try:
+            files, total = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            urls = self._connect().execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        except sqlite3.Error:
+            files, total, urls = None, None, None
+        with self._lock:
+            counts = dict(self._counts)
+            evicted = self._evicted
+        return {'root': self.root, 'files': files, 'urls': urls, 'bytes': total, 'max_bytes': self.max_bytes,
+                'evicted': evicted, 'requests': counts}
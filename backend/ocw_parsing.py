@@ -0,0 +1,57 @@
+"""HTML parsing for scraped OCW pages.
+
+Scrapers only look at a few kinds of element: anchors for materials and
+section links, result containers for search pages, and head tags for
+catalog metadata. Each parse passes a SoupStrainer, so BeautifulSoup only
+builds those elements (and their children) instead of the whole DOM.
+lxml is used as the tree builder when it is installed (it is several
+times faster than the pure-Python html.parser), and OCW_HTML_PARSER
+overrides the choice.
+
+benchmarks/bench_parse.py compares parsers and strainers on saved pages.
+"""
+import os
+import time
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from metrics import registry
+
+try:
+    import lxml  # noqa: F401  (only needed as BeautifulSoup's tree builder)
+    DEFAULT_PARSER = 'lxml'
+except ImportError:
+    DEFAULT_PARSER = 'html.parser'
+
+PARSER = os.getenv('OCW_HTML_PARSER', DEFAULT_PARSER)
+
+# Anchors with an href: materials and section links
+LINKS = SoupStrainer('a', href=True)
+
+# Search result containers. Every selector in parse_search_results looks
+# inside an <article> or the page's <main>
+SEARCH_RESULTS = SoupStrainer(['article', 'main'])
+
+# Title, description and department link of a course home page
+COURSE_INFO = SoupStrainer(['meta', 'title', 'h1', 'a'])
+
+def parse_html(content, parse_only=None, kind='page'):
+    """BeautifulSoup tree of `content`, limited to `parse_only` elements"""
+    start = time.perf_counter()
+    soup = BeautifulSoup(content, PARSER, parse_only=parse_only)
+    registry.observe('ocw_parse_seconds', time.perf_counter() - start, kind=kind, parser=PARSER)
+    return soup
+
+def parse_links(content):
+    return parse_html(content, LINKS, kind='links')
+
+def parse_search_page(content):
+    """Result containers of a search page, or the whole page if it has none"""
+    soup = parse_html(content, SEARCH_RESULTS, kind='search')
+    if soup.find(['article', 'main']) is None:
+        # Unfamiliar markup: let every selector see the full page
+        soup = parse_html(content, kind='search_full')
+    return soup
+
+def parse_course_info(content):
+    return parse_html(content, COURSE_INFO, kind='course_info')
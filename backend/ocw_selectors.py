@@ -0,0 +1,178 @@
+"""Selector strategies for scraping OCW search result pages.
+
+OCW's search markup has changed several times, so results are found by
+trying a list of CSS selector strategies until one yields courses. Two
+kinds of strategy exist:
+
+- "items": each matched element is one result; its title is the first
+  h3 (else h2, else h4), its link the first <a href>, its description the first
+  p.description/p.summary (or any <p>).
+- "links": each matched <a> is one result, titled by its text.
+
+The strategy that last produced results is tried first, so once OCW's
+markup settles on one pattern every search costs one select() instead of
+a scan per failed pattern. Every `reprobe_every` searches the strategies
+are tried in their configured priority order instead, so a more specific
+strategy that starts matching again takes over from a generic one.
+
+Extra strategies are loaded from a JSON file (OCW_SELECTOR_STRATEGIES,
+default data/ocw_selectors.json) holding a list like
+
+    [{"name": "card", "items": "div.course-card", "priority": 5}]
+
+An entry with the name of a built-in strategy replaces it. Lower
+priority values are tried first; built-ins use 10, 20, ... 50. Selectors
+run against the <article> and <main> elements ocw_parsing keeps from a
+search page (the whole page when it has neither).
+"""
+import json
+import os
+import threading
+import time
+
+import soupsieve
+
+from metrics import registry
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'ocw_selectors.json')
+
+OCW_BASE = 'https://ocw.mit.edu'
+MAX_RESULTS = 10
+
+BUILTIN_STRATEGIES = [
+    {'name': 'article.resource', 'items': 'article.resource', 'priority': 10},
+    {'name': 'course-item', 'items': 'div.course-item, div.resource-item', 'priority': 20},
+    {'name': 'article', 'items': 'article', 'priority': 30},
+    {'name': 'search-results-links', 'links': 'div.search-results a[href*="/courses/"]', 'priority': 40},
+    {'name': 'main-links', 'links': 'main a[href*="/courses/"]', 'priority': 50}
+]
+
+def _absolute(url):
+    return url if url.startswith('http') else OCW_BASE + url
+
+def extract_items(soup, selector):
+    courses = []
+    for item in soup.select(selector, limit=MAX_RESULTS):
+        title_elem = item.find('h3') or item.find('h2') or item.find('h4')
+        link_elem = item.find('a', href=True)
+        if title_elem and link_elem:
+            desc_elem = item.select_one('p.description, p.summary') or item.find('p')
+            description = desc_elem.text.strip() if desc_elem else 'No description available'
+            courses.append({
+                'title': title_elem.text.strip(),
+                'url': _absolute(link_elem['href']),
+                'description': description[:200]
+            })
+    return courses
+
+def extract_links(soup, selector):
+    courses = []
+    for link in soup.select(selector, limit=MAX_RESULTS):
+        if link.get('href') and link.text.strip():
+            courses.append({
+                'title': link.text.strip(),
+                'url': _absolute(link['href']),
+                'description': 'Click to view course details'
+            })
+    return courses
+
+EXTRACTORS = {'items': extract_items, 'links': extract_links}
+
+class Strategy:
+    def __init__(self, name, kind, selector, priority):
+        self.name = name
+        self.kind = kind
+        self.selector = selector
+        self.priority = priority
+
+    @classmethod
+    def from_config(cls, entry):
+        kinds = [kind for kind in EXTRACTORS if kind in entry]
+        if not entry.get('name') or len(kinds) != 1:
+            raise ValueError(f"strategy needs a name and exactly one of {sorted(EXTRACTORS)}: {entry!r}")
+        priority = entry.get('priority', 100)
+        if isinstance(priority, bool) or not isinstance(priority, (int, float)):
+            raise ValueError(f"strategy priority must be a number: {entry!r}")
+        soupsieve.compile(entry[kinds[0]])
+        return cls(entry['name'], kinds[0], entry[kinds[0]], priority)
+
+    def extract(self, soup):
+        return EXTRACTORS[self.kind](soup, self.selector)
+
+def load_strategies(path):
+    """Built-in strategies merged with those in the JSON file at `path`"""
+    entries = {entry['name']: entry for entry in BUILTIN_STRATEGIES}
+    if path and os.path.exists(path):
+        try:
+            with open(path) as f:
+                configured = json.load(f)
+            for entry in configured:
+                Strategy.from_config(entry)
+            entries.update((entry['name'], entry) for entry in configured)
+        except (OSError, ValueError, TypeError, soupsieve.SelectorSyntaxError) as e:
+            print(f"Ignoring selector strategies in {path}: {e}")
+    return sorted((Strategy.from_config(entry) for entry in entries.values()), key=lambda s: s.priority)
+
+class SelectorRegistry:
+    """Search result strategies, ordered by most recent success"""
+
+    def __init__(self, strategies, reprobe_every=50):
+        self.strategies = list(strategies)
+        self.reprobe_every = reprobe_every
+        self._lock = threading.Lock()
+        self._preferred = None
+        self._searches = 0
+        self._counts = {s.name: {'hits': 0, 'misses': 0, 'last_hit': None} for s in self.strategies}
+        self._empty = 0
+
+    def _order(self):
+        with self._lock:
+            self._searches += 1
+            reprobe = self.reprobe_every and self._searches % self.reprobe_every == 0
+            preferred = self._preferred
+        if reprobe or preferred is None:
+            return self.strategies, reprobe
+        return [preferred] + [s for s in self.strategies if s is not preferred], False
+
+    def _record(self, strategy, hit):
+        with self._lock:
+            counts = self._counts[strategy.name]
+            if hit:
+                counts['hits'] += 1
+                counts['last_hit'] = time.time()
+                self._preferred = strategy
+            else:
+                counts['misses'] += 1
+        registry.inc('ocw_selector_attempts_total', strategy=strategy.name, outcome='hit' if hit else 'miss')
+
+    def extract(self, soup):
+        """Courses from the first strategy that finds any, or []"""
+        order, reprobe = self._order()
+        if reprobe:
+            registry.inc('ocw_selector_reprobes_total')
+        for strategy in order:
+            courses = strategy.extract(soup)
+            self._record(strategy, bool(courses))
+            if courses:
+                return courses
+        with self._lock:
+            self._empty += 1
+        return []
+
+    def stats(self):
+        with self._lock:
+            return {
+                'preferred': self._preferred.name if self._preferred else None,
+                'searches': self._searches,
+                'empty': self._empty,
+                'reprobe_every': self.reprobe_every,
+                'strategies': [dict(self._counts[s.name], name=s.name, kind=s.kind, selector=s.selector,
+                                    priority=s.priority) for s in self.strategies]
+            }
+
+# Search strategies shared by the sync and async search routes
+selector_registry = SelectorRegistry(
+    load_strategies(os.getenv('OCW_SELECTOR_STRATEGIES', DEFAULT_CONFIG_PATH)),
+    reprobe_every=int(os.getenv('OCW_SELECTOR_REPROBE_EVERY', '50'))
+)
+registry.register_collector('ocw_selectors', selector_registry.stats)
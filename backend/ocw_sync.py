@@ -0,0 +1,373 @@
+"""Incremental sync of the local OCW course catalog.
+
+Keeps data/ocw_sync.db (course metadata and materials, plus what was last
+fetched for each page) up to date without recrawling every course:
+
+1. Course URLs are collected from the OCW sitemap and the RSS feeds
+   (MIT_OCW_FEEDS). The sitemap index lists one sitemap per course with
+   its `lastmod`, so no per-course sitemap is fetched.
+2. A course whose sitemap `lastmod` is unchanged since its last
+   successful fetch is skipped without a request. Every other course page
+   is fetched with If-None-Match / If-Modified-Since, and a 304 is also a
+   skip.
+3. Changed pages are re-parsed: title, description, department, course
+   number and materials (parse_course_materials, as /materials does).
+   Courses whose content did not change are not rewritten.
+4. After the run, the catalog (data/ocw_catalog.jsonl) is exported and the
+   search index rebuilt if any course changed.
+
+Requests are rate limited (--rate, per second). The run's URL list and
+position are checkpointed every --checkpoint-every pages, so an
+interrupted sync resumes where it stopped.
+
+    python ocw_sync.py [--rate 1] [--limit N] [--restart] [--no-sitemap]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import xml.etree.ElementTree as ElementTree
+
+import feedparser
+import requests
+
+from mit_resource import MIT_OCW_FEEDS, MATERIALS_HEADERS, parse_course_materials
+from ocw_index import DEFAULT_CATALOG_PATH, build_index, course_index
+from ocw_parsing import parse_course_info
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, 'ocw_sync.db')
+SITEMAP_URL = 'https://ocw.mit.edu/sitemap.xml'
+
+# https://ocw.mit.edu/courses/<slug>/ and that course's own sitemap
+COURSE_URL = re.compile(r'^https?://ocw\.mit\.edu/courses/([^/?#]+)/?$')
+COURSE_SITEMAP_URL = re.compile(r'^https?://ocw\.mit\.edu/courses/([^/?#]+)/sitemap\.xml$')
+
+# Slugs start with the course number: 6-006-introduction-to-algorithms-spring-2020 -> 6.006
+SLUG_NUMBER = re.compile(r'^(\d+|[a-z]+)-(\d+[a-z]*)-')
+
+def course_url(slug):
+    return f"https://ocw.mit.edu/courses/{slug}/"
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    def wait(self):
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+class CatalogSync:
+    """One sync of the course catalog into a SQLite store"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, session=None, rate=1.0, timeout=15, checkpoint_every=20):
+        self.db_path = db_path
+        self.session = session or requests.Session()
+        self.limiter = RateLimiter(rate)
+        self.timeout = timeout
+        self.checkpoint_every = checkpoint_every
+        self._init_db()
+
+    # ------------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------------
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    sitemap_lastmod TEXT,
+                    fetched_at REAL,
+                    status INTEGER
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS courses (
+                    url TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    description TEXT,
+                    department TEXT,
+                    course_number TEXT,
+                    materials TEXT,
+                    content_hash TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    started_at REAL NOT NULL,
+                    finished_at REAL,
+                    full INTEGER NOT NULL,
+                    urls TEXT NOT NULL,
+                    position INTEGER NOT NULL DEFAULT 0,
+                    report TEXT NOT NULL
+                )
+            """)
+
+    def _unfinished_run(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT * FROM runs WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1").fetchone()
+
+    def _checkpoint(self, run_id, position, report, finished=False):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE runs SET position = ?, report = ?, finished_at = ? WHERE id = ?",
+                (position, json.dumps(report), time.time() if finished else None, run_id)
+            )
+
+    # ------------------------------------------------------------------------
+    # Discovery
+    # ------------------------------------------------------------------------
+
+    def _get(self, url, headers=None):
+        self.limiter.wait()
+        return self.session.get(url, headers={**MATERIALS_HEADERS, **(headers or {})}, timeout=self.timeout)
+
+    def discover_sitemap(self, url=SITEMAP_URL, depth=0):
+        """({course url: lastmod or None}, complete) from the sitemap (index or url set).
+
+        `complete` is False when this sitemap or any sitemap it nests could
+        not be read, so the courses are only part of the catalog.
+        """
+        courses = {}
+        complete = True
+        try:
+            response = self._get(url)
+            response.raise_for_status()
+            root = ElementTree.fromstring(response.content)
+        except (requests.exceptions.RequestException, ElementTree.ParseError) as e:
+            print(f"Could not read sitemap {url}: {e}")
+            return courses, False
+
+        for entry in root:
+            fields = {child.tag.rsplit('}', 1)[-1]: (child.text or '').strip() for child in entry}
+            loc, lastmod = fields.get('loc', ''), fields.get('lastmod') or None
+            if entry.tag.endswith('sitemap'):
+                match = COURSE_SITEMAP_URL.match(loc)
+                if match:
+                    courses[course_url(match.group(1))] = lastmod
+                elif depth < 2:
+                    nested, nested_complete = self.discover_sitemap(loc, depth + 1)
+                    courses.update(nested)
+                    complete = complete and nested_complete
+                else:
+                    complete = False
+            else:
+                match = COURSE_URL.match(loc)
+                if match:
+                    courses[course_url(match.group(1))] = lastmod
+        return courses, complete
+
+    def discover_feeds(self):
+        """Course URLs linked from the RSS feeds"""
+        courses = {}
+        for feed_url in MIT_OCW_FEEDS.values():
+            try:
+                response = self._get(feed_url)
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                print(f"Could not read feed {feed_url}: {e}")
+                continue
+            for entry in feedparser.parse(response.content).entries:
+                match = COURSE_URL.match(entry.get('link', ''))
+                if match:
+                    courses[course_url(match.group(1))] = None
+        return courses
+
+    # ------------------------------------------------------------------------
+    # Fetching
+    # ------------------------------------------------------------------------
+
+    def sync_course(self, url, sitemap_lastmod):
+        """Bring one course up to date; returns 'skipped', 'not_modified', 'unchanged', 'updated' or 'failed'"""
+        with self._connect() as conn:
+            page = conn.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+            stored = conn.execute("SELECT content_hash FROM courses WHERE url = ?", (url,)).fetchone()
+
+        if page is not None and stored is not None and sitemap_lastmod and page['sitemap_lastmod'] == sitemap_lastmod:
+            return 'skipped'
+
+        headers = {}
+        if page is not None and stored is not None:
+            if page['etag']:
+                headers['If-None-Match'] = page['etag']
+            if page['last_modified']:
+                headers['If-Modified-Since'] = page['last_modified']
+
+        try:
+            response = self._get(url, headers)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Could not fetch {url}: {e}")
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if status == 404 and stored is not None:
+                self._remove(url)
+            return 'failed'
+
+        now = time.time()
+        outcome = 'not_modified'
+        if response.status_code != 304:
+            course = parse_course_page(url, response.content)
+            outcome = 'unchanged' if stored is not None and stored['content_hash'] == course['content_hash'] else 'updated'
+            if outcome == 'updated':
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO courses (url, title, description, department, course_number, materials, content_hash, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (url, course['title'], course['description'], course['department'], course['course_number'],
+                         json.dumps(course['materials']), course['content_hash'], now)
+                    )
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, sitemap_lastmod, fetched_at, status) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, response.headers.get('ETag') or (page['etag'] if page else None),
+                 response.headers.get('Last-Modified') or (page['last_modified'] if page else None),
+                 sitemap_lastmod, now, response.status_code)
+            )
+        return outcome
+
+    def _remove(self, url):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM courses WHERE url = ?", (url,))
+            conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+
+    # ------------------------------------------------------------------------
+    # Runs
+    # ------------------------------------------------------------------------
+
+    def run(self, use_sitemap=True, limit=None, restart=False):
+        """Sync (or resume) a run; returns its report"""
+        started = time.time()
+        run = None if restart else self._unfinished_run()
+        if run is not None:
+            run_id, full, position = run['id'], bool(run['full']), run['position']
+            urls = json.loads(run['urls'])
+            report = json.loads(run['report'])
+            report['resumed_at'] = position
+            print(f"Resuming sync run {run_id} at {position}/{len(urls)}")
+        else:
+            discovered, complete = self.discover_sitemap() if use_sitemap else ({}, False)
+            # Only a sitemap read in full can show that a course was taken down
+            full = complete and bool(discovered) and limit is None
+            if use_sitemap and not complete:
+                print("Sitemap only partly read: keeping courses it does not list")
+            for url, lastmod in self.discover_feeds().items():
+                discovered.setdefault(url, lastmod)
+            urls = sorted(discovered.items())[:limit]
+            position = 0
+            report = {'discovered': len(urls), 'fetched': 0, 'skipped': 0, 'not_modified': 0,
+                      'updated': 0, 'unchanged': 0, 'failed': 0, 'removed': 0}
+            with self._connect() as conn:
+                if restart:
+                    conn.execute("UPDATE runs SET finished_at = ? WHERE finished_at IS NULL", (started,))
+                run_id = conn.execute(
+                    "INSERT INTO runs (started_at, full, urls, report) VALUES (?, ?, ?, ?)",
+                    (started, int(full), json.dumps(urls), json.dumps(report))
+                ).lastrowid
+
+        while position < len(urls):
+            url, lastmod = urls[position]
+            outcome = self.sync_course(url, lastmod)
+            report[outcome] += 1
+            if outcome in ('updated', 'unchanged'):
+                report['fetched'] += 1
+            position += 1
+            if position % self.checkpoint_every == 0:
+                self._checkpoint(run_id, position, report)
+                print(f"Synced {position}/{len(urls)}: {report['fetched']} fetched, {report['skipped'] + report['not_modified']} skipped")
+
+        if full:
+            # Courses that dropped out of a complete sitemap were taken down
+            listed = {url for url, _ in urls}
+            with self._connect() as conn:
+                gone = [row['url'] for row in conn.execute("SELECT url FROM courses") if row['url'] not in listed]
+            for url in gone:
+                self._remove(url)
+            report['removed'] += len(gone)
+
+        report['elapsed_seconds'] = round(time.time() - started, 1)
+        self._checkpoint(run_id, position, report, finished=True)
+        if report['updated'] or report['removed'] or not os.path.exists(course_index.path):
+            report['index'] = self.rebuild_index()
+        return report
+
+    def rebuild_index(self, catalog_path=DEFAULT_CATALOG_PATH):
+        """Export the catalog as JSON lines and rebuild the search index from it"""
+        with self._connect() as conn:
+            courses = [
+                {'url': row['url'], 'title': row['title'], 'description': row['description'],
+                 'department': row['department'], 'course_number': row['course_number']}
+                for row in conn.execute("SELECT url, title, description, department, course_number FROM courses ORDER BY url")
+            ]
+
+        os.makedirs(os.path.dirname(catalog_path) or '.', exist_ok=True)
+        tmp_path = f"{catalog_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for course in courses:
+                f.write(json.dumps(course, sort_keys=True) + '\n')
+        os.replace(tmp_path, catalog_path)
+        return build_index(courses, course_index.path)
+
+def parse_course_page(url, content):
+    """Catalog fields and materials from a course home page"""
+    soup = parse_course_info(content)
+
+    def meta(*names):
+        for name in names:
+            tag = soup.find('meta', attrs={'property': name}) or soup.find('meta', attrs={'name': name})
+            if tag and tag.get('content'):
+                return tag['content'].strip()
+        return ''
+
+    heading = soup.find('h1')
+    title = meta('og:title') or (heading.get_text(strip=True) if heading else '') or (soup.title.string or '' if soup.title else '')
+    title = title.split(' | ')[0].strip()
+
+    department = soup.find('a', href=re.compile(r'[?&]d='))
+    slug = COURSE_URL.match(url).group(1)
+    number = SLUG_NUMBER.match(slug)
+
+    course = {
+        'title': title or slug,
+        'description': meta('description', 'og:description'),
+        'department': department.get_text(strip=True) if department else '',
+        'course_number': f"{number.group(1)}.{number.group(2)}".upper() if number else '',
+        'materials': parse_course_materials(content)
+    }
+    course['content_hash'] = hashlib.sha256(json.dumps(course, sort_keys=True).encode('utf-8')).hexdigest()
+    return course
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.getenv('OCW_SYNC_DB', DEFAULT_DB_PATH))
+    parser.add_argument('--rate', type=float, default=float(os.getenv('OCW_SYNC_RATE', '1')), help='requests per second')
+    parser.add_argument('--limit', type=int, help='sync at most this many courses')
+    parser.add_argument('--checkpoint-every', type=int, default=20)
+    parser.add_argument('--restart', action='store_true', help='abandon an unfinished run instead of resuming it')
+    parser.add_argument('--no-sitemap', action='store_true', help='only sync courses from the RSS feeds')
+    args = parser.parse_args()
+
+    sync = CatalogSync(args.db, rate=args.rate, checkpoint_every=args.checkpoint_every)
+    print(json.dumps(sync.run(use_sitemap=not args.no_sitemap, limit=args.limit, restart=args.restart), indent=2))
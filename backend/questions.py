@@ -0,0 +1,212 @@
+from llm_client import routed_call_groq_api, async_routed_call_groq_api
+from load_governor import governor
+
+def create_question_prompt(question_num, previous_answers, asked_topics):
+    """Build the adaptive question prompt for the student's performance so far"""
+    
+    context = "You are an expert Data Structures and Algorithms educator.\n\n"
+    
+    if asked_topics:
+        context += f"Topics already asked: {', '.join(asked_topics)}\n"
+        context += "You MUST ask about DIFFERENT topics that have NOT been covered yet.\n\n"
+    
+    if previous_answers:
+        context += "Previous Questions and Student Responses:\n"
+        for i, ans in enumerate(previous_answers, 1):
+            level_text = {
+                2: "KNOWS WELL",
+                1: "SOMEWHAT KNOWS", 
+                0: "DOESN'T KNOW"
+            }
+            context += f"{i}. {ans['question']}\n   Answer: {level_text[ans['answer']]}\n\n"
+        
+        total_score = sum(a['answer'] for a in previous_answers)
+        max_score = len(previous_answers) * 2
+        performance_rate = total_score / max_score
+        
+        context += f"Current Performance: {total_score}/{max_score} points ({performance_rate*100:.0f}%)\n\n"
+        
+        if performance_rate >= 0.75:
+            difficulty = "ADVANCED"
+            context += "Student is performing EXCELLENTLY. Ask an ADVANCED/EXPERT level question.\n"
+        elif performance_rate >= 0.5:
+            difficulty = "INTERMEDIATE"
+            context += "Student is performing MODERATELY. Ask an INTERMEDIATE level question.\n"
+        elif performance_rate >= 0.25:
+            difficulty = "BASIC"
+            context += "Student is STRUGGLING. Ask a FUNDAMENTAL/BASIC question.\n"
+        else:
+            difficulty = "VERY BASIC"
+            context += "Student knows very little. Ask the most FUNDAMENTAL question possible.\n"
+    else:
+        difficulty = "BASIC"
+        context += "This is the FIRST question. Start with a BASIC foundational concept.\n"
+    
+    if difficulty == "VERY BASIC":
+        topics = [
+            "arrays and basic indexing",
+            "what variables store",
+            "basic list operations",
+            "simple iteration/loops",
+            "counting elements"
+        ]
+    elif difficulty == "BASIC":
+        topics = [
+            "arrays and array operations",
+            "linked lists basics",
+            "stack LIFO principle",
+            "queue FIFO principle",
+            "basic recursion",
+            "linear search",
+            "bubble sort basics"
+        ]
+    elif difficulty == "INTERMEDIATE":
+        topics = [
+            "binary search algorithm",
+            "merge sort or quick sort",
+            "binary trees structure",
+            "hash tables and hashing",
+            "doubly linked lists",
+            "circular queues",
+            "depth-first search (DFS)",
+            "breadth-first search (BFS)",
+            "heaps (min/max heap)"
+        ]
+    else:
+        topics = [
+            "AVL trees and rotations",
+            "red-black trees",
+            "B-trees and B+ trees",
+            "graph algorithms (Dijkstra, Bellman-Ford)",
+            "dynamic programming with data structures",
+            "trie data structure",
+            "segment trees",
+            "disjoint set union (DSU)",
+            "skip lists",
+            "suffix arrays or suffix trees"
+        ]
+    
+    available_topics = [t for t in topics if t not in asked_topics]
+    if not available_topics:
+        available_topics = topics
+        asked_topics.clear()
+    
+    context += f"\nAvailable topics to choose from: {', '.join(available_topics)}\n"
+    
+    prompt = f"""{context}
+
+CRITICAL INSTRUCTIONS:
+1. Generate question {question_num} of 5 for Data Structures assessment
+2. Pick ONE topic from the available topics list above that has NOT been asked yet
+3. Ask about knowledge level: "How well do you know [concept]?"
+4. Make it specific to the difficulty level: {difficulty}
+5. The question MUST be completely DIFFERENT from all previous questions
+
+OUTPUT FORMAT (respond with ONLY this JSON, nothing else):
+{{
+  "question": "How well do you know [specific concept]?",
+  "topic": "topic_name"
+}}
+
+Generate the question NOW:"""
+    
+    return prompt
+
+def is_valid_question(result):
+    """The reply has the question text and topic the prompt asked for"""
+    return (
+        isinstance(result, dict)
+        and isinstance(result.get('question'), str) and bool(result['question'].strip())
+        and isinstance(result.get('topic'), str) and bool(result['topic'].strip())
+    )
+
+def record_question(question_num, result, asked_topics):
+    """Pull the question text out of the LLM reply and mark its topic as asked"""
+    question_text = result.get('question', '')
+    topic = result.get('topic', 'unknown')
+    
+    asked_topics.add(topic)
+    
+    print(f"Generated Question {question_num}: {question_text}")
+    print(f"Topic: {topic}")
+    
+    return question_text
+
+def generate_question(question_num, previous_answers, asked_topics):
+    """Generate adaptive questions based on previous answers using Groq LLM
+    
+    `asked_topics` is the calling service's set of topics already asked in
+    this assessment; it is updated in place.
+    """
+    if governor.degraded('question'):
+        return get_emergency_question(question_num, previous_answers)
+    
+    prompt = create_question_prompt(question_num, previous_answers, asked_topics)
+    
+    try:
+        result = routed_call_groq_api('question', prompt, validate=is_valid_question, priority='interactive')
+        return record_question(question_num, result, asked_topics)
+    
+    except Exception as e:
+        print(f"ERROR generating question: {e}")
+        print("Using emergency fallback")
+        
+        return get_emergency_question(question_num, previous_answers)
+
+async def generate_question_async(question_num, previous_answers, asked_topics):
+    """Async generate_question for the ASGI app"""
+    if governor.degraded('question'):
+        return get_emergency_question(question_num, previous_answers)
+    
+    prompt = create_question_prompt(question_num, previous_answers, asked_topics)
+    
+    try:
+        result = await async_routed_call_groq_api('question', prompt, validate=is_valid_question, priority='interactive')
+        return record_question(question_num, result, asked_topics)
+    
+    except Exception as e:
+        print(f"ERROR generating question: {e}")
+        print("Using emergency fallback")
+        
+        return get_emergency_question(question_num, previous_answers)
+
+def get_emergency_question(question_num, previous_answers):
+    """Pick a pre-written question, pitched at the student's score so far, when the LLM is unavailable"""
+    
+    if previous_answers:
+        total_score = sum(a['answer'] for a in previous_answers)
+        max_score = len(previous_answers) * 2
+        if total_score >= max_score * 0.7:
+            emergency_questions = [
+                "How well do you know self-balancing binary search trees?",
+                "How familiar are you with graph traversal algorithms like Dijkstra's?",
+                "How well do you understand trie data structures?",
+                "How comfortable are you with dynamic programming optimizations?",
+                "How well do you know segment trees for range queries?"
+            ]
+        elif total_score >= max_score * 0.4:
+            emergency_questions = [
+                "How well do you know binary search trees?",
+                "How familiar are you with hash tables?",
+                "How well do you understand depth-first search?",
+                "How comfortable are you with heaps?",
+                "How well do you know merge sort?"
+            ]
+        else:
+            emergency_questions = [
+                "How well do you understand arrays?",
+                "How familiar are you with linked lists?",
+                "How well do you know stacks?",
+                "How comfortable are you with queues?",
+                "How well do you understand loops?"
+            ]
+    else:
+        emergency_questions = [
+            "How well do you understand arrays?",
+            "How familiar are you with linked lists?",
+            "How well do you know stacks?",
+            "How comfortable are you with queues?",
+            "How well do you understand recursion?"
+        ]
+    
+    return emergency_questions[question_num - 1] if question_num <= len(emergency_questions) else emergency_questions[0]
@@ -0,0 +1,337 @@
+import ipaddress
+import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'roadmap_jobs.db')
+
+class QueueFullError(Exception):
+    """Raised when the job queue has reached its maximum depth"""
+
+def check_callback_url(url, allowed_hosts=()):
+    """Raise ValueError unless `url` is an http(s) URL the server may POST to.
+
+    With `allowed_hosts` set the host must be one of them. Otherwise every
+    address the host resolves to must be public, so a client cannot point
+    callbacks at loopback, private or link-local services.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError('callback_url must be an http(s) URL')
+    if allowed_hosts:
+        if parts.hostname.lower() not in allowed_hosts:
+            raise ValueError(f"callback_url host {parts.hostname} is not allowed")
+        return
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or None, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError, ValueError):
+        raise ValueError(f"callback_url host {parts.hostname} could not be resolved")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if not address.is_global:
+            raise ValueError(f"callback_url host {parts.hostname} is not a public address")
+
+class RoadmapJobQueue:
+    """Background roadmap generation jobs backed by a local SQLite queue.
+
+    Jobs are written to disk before they are queued, so anything still
+    queued or running when the process stops is picked up again by the
+    next start(). A fixed pool of worker threads runs `handler(payload)`
+    and stores its return value as the job result.
+    """
+
+    def __init__(self, handler, db_path=DEFAULT_DB_PATH, max_workers=2, max_queue_depth=100, callback_timeout=10,
+                 callback_hosts=()):
+        self.handler = handler
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.callback_timeout = callback_timeout
+        self.callback_hosts = tuple(host.lower() for host in callback_hosts)
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._stopping = False
+        self._running = 0
+        self._wait_times = deque(maxlen=200)
+        self._run_times = deque(maxlen=200)
+
+    # ------------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------------
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    callback_url TEXT,
+                    callback_status TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+    def _update(self, job_id, **fields):
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def _row_to_job(self, row):
+        job = {
+            'job_id': row['id'],
+            'status': row['status'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+            'attempts': row['attempts']
+        }
+        if row['result'] is not None:
+            job['result'] = json.loads(row['result'])
+            # A result on an unfinished job is the provisional answer served while it runs
+            job['provisional'] = row['status'] in ('queued', 'running')
+        if row['error'] is not None:
+            job['error'] = row['error']
+        if row['callback_url']:
+            job['callback_status'] = row['callback_status']
+        return job
+
+    # ------------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------------
+
+    def recover_interrupted(self):
+        """Mark jobs left 'running' by a stopped process as queued again.
+
+        Only call this when no other process is running jobs from the same
+        database (e.g. once in the server's master process before forking).
+        """
+        self._init_db()
+        with self._lock, self._connect() as conn:
+            recovered = conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+
+        if recovered:
+            print(f"Re-queued {recovered} interrupted roadmap job(s) from {self.db_path}")
+
+    def start(self, recover=True):
+        """Create the queue database, pick up queued jobs and start the workers
+
+        With recover=False, jobs marked as running are left alone because
+        another worker process may still own them.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._stopping = False
+
+        if recover:
+            self.recover_interrupted()
+        else:
+            self._init_db()
+
+        # Jobs that were queued when the last process stopped; with several
+        # worker processes each one queues them and the first to claim a job runs it
+        with self._connect() as conn:
+            pending = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+
+        for row in pending:
+            self._queue.put(row['id'])
+
+        if pending:
+            print(f"Loaded {len(pending)} queued roadmap job(s) from {self.db_path}")
+
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker, name=f"roadmap-job-worker-{i}", daemon=True)
+            worker.start()
+
+    def submit(self, payload, callback_url=None, provisional_result=None):
+        """Persist a new job and queue it; returns the job record
+
+        `provisional_result` is returned by get() until the job finishes,
+        and is kept if the job fails.
+        """
+        self.start()
+
+        if self._queue.qsize() >= self.max_queue_depth:
+            raise QueueFullError(f"Roadmap job queue is full ({self.max_queue_depth} jobs waiting)")
+
+        job_id = uuid.uuid4().hex
+        created_at = time.time()
+
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, payload, result, callback_url, created_at) VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, json.dumps(payload), json.dumps(provisional_result) if provisional_result is not None else None, callback_url, created_at)
+            )
+
+        self._queue.put(job_id)
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Return the job record, or None if the ID is unknown"""
+        self.start()
+
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        return self._row_to_job(row) if row else None
+
+    def wait(self, job_id, timeout):
+        """Poll until the job has finished or `timeout` seconds pass; returns the job record"""
+        deadline = time.time() + timeout
+        job = self.get(job_id)
+
+        while job and job['status'] in ('queued', 'running') and time.time() < deadline:
+            time.sleep(min(0.5, max(0.0, deadline - time.time())))
+            job = self.get(job_id)
+
+        return job
+
+    def metrics(self):
+        """Queue depth, worker utilisation and wait/run time statistics"""
+        self.start()
+
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+        wait_times = list(self._wait_times)
+        run_times = list(self._run_times)
+
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'running': self._running,
+            'workers': self.max_workers,
+            'jobs_by_status': counts,
+            'oldest_queued_age_seconds': round(time.time() - oldest, 3) if oldest else 0.0,
+            'wait_time_seconds': _summarize(wait_times),
+            'run_time_seconds': _summarize(run_times)
+        }
+
+    def stop(self):
+        """Stop claiming new jobs; jobs already running are allowed to finish"""
+        self._stopping = True
+
+    # ------------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------------
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            if self._stopping:
+                # Leave the job queued on disk for the next process
+                self._queue.task_done()
+                continue
+            try:
+                self._run_job(job_id)
+            except Exception as e:
+                print(f"Roadmap job worker error for {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _run_job(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        if row is None or row['status'] != 'queued':
+            return
+
+        # Claim the job atomically so only one worker process runs it
+        started_at = time.time()
+        with self._lock, self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ? AND status = 'queued'",
+                (started_at, job_id)
+            ).rowcount
+        if not claimed:
+            return
+
+        self._wait_times.append(started_at - row['created_at'])
+
+        with self._lock:
+            self._running += 1
+
+        try:
+            result = self.handler(json.loads(row['payload']))
+            status, error = 'completed', None
+        except Exception as e:
+            print(f"Roadmap job {job_id} failed: {e}")
+            result, status, error = None, 'failed', str(e)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+        finished_at = time.time()
+        self._run_times.append(finished_at - started_at)
+
+        fields = {'status': status, 'error': error, 'finished_at': finished_at}
+        if result is not None:
+            fields['result'] = json.dumps(result)
+        self._update(job_id, **fields)
+
+        if row['callback_url']:
+            self._send_callback(job_id, row['callback_url'])
+
+    def _send_callback(self, job_id, callback_url, max_retries=3):
+        """POST the finished job to its completion callback URL"""
+        job = self.get(job_id)
+
+        # Checked again at send time: the host may resolve elsewhere by now
+        try:
+            check_callback_url(callback_url, self.callback_hosts)
+        except ValueError as e:
+            print(f"Callback rejected for job {job_id}: {e}")
+            self._update(job_id, callback_status='rejected')
+            return
+
+        for attempt in range(max_retries):
+            try:
+                response = requests.post(callback_url, json=job, timeout=self.callback_timeout,
+                                         allow_redirects=False)
+                response.raise_for_status()
+                self._update(job_id, callback_status='delivered')
+                return
+            except requests.exceptions.RequestException as e:
+                print(f"Callback error for job {job_id} (attempt {attempt + 1}): {e}")
+                if attempt < max_retries - 1:
+                    time.sleep(2 ** attempt)
+
+        self._update(job_id, callback_status='failed')
+
+def _summarize(values):
+    if not values:
+        return {'count': 0, 'avg': 0.0, 'max': 0.0}
+    return {
+        'count': len(values),
+        'avg': round(sum(values) / len(values), 3),
+        'max': round(max(values), 3)
+    }
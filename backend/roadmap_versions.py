@@ -0,0 +1,109 @@
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'roadmap_versions.db')
+
+class RoadmapVersionStore:
+    """Per-learner history of generated roadmaps and the assessment answers behind them"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, keep_versions=5):
+        self.db_path = db_path
+        self.keep_versions = keep_versions
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS roadmap_versions (
+                        learner_id TEXT NOT NULL,
+                        version INTEGER NOT NULL,
+                        answers TEXT NOT NULL,
+                        roadmap TEXT NOT NULL,
+                        generated_by TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        stale_sections TEXT NOT NULL DEFAULT '[]',
+                        PRIMARY KEY (learner_id, version)
+                    )
+                """)
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(roadmap_versions)")}
+                if 'stale_sections' not in columns:
+                    # Databases created before stale sections were recorded
+                    conn.execute("ALTER TABLE roadmap_versions ADD COLUMN stale_sections TEXT NOT NULL DEFAULT '[]'")
+            conn.close()
+            self._initialized = True
+
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def latest(self, learner_id):
+        """Return the learner's most recent roadmap version, or None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM roadmap_versions WHERE learner_id = ? ORDER BY version DESC LIMIT 1",
+                (learner_id,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            'learner_id': row['learner_id'],
+            'version': row['version'],
+            'answers': json.loads(row['answers']),
+            'roadmap': json.loads(row['roadmap']),
+            'generated_by': row['generated_by'],
+            'created_at': row['created_at'],
+            'stale_sections': json.loads(row['stale_sections'])
+        }
+
+    def save(self, learner_id, answers, roadmap, generated_by, stale_sections=()):
+        """Store a new roadmap version for the learner and return its version number.
+
+        `stale_sections` are sections that could not be generated for these
+        answers (kept from an older version or the fallback); the next
+        retake regenerates them even if the answers are unchanged.
+        """
+        with self._connect() as conn:
+            # Take the write lock before reading MAX(version), so concurrent saves
+            # from other workers wait instead of picking the same version
+            conn.execute("BEGIN IMMEDIATE")
+            current = conn.execute(
+                "SELECT MAX(version) FROM roadmap_versions WHERE learner_id = ?",
+                (learner_id,)
+            ).fetchone()[0] or 0
+            version = current + 1
+
+            conn.execute(
+                "INSERT INTO roadmap_versions (learner_id, version, answers, roadmap, generated_by, created_at, stale_sections) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (learner_id, version, json.dumps(answers), json.dumps(roadmap), generated_by, time.time(),
+                 json.dumps(list(stale_sections)))
+            )
+            conn.execute(
+                "DELETE FROM roadmap_versions WHERE learner_id = ? AND version <= ?",
+                (learner_id, version - self.keep_versions)
+            )
+
+        return version
+
+def diff_answers(old_answers, new_answers):
+    """Compare two assessment attempts question by question.
+
+    Returns a dict with the questions whose answer changed, and those that
+    were only asked in the new or only in the old attempt.
+    """
+    old = {a['question']: a['answer'] for a in old_answers}
+    new = {a['question']: a['answer'] for a in new_answers}
+
+    return {
+        'changed': [q for q in new if q in old and new[q] != old[q]],
+        'added': [q for q in new if q not in old],
+        'removed': [q for q in old if q not in new]
+    }
@@ -0,0 +1,155 @@
+"""Production entry point for the backend (every service from app.create_app).
+
+Runs gunicorn with threaded workers. The app and all service modules are
+imported once in the master before forking (preload), so the compiled
+fallback templates and other import-time state are shared copy-on-write.
+Falls back to a single-process threaded Werkzeug server (no reloader, no
+debugger) when gunicorn is not installed.
+
+On SIGTERM each worker stops reporting ready on /readyz, stops claiming
+roadmap jobs, finishes its in-flight requests and waits for outstanding
+LLM calls (including background roadmap jobs) before it exits.
+
+With --mode async the ASGI app (asgi.py) runs under uvicorn in a single
+process: Groq and OCW waits are awaited on the event loop, and --threads
+sizes the pool serving the remaining sync Flask routes.
+
+Usage: python serve.py [--mode threaded|async] [--bind 0.0.0.0:5000] [--workers 2] [--threads 8] [--graceful-timeout 30]
+Each option can also be set with WEB_MODE, WEB_BIND, WEB_WORKERS, WEB_THREADS
+and WEB_GRACEFUL_TIMEOUT.
+"""
+import argparse
+import os
+import signal
+import threading
+
+import lifecycle
+import usage_accounting
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['threaded', 'async'], default=os.getenv('WEB_MODE', 'threaded'))
+    parser.add_argument('--bind', default=os.getenv('WEB_BIND', '0.0.0.0:5000'))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', str(min(4, (os.cpu_count() or 1) + 1)))))
+    parser.add_argument('--threads', type=int, default=int(os.getenv('WEB_THREADS', '8')))
+    parser.add_argument('--graceful-timeout', type=int, default=int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30')),
+                        help='seconds a worker may spend draining requests and LLM calls on shutdown')
+    return parser.parse_args()
+
+def load_app():
+    """Import every service and build the app (done once, before forking)"""
+    from app import create_app
+    import ana_road
+    return create_app(), ana_road.roadmap_jobs
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+    import llm_client
+
+    application, roadmap_jobs = load_app()
+
+    # Before any worker exists, re-queue jobs a previous server left running
+    roadmap_jobs.recover_interrupted()
+
+    def post_fork(server, worker):
+        # Threads do not survive fork, so each worker starts its own job runners
+        roadmap_jobs.start(recover=False)
+        # GROQ_* rate limits are for the whole server; each worker schedules its share
+        llm_client.upstream_scheduler.split(args.workers)
+
+    def post_worker_init(worker):
+        # Gunicorn installs its signal handlers before this hook; chain ours in
+        # front so the worker reports not-ready as soon as shutdown starts
+        gunicorn_handler = signal.getsignal(signal.SIGTERM)
+
+        def handle_sigterm(signum, frame):
+            lifecycle.begin_drain()
+            roadmap_jobs.stop()
+            gunicorn_handler(signum, frame)
+
+        signal.signal(signal.SIGTERM, handle_sigterm)
+        lifecycle.mark_ready()
+
+    def worker_exit(server, worker):
+        # HTTP requests are finished by now; background jobs may still be waiting on Groq
+        lifecycle.drain(roadmap_jobs, args.graceful_timeout)
+        usage_accounting.accountant.flush(final=True)
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'graceful_timeout': args.graceful_timeout,
+        # LLM calls with retries can take well over a minute
+        'timeout': 120,
+        'keepalive': 5,
+        'post_fork': post_fork,
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit
+    }
+
+    class BackendServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return application
+
+    print(f"Serving with gunicorn on {args.bind}: {args.workers} worker(s) x {args.threads} thread(s)")
+    BackendServer().run()
+
+def run_werkzeug(args):
+    from werkzeug.serving import make_server
+
+    application, roadmap_jobs = load_app()
+    host, port = args.bind.rsplit(':', 1)
+    server = make_server(host, int(port), application, threaded=True)
+
+    def handle_shutdown(signum, frame):
+        lifecycle.begin_drain()
+        # shutdown() blocks until serve_forever returns, so it needs its own thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, handle_shutdown)
+    signal.signal(signal.SIGINT, handle_shutdown)
+
+    roadmap_jobs.start()
+    lifecycle.mark_ready()
+
+    print(f"gunicorn not installed; serving with threaded Werkzeug on {args.bind} (single process)")
+    server.serve_forever()
+    lifecycle.drain(roadmap_jobs, args.graceful_timeout)
+    usage_accounting.accountant.flush(final=True)
+
+def run_uvicorn(args):
+    import uvicorn
+    from asgi import create_asgi_app
+
+    host, port = args.bind.rsplit(':', 1)
+    application = create_asgi_app(wsgi_threads=args.threads, drain_timeout=args.graceful_timeout)
+
+    print(f"Serving async with uvicorn on {args.bind} (single process, {args.threads} thread(s) for sync routes)")
+    uvicorn.run(
+        application,
+        host=host,
+        port=int(port),
+        timeout_graceful_shutdown=args.graceful_timeout,
+        timeout_keep_alive=5,
+        access_log=False
+    )
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    if args.mode == 'async':
+        run_uvicorn(args)
+    else:
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            run_werkzeug(args)
+        else:
+            run_gunicorn(args)
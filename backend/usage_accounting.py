@@ -0,0 +1,300 @@
+"""Token usage and cost accounting for Groq calls.
+
+Every completion's `usage` block is recorded against its call type (the
+kind of call, e.g. 'chat' or 'roadmap_section') and the route that made it
+(the Flask endpoint, or 'roadmap_job' for queued jobs). Records are summed
+into per-minute buckets kept for a rolling window, which /stats/usage
+reports. A background thread appends closed-out buckets to a local JSON
+lines log (one line per minute, call type, route and model).
+
+Prompt sizes are watched per call type. When the average prompt over the
+last calls grows past the average this call type had in the log before
+this process started, an alert is raised on /stats/usage and in the
+server log. This catches a prompt template (e.g. the roadmap prompt or the
+chat system prompt) that grew in a deploy.
+"""
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import registry
+
+DEFAULT_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'usage.jsonl')
+
+# USD per million (prompt, completion) tokens; GROQ_MODEL_PRICES adds or overrides entries
+DEFAULT_PRICES = {
+    'llama-3.1-8b-instant': (0.05, 0.08),
+    'llama-3.3-70b-versatile': (0.59, 0.79)
+}
+
+_current_route = contextvars.ContextVar('usage_route', default='background')
+
+def set_route(name):
+    """Attribute LLM calls made from here on in this context (request) to `name`"""
+    _current_route.set(name)
+
+def current_route():
+    return _current_route.get()
+
+def parse_prices(value):
+    """Read 'model=prompt/completion,...' prices (USD per million tokens)"""
+    prices = {}
+    for item in value.split(','):
+        model, _, price = item.partition('=')
+        prompt_price, _, completion_price = price.partition('/')
+        try:
+            prices[model.strip()] = (float(prompt_price), float(completion_price))
+        except ValueError:
+            if item.strip():
+                print(f"Ignoring GROQ_MODEL_PRICES entry '{item.strip()}'")
+    return prices
+
+def _empty_totals():
+    return {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'cost_usd': 0.0, 'latency_sum': 0.0, 'latency_max': 0.0}
+
+def _add(totals, other):
+    for field in ('calls', 'prompt_tokens', 'completion_tokens', 'total_tokens', 'cost_usd', 'latency_sum'):
+        totals[field] += other[field]
+    totals['latency_max'] = max(totals['latency_max'], other['latency_max'])
+
+def _report(totals):
+    calls = totals['calls']
+    return {
+        'calls': calls,
+        'prompt_tokens': totals['prompt_tokens'],
+        'completion_tokens': totals['completion_tokens'],
+        'total_tokens': totals['total_tokens'],
+        'cost_usd': round(totals['cost_usd'], 6),
+        'avg_prompt_tokens': round(totals['prompt_tokens'] / calls, 1) if calls else 0.0,
+        'avg_latency_seconds': round(totals['latency_sum'] / calls, 4) if calls else 0.0,
+        'max_latency_seconds': round(totals['latency_max'], 4)
+    }
+
+class UsageAccountant:
+    """Rolling per-minute usage totals with an append-only log"""
+
+    def __init__(self, log_path=DEFAULT_LOG_PATH, window_minutes=60, flush_interval=60, prices=None,
+                 alert_growth=0.25, alert_sample=20, alert_min_calls=5):
+        self.log_path = log_path
+        self.window_minutes = window_minutes
+        self.flush_interval = flush_interval
+        self.prices = {**DEFAULT_PRICES, **(prices or {})}
+        self.alert_growth = alert_growth
+        self.alert_min_calls = alert_min_calls
+        self.started_at = time.time()
+
+        self._lock = threading.Lock()
+        self._buckets = {}            # minute -> {(call_type, route, model): totals}
+        self._pending = {}            # (minute, call_type, route, model) -> totals not yet in the log
+        self._recent_prompts = {}     # call_type -> deque of prompt token counts
+        self._alert_sample = alert_sample
+        self._baselines = None
+        self._alerts = {}
+        self._last_flush = None
+        self._flusher = None
+
+    def record(self, call_type, model, usage, latency, route=None):
+        """Add one completion's usage (an OpenAI-style `usage` dict)"""
+        prompt_tokens = usage.get('prompt_tokens') or 0
+        completion_tokens = usage.get('completion_tokens') or 0
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        entry = {
+            'calls': 1,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': usage.get('total_tokens') or prompt_tokens + completion_tokens,
+            'cost_usd': (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000,
+            'latency_sum': latency,
+            'latency_max': latency
+        }
+        route = route or current_route()
+        minute = int(time.time() // 60)
+
+        with self._lock:
+            self._start_flusher()
+            key = (call_type, route, model)
+            _add(self._buckets.setdefault(minute, {}).setdefault(key, _empty_totals()), entry)
+            _add(self._pending.setdefault((minute,) + key, _empty_totals()), entry)
+            self._expire(minute)
+
+            prompts = self._recent_prompts.setdefault(call_type, deque(maxlen=self._alert_sample))
+            prompts.append(prompt_tokens)
+            self._check_prompt_size(call_type, prompts)
+
+    def stats(self, minutes=None):
+        """Usage over the last `minutes` (default: the whole window)"""
+        minutes = min(minutes or self.window_minutes, self.window_minutes)
+        first_minute = int(time.time() // 60) - minutes + 1
+
+        totals = _empty_totals()
+        by_call_type, by_route, by_model, by_route_call_type = {}, {}, {}, {}
+        with self._lock:
+            for minute, entries in self._buckets.items():
+                if minute < first_minute:
+                    continue
+                for (call_type, route, model), entry in entries.items():
+                    _add(totals, entry)
+                    _add(by_call_type.setdefault(call_type, _empty_totals()), entry)
+                    _add(by_route.setdefault(route, _empty_totals()), entry)
+                    _add(by_model.setdefault(model, _empty_totals()), entry)
+                    _add(by_route_call_type.setdefault(route, {}).setdefault(call_type, _empty_totals()), entry)
+
+            prompt_size = {
+                call_type: {
+                    'recent_avg_tokens': round(sum(prompts) / len(prompts), 1),
+                    'baseline_avg_tokens': (self._baselines or {}).get(call_type)
+                }
+                for call_type, prompts in self._recent_prompts.items() if prompts
+            }
+            alerts = list(self._alerts.values())
+            pending = len(self._pending)
+            last_flush = self._last_flush
+
+        return {
+            'minutes': minutes,
+            'totals': _report(totals),
+            'by_call_type': {key: _report(value) for key, value in by_call_type.items()},
+            'by_route': {key: _report(value) for key, value in by_route.items()},
+            'by_route_and_call_type': {
+                route: {key: _report(value) for key, value in call_types.items()}
+                for route, call_types in by_route_call_type.items()
+            },
+            'by_model': {key: _report(value) for key, value in by_model.items()},
+            'prompt_size': prompt_size,
+            'prompt_size_alerts': alerts,
+            'log': {
+                'path': self.log_path,
+                'flush_interval_seconds': self.flush_interval,
+                'pending_records': pending,
+                'last_flush': last_flush
+            }
+        }
+
+    def metrics(self):
+        totals = self.stats()['totals']
+        return {'window_minutes': self.window_minutes, 'calls': totals['calls'], 'total_tokens': totals['total_tokens'],
+                'cost_usd': totals['cost_usd'], 'prompt_size_alerts': len(self._alerts)}
+
+    def flush(self, final=False):
+        """Append finished minutes (every minute when `final`) to the log"""
+        current_minute = int(time.time() // 60)
+        with self._lock:
+            ready = {key: totals for key, totals in self._pending.items() if final or key[0] < current_minute}
+            for key in ready:
+                del self._pending[key]
+        if not ready:
+            return 0
+
+        lines = []
+        for (minute, call_type, route, model), totals in sorted(ready.items()):
+            lines.append(json.dumps({
+                'minute': time.strftime('%Y-%m-%dT%H:%M:00Z', time.gmtime(minute * 60)),
+                'pid': os.getpid(),
+                'call_type': call_type,
+                'route': route,
+                'model': model,
+                'calls': totals['calls'],
+                'prompt_tokens': totals['prompt_tokens'],
+                'completion_tokens': totals['completion_tokens'],
+                'total_tokens': totals['total_tokens'],
+                'cost_usd': round(totals['cost_usd'], 6),
+                'latency_seconds': round(totals['latency_sum'], 4)
+            }, sort_keys=True) + '\n')
+
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+            # One write per flush with O_APPEND, so workers sharing the log do not interleave lines
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, ''.join(lines).encode('utf-8'))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"Could not write usage log {self.log_path}: {e}")
+            with self._lock:
+                for key, totals in ready.items():
+                    _add(self._pending.setdefault(key, _empty_totals()), totals)
+            return 0
+
+        with self._lock:
+            self._last_flush = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        return len(lines)
+
+    def _start_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            # Started lazily so each (forked) worker process runs its own
+            self._flusher = threading.Thread(target=self._flush_loop, name='usage-flush', daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _expire(self, minute):
+        for old in [m for m in self._buckets if m <= minute - self.window_minutes]:
+            del self._buckets[old]
+
+    def _load_baselines(self):
+        """Average prompt tokens per call type in the log, from before this process started"""
+        totals = {}
+        try:
+            with open(self.log_path, 'rb') as f:
+                # Only the most recent part of the log matters
+                f.seek(max(0, os.path.getsize(self.log_path) - 2 * 1024 * 1024))
+                lines = f.read().splitlines()
+        except OSError:
+            lines = []
+
+        started = time.strftime('%Y-%m-%dT%H:%M:00Z', time.gmtime(self.started_at))
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict) or record.get('minute', '') >= started:
+                continue
+            calls, prompt_tokens = totals.get(record.get('call_type'), (0, 0))
+            totals[record.get('call_type')] = (calls + record.get('calls', 0), prompt_tokens + record.get('prompt_tokens', 0))
+
+        return {call_type: round(prompt_tokens / calls, 1) for call_type, (calls, prompt_tokens) in totals.items() if calls}
+
+    def _check_prompt_size(self, call_type, prompts):
+        if self._baselines is None:
+            self._baselines = self._load_baselines()
+        baseline = self._baselines.get(call_type)
+        if not baseline or len(prompts) < self.alert_min_calls:
+            return
+
+        recent = sum(prompts) / len(prompts)
+        if recent > baseline * (1 + self.alert_growth):
+            if call_type not in self._alerts:
+                growth = round(recent / baseline - 1, 3)
+                self._alerts[call_type] = {
+                    'call_type': call_type,
+                    'baseline_avg_tokens': baseline,
+                    'recent_avg_tokens': round(recent, 1),
+                    'growth': growth,
+                    'since': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                }
+                print(f"⚠️ Prompt size alert: {call_type} prompts average {recent:.0f} tokens, up {growth:.0%} from {baseline:.0f}")
+                registry.inc('llm_prompt_size_alerts_total', call_type=call_type)
+            else:
+                self._alerts[call_type]['recent_avg_tokens'] = round(recent, 1)
+        elif call_type in self._alerts:
+            del self._alerts[call_type]
+
+# Shared accountant for every Groq call in this process
+accountant = UsageAccountant(
+    log_path=os.getenv('USAGE_LOG_PATH', DEFAULT_LOG_PATH),
+    window_minutes=int(os.getenv('USAGE_WINDOW_MINUTES', '60')),
+    flush_interval=float(os.getenv('USAGE_FLUSH_INTERVAL', '60')),
+    prices=parse_prices(os.getenv('GROQ_MODEL_PRICES', '')),
+    alert_growth=float(os.getenv('USAGE_PROMPT_ALERT_GROWTH', '0.25'))
+)
+registry.register_collector('llm_usage', accountant.metrics)
+atexit.register(accountant.flush, final=True)